@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 import argparse
 import codecs
+import multiprocessing
 import os.path
 import platform
 import shutil
@@ -13,25 +14,27 @@ from libs.Widget.default_label_combobox import DefaultLabelComboBox
 from libs.constants import *
 from libs.utils import *
 from libs.settings import Settings
+from libs.session import Session
 from libs.shape import Shape, DEFAULT_LINE_COLOR, DEFAULT_FILL_COLOR
 from libs.stringBundle import StringBundle
 from libs.canvas import Canvas
 from libs.zoomWidget import ZoomWidget
 from libs.Widget.lightWidget import LightWidget
 from libs.labelDialog import LabelDialog
+from libs.labelRegistry import LabelRegistry
+from libs.undoStack import UndoStack
+from libs.saveQueue import SaveQueue
 from libs.Widget.colorDialog import ColorDialog
 from libs.labelFile import LabelFile, LabelFileError, LabelFileFormat
 from libs.Widget.toolBar import ToolBar
-from libs.Io.pascal_voc_io import PascalVocReader
-from libs.Io.pascal_voc_io import XML_EXT
-from libs.Io.yolo_io import YoloReader
-from libs.Io.yolo_io import TXT_EXT
-from libs.Io.create_ml_io import CreateMLReader
-from libs.Io.create_ml_io import JSON_EXT
+from libs.formatRegistry import close_formats, formats, get_format, next_format
 from libs.hashableQListWidgetItem import HashableQListWidgetItem
 
 __appname__ = 'labelImg'
 
+# 连续翻页（按住按键自动重复）时，停止翻页这么久之后才完整加载落点图像
+NAV_SETTLE_MS = 120
+
 
 class WindowMixin(object):
 
@@ -62,6 +65,7 @@ class MainWindow(QMainWindow, WindowMixin):
         self.settings = Settings()
         self.settings.load()
         settings = self.settings
+        self.session = Session()
 
         self.os_name = platform.system()
 
@@ -75,8 +79,10 @@ class MainWindow(QMainWindow, WindowMixin):
 
         # 目录图片浏览相关
         self.m_img_list = []
+        # 扫描图像目录时各子目录的修改时间，用于判断保存的会话是否过期
+        self.scanned_dirs = None
         self.dir_name = None
-        self.label_hist = []  # 初始化空的标签历史列表
+        self.label_hist = LabelRegistry(parent=self)  # 标签注册表：id、颜色与计数
         self.last_open_dir = None
         self.cur_img_idx = 0
         self.img_count = len(self.m_img_list)
@@ -98,10 +104,26 @@ class MainWindow(QMainWindow, WindowMixin):
             self.default_label = ""
 
         # 主要窗口组件
-        self.label_dialog = LabelDialog(parent=self, list_item=self.label_hist)
+        self.label_dialog = LabelDialog(parent=self, list_item=self.label_hist.names)
+        self.label_hist.labelAdded.connect(self.label_dialog.add_item)
 
         self.items_to_shapes = {}
         self.shapes_to_items = {}
+        # 标签 -> 列表项索引（dict 保持插入顺序），用于按类别过滤
+        self.label_items = {}
+        # 当前图像的撤销/重做历史
+        self.undo_stack = UndoStack()
+        self._previous_shapes = (None, [])
+        # 自动保存的后台写入队列
+        self.save_queue = SaveQueue(self)
+        self.save_queue.failed.connect(self.save_failed)
+        # 翻页合并：快速连续的翻页只更新计数与文件列表，停下后只加载最后一张
+        self._nav_target = None
+        self._nav_clock = QElapsedTimer()
+        self._nav_timer = QTimer(self)
+        self._nav_timer.setSingleShot(True)
+        self._nav_timer.setInterval(NAV_SETTLE_MS)
+        self._nav_timer.timeout.connect(self.finish_navigation)
         self.prev_label_text = ''
 
         list_layout = QVBoxLayout()
@@ -110,7 +132,8 @@ class MainWindow(QMainWindow, WindowMixin):
         # 默认标签相关组件
         self.use_default_label_checkbox = QCheckBox(get_str('useDefaultLabel'))
         self.use_default_label_checkbox.setChecked(False)
-        self.default_label_combo_box = DefaultLabelComboBox(self, items=self.label_hist)
+        self.default_label_combo_box = DefaultLabelComboBox(self, items=self.label_hist.names)
+        self.label_hist.labelAdded.connect(self.default_label_combo_box.add_item)
 
         use_default_label_qhbox_layout = QHBoxLayout()
         use_default_label_qhbox_layout.addWidget(self.use_default_label_checkbox)
@@ -181,6 +204,7 @@ class MainWindow(QMainWindow, WindowMixin):
 
         self.canvas.newShape.connect(self.new_shape)
         self.canvas.shapeMoved.connect(self.set_dirty)
+        self.canvas.shapeEdited.connect(self.shape_edited)
         self.canvas.selectionChanged.connect(self.shape_selection_changed)
         self.canvas.drawingPolygon.connect(self.toggle_drawing_sensitive)
 
@@ -211,6 +235,9 @@ class MainWindow(QMainWindow, WindowMixin):
         copy_prev_bounding = action(get_str('copyPrevBounding'), self.copy_previous_bounding_boxes, 'Ctrl+v', 'copy',
                                     get_str('copyPrevBounding'))
 
+        propagate_boxes = action(get_str('propagateBoxes'), self.propagate_boxes, None, 'copy',
+                                 get_str('propagateBoxesDetail'))
+
         open_next_image = action(get_str('nextImg'), self.open_next_image,
                                  'd', 'next', get_str('nextImgDetail'))
 
@@ -223,17 +250,10 @@ class MainWindow(QMainWindow, WindowMixin):
         save = action(get_str('save'), self.save_file,
                       'Ctrl+S', 'save', get_str('saveDetail'), enabled=False)
 
-        def get_format_meta(format):
-            if format == LabelFileFormat.PASCAL_VOC:
-                return '&PascalVOC', 'format_voc'
-            elif format == LabelFileFormat.YOLO:
-                return '&YOLO', 'format_yolo'
-            elif format == LabelFileFormat.CREATE_ML:
-                return '&CreateML', 'format_createml'
-
-        save_format = action(get_format_meta(self.label_file_format)[0],
+        label_format = get_format(self.label_file_format)
+        save_format = action(label_format.menu_text,
                              self.change_format, 'Ctrl+Y',
-                             get_format_meta(self.label_file_format)[1],
+                             label_format.icon,
                              get_str('changeSaveFormat'), enabled=True)
 
         save_as = action(get_str('saveAs'), self.save_file_as,
@@ -261,6 +281,12 @@ class MainWindow(QMainWindow, WindowMixin):
         copy = action(get_str('dupBox'), self.copy_selected_shape,
                       'Ctrl+D', 'copy', get_str('dupBoxDetail'),
                       enabled=False)
+        bulk_labels = action(get_str('bulkLabelOps'), self.bulk_label_operation,
+                             None, 'labels', get_str('bulkLabelOpsDetail'))
+        undo = action(get_str('undo'), self.undo,
+                      'Ctrl+Z', 'undo', get_str('undoDetail'), enabled=False)
+        redo = action(get_str('redo'), self.redo,
+                      'Ctrl+Shift+Z', None, get_str('redoDetail'), enabled=False)
 
         advanced_mode = action(get_str('advancedMode'), self.toggle_advanced_mode,
                                'Ctrl+Shift+A', 'expert', get_str('advancedModeDetail'),
@@ -365,6 +391,7 @@ class MainWindow(QMainWindow, WindowMixin):
         self.actions = Struct(save=save, save_format=save_format, saveAs=save_as, open=open, close=close,
                               resetAll=reset_all, deleteImg=delete_image,
                               lineColor=color1, create=create, delete=delete, edit=edit, copy=copy,
+                              undo=undo, redo=redo,
                               createMode=create_mode, editMode=edit_mode, advancedMode=advanced_mode,
                               shapeLineColor=shape_line_color, shapeFillColor=shape_fill_color,
                               zoom=zoom, zoomIn=zoom_in, zoomOut=zoom_out, zoomOrg=zoom_org,
@@ -375,8 +402,8 @@ class MainWindow(QMainWindow, WindowMixin):
                               fileMenuActions=(
                                   open, open_dir, save, save_as, close, reset_all, quit),
                               beginner=(), advanced=(),
-                              editMenu=(edit, copy, delete,
-                                        None, color1, self.draw_squares_option),
+                              editMenu=(undo, redo, None, edit, copy, delete,
+                                        None, color1, self.draw_squares_option, None, bulk_labels),
                               beginnerContext=(create, edit, copy, delete),
                               advancedContext=(create_mode, edit_mode, edit, copy,
                                                delete, shape_line_color, shape_fill_color),
@@ -411,9 +438,14 @@ class MainWindow(QMainWindow, WindowMixin):
         self.display_label_option.setChecked(settings.get(SETTING_PAINT_LABEL, False))
         self.display_label_option.triggered.connect(self.toggle_paint_labels_option)
 
+        # 帧耗时统计叠加层
+        self.show_frame_stats = QAction(get_str('showFrameStats'), self)
+        self.show_frame_stats.setCheckable(True)
+        self.show_frame_stats.triggered.connect(self.canvas.set_profiler_overlay)
+
         # 在文件菜单添加加载标签文件的选项
         add_actions(self.menus.file,
-                    (open, open_dir, change_save_dir, open_annotation, copy_prev_bounding,
+                    (open, open_dir, change_save_dir, open_annotation, copy_prev_bounding, propagate_boxes,
                      load_classes,  # 添加加载标签文件的动作
                      self.menus.recentFiles, save,
                      save_format, save_as, close, reset_all, delete_image, quit))
@@ -422,6 +454,7 @@ class MainWindow(QMainWindow, WindowMixin):
             self.auto_saving,
             self.single_class_mode,
             self.display_label_option,
+            self.show_frame_stats,
             labels, advanced_mode, None,
             hide_all, show_all, None,
             zoom_in, zoom_out, zoom_org, None,
@@ -508,6 +541,8 @@ class MainWindow(QMainWindow, WindowMixin):
             self.queue_event(partial(self.import_dir_images, self.file_path or ""))
         elif self.file_path:
             self.queue_event(partial(self.load_file, self.file_path or ""))
+        else:
+            self.queue_event(self.restore_session)
 
         # 回调连接
         self.zoom_widget.valueChanged.connect(self.paint_canvas)
@@ -534,33 +569,15 @@ class MainWindow(QMainWindow, WindowMixin):
 
     # 支持函数
     def set_format(self, save_format):
-        if save_format == FORMAT_PASCALVOC:
-            self.actions.save_format.setText(FORMAT_PASCALVOC)
-            self.actions.save_format.setIcon(new_icon("format_voc"))
-            self.label_file_format = LabelFileFormat.PASCAL_VOC
-            LabelFile.suffix = XML_EXT
-
-        elif save_format == FORMAT_YOLO:
-            self.actions.save_format.setText(FORMAT_YOLO)
-            self.actions.save_format.setIcon(new_icon("format_yolo"))
-            self.label_file_format = LabelFileFormat.YOLO
-            LabelFile.suffix = TXT_EXT
-
-        elif save_format == FORMAT_CREATEML:
-            self.actions.save_format.setText(FORMAT_CREATEML)
-            self.actions.save_format.setIcon(new_icon("format_createml"))
-            self.label_file_format = LabelFileFormat.CREATE_ML
-            LabelFile.suffix = JSON_EXT
+        """save_format 可以是 LabelFileFormat 或格式名称"""
+        label_format = get_format(save_format)
+        self.actions.save_format.setText(label_format.name)
+        self.actions.save_format.setIcon(new_icon(label_format.icon))
+        self.label_file_format = label_format.key
+        LabelFile.suffix = label_format.ext
 
     def change_format(self):
-        if self.label_file_format == LabelFileFormat.PASCAL_VOC:
-            self.set_format(FORMAT_YOLO)
-        elif self.label_file_format == LabelFileFormat.YOLO:
-            self.set_format(FORMAT_CREATEML)
-        elif self.label_file_format == LabelFileFormat.CREATE_ML:
-            self.set_format(FORMAT_PASCALVOC)
-        else:
-            raise ValueError('未知的标签文件格式。')
+        self.set_format(next_format(self.label_file_format).key)
         self.set_dirty()
 
     def no_shapes(self):
@@ -627,6 +644,10 @@ class MainWindow(QMainWindow, WindowMixin):
     def reset_state(self):
         self.items_to_shapes.clear()
         self.shapes_to_items.clear()
+        self.label_items.clear()
+        self.label_hist.clear_counts()
+        self.undo_stack.clear()
+        self.update_undo_actions()
         self.label_list.clear()
         self.file_path = None
         self.image_data = None
@@ -743,7 +764,7 @@ class MainWindow(QMainWindow, WindowMixin):
         text = self.label_dialog.pop_up(item.text())
         if text is not None:
             item.setText(text)
-            item.setBackground(generate_color_by_text(text))
+            item.setBackground(self.label_hist.color(text))
             self.set_dirty()
             self.update_combo_box()
 
@@ -773,6 +794,8 @@ class MainWindow(QMainWindow, WindowMixin):
         try:
             if difficult != shape.difficult:
                 shape.difficult = difficult
+                self.undo_stack.difficulty_changed(shape, difficult)
+                self.update_undo_actions()
                 self.set_dirty()
             else:  # 用户可能更改了项的可见性
                 self.canvas.set_shape_visible(shape, item.checkState() == Qt.Checked)
@@ -795,18 +818,28 @@ class MainWindow(QMainWindow, WindowMixin):
         self.actions.shapeLineColor.setEnabled(selected)
         self.actions.shapeFillColor.setEnabled(selected)
 
-    def add_label(self, shape):
+    def add_label(self, shape, row=None):
+        """row 为 None 时追加到列表末尾，否则插入到该行（与画布中的顺序一致）"""
+        self._add_label_item(shape, row)
+        for action in self.actions.onShapesPresent:
+            action.setEnabled(True)
+        self.update_combo_box()
+        self.apply_label_filter([self.shapes_to_items[shape]])
+
+    def _add_label_item(self, shape, row=None):
         shape.paint_label = self.display_label_option.isChecked()
         item = HashableQListWidgetItem(shape.label)
         item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
         item.setCheckState(Qt.Checked)
-        item.setBackground(generate_color_by_text(shape.label))
+        item.setBackground(self.label_hist.color(shape.label))
         self.items_to_shapes[item] = shape
         self.shapes_to_items[shape] = item
-        self.label_list.addItem(item)
-        for action in self.actions.onShapesPresent:
-            action.setEnabled(True)
-        self.update_combo_box()
+        if row is None:
+            self.label_list.addItem(item)
+        else:
+            self.label_list.insertItem(row, item)
+        self.label_items.setdefault(shape.label, {})[item] = None
+        self.label_hist.adjust_count(shape.label, 1)
 
     def remove_label(self, shape):
         if shape is None:
@@ -815,9 +848,34 @@ class MainWindow(QMainWindow, WindowMixin):
         self.label_list.takeItem(self.label_list.row(item))
         del self.shapes_to_items[shape]
         del self.items_to_shapes[item]
+        self._unindex_item(shape.label, item)
+        self.label_hist.adjust_count(shape.label, -1)
         self.update_combo_box()
 
+    def _unindex_item(self, label, item):
+        items = self.label_items.get(label)
+        if items is not None:
+            items.pop(item, None)
+            if not items:
+                del self.label_items[label]
+
     def load_labels(self, shapes):
+        # 批量加载：暂停列表的信号和重绘，最后只刷新一次组合框
+        self.label_list.blockSignals(True)
+        self.label_list.setUpdatesEnabled(False)
+        try:
+            s = self._load_label_items(shapes)
+        finally:
+            self.label_list.setUpdatesEnabled(True)
+            self.label_list.blockSignals(False)
+        if s:
+            for action in self.actions.onShapesPresent:
+                action.setEnabled(True)
+        self.update_combo_box()
+        self.canvas.load_shapes(s)
+        self.apply_label_filter([self.shapes_to_items[shape] for shape in s])
+
+    def _load_label_items(self, shapes):
         s = []
         for label, points, line_color, fill_color, difficult in shapes:
             shape = Shape(label=label)
@@ -835,34 +893,62 @@ class MainWindow(QMainWindow, WindowMixin):
             if line_color:
                 shape.line_color = QColor(*line_color)
             else:
-                shape.line_color = generate_color_by_text(label)
+                shape.line_color = self.label_hist.color(label)
 
             if fill_color:
                 shape.fill_color = QColor(*fill_color)
             else:
-                shape.fill_color = generate_color_by_text(label)
+                shape.fill_color = self.label_hist.color(label)
 
-            self.add_label(shape)
-        self.update_combo_box()
-        self.canvas.load_shapes(s)
+            self._add_label_item(shape)
+        return s
 
     def update_combo_box(self):
-        # 获取唯一标签并添加到组合框
-        items_text_list = [str(self.label_list.item(i).text()) for i in range(self.label_list.count())]
-
-        unique_text_list = list(set(items_text_list))
-        # 添加空行以显示所有标签
-        unique_text_list.append("")
-        unique_text_list.sort()
+        # 唯一标签来自增量维护的计数，添加空行以显示所有标签
+        unique_text_list = [""] + self.label_hist.used_labels()
 
+        # 重建时保留当前的过滤类别
+        current = self.combo_box.cb.currentText()
+        self.combo_box.cb.blockSignals(True)
         self.combo_box.update_items(unique_text_list)
+        index = self.combo_box.cb.findText(current)
+        self.combo_box.cb.setCurrentIndex(max(index, 0))
+        self.combo_box.cb.blockSignals(False)
+        if index < 0 and current:
+            self.combo_selection_changed(0)
 
-    def save_labels(self, annotation_file_path):
+    def save_labels(self, annotation_file_path, background=False):
         annotation_file_path = annotation_file_path
         if self.label_file is None:
             self.label_file = LabelFile()
             self.label_file.verified = self.canvas.verified
 
+        shapes = self.format_shapes()
+        # 图像尺寸取自已解码的图像，避免保存时重新解码
+        image_shape = None
+        if not self.image.isNull():
+            image_shape = [self.image.height(), self.image.width(), 1 if self.image.isGrayscale() else 3]
+        label_file, class_list = self.label_file, self.label_hist
+        if background:
+            # 后台写入使用快照，工作线程不接触界面状态
+            label_file = LabelFile()
+            label_file.verified = self.label_file.verified
+            class_list = self.class_list_snapshot(shapes)
+        annotation_file_path, save = self.label_save_job(label_file, annotation_file_path, shapes, self.file_path,
+                                                         self.image_data, image_shape, class_list)
+        if background:
+            self.save_queue.submit(annotation_file_path, self.file_path, save)
+            return True
+        try:
+            # 同步保存也经过队列，与排队中写同一标注文件的任务串行执行
+            self.save_queue.run(annotation_file_path, self.file_path, save)
+            print('图像:{0} -> 标注:{1}'.format(self.file_path, annotation_file_path))
+            return True
+        except LabelFileError as e:
+            self.error_message(u'保存标签数据错误', u'<b>%s</b>' % e)
+            return False
+
+    def format_shapes(self):
         def format_shape(s):
             return dict(label=s.label,
                         line_color=s.line_color.getRgb(),
@@ -870,50 +956,68 @@ class MainWindow(QMainWindow, WindowMixin):
                         points=[(p.x(), p.y()) for p in s.points],
                         difficult=s.difficult)
 
-        shapes = [format_shape(shape) for shape in self.canvas.shapes]
-        try:
-            if self.label_file_format == LabelFileFormat.PASCAL_VOC:
-                if annotation_file_path[-4:].lower() != ".xml":
-                    annotation_file_path += XML_EXT
-                self.label_file.save_pascal_voc_format(annotation_file_path, shapes, self.file_path, self.image_data,
-                                                       self.line_color.getRgb(), self.fill_color.getRgb())
-            elif self.label_file_format == LabelFileFormat.YOLO:
-                if annotation_file_path[-4:].lower() != ".txt":
-                    annotation_file_path += TXT_EXT
-                self.label_file.save_yolo_format(annotation_file_path, shapes, self.file_path, self.image_data,
-                                                 self.label_hist,
-                                                 self.line_color.getRgb(), self.fill_color.getRgb())
-            elif self.label_file_format == LabelFileFormat.CREATE_ML:
-                if annotation_file_path[-5:].lower() != ".json":
-                    annotation_file_path += JSON_EXT
-                self.label_file.save_create_ml_format(annotation_file_path, shapes, self.file_path, self.image_data,
-                                                      self.label_hist, self.line_color.getRgb(),
-                                                      self.fill_color.getRgb())
-            else:
-                self.label_file.save(annotation_file_path, shapes, self.file_path, self.image_data,
-                                     self.line_color.getRgb(), self.fill_color.getRgb())
-            print('图像:{0} -> 标注:{1}'.format(self.file_path, annotation_file_path))
-            return True
-        except LabelFileError as e:
-            self.error_message(u'保存标签数据错误', u'<b>%s</b>' % e)
-            return False
+        return [format_shape(shape) for shape in self.canvas.shapes]
+
+    def class_list_snapshot(self, shapes):
+        for shape in shapes:
+            self.label_hist.intern(shape['label'])
+        if not get_format(self.label_file_format).uses_class_list:
+            return None
+        from libs.Io.yolo_io import ClassList
+        return ClassList(self.label_hist)
+
+    def label_save_job(self, label_file, annotation_file_path, shapes, image_path, image_data, image_shape,
+                       class_list):
+        """按当前保存格式返回 (标注文件路径, 执行保存的可调用对象)"""
+        label_format = get_format(self.label_file_format)
+        annotation_file_path = label_format.annotation_path(annotation_file_path)
+        save = partial(label_format.write, label_file, annotation_file_path, shapes, image_path, image_data,
+                       class_list, image_shape, self.line_color.getRgb(), self.fill_color.getRgb())
+        return annotation_file_path, save
+
+    def save_failed(self, annotation_file_path, error):
+        self.statusBar().showMessage('保存失败 %s: %s' % (annotation_file_path, error))
+        self.statusBar().show()
 
     def copy_selected_shape(self):
-        self.add_label(self.canvas.copy_selected_shape())
+        shape = self.canvas.copy_selected_shape()
+        self.add_label(shape)
+        self.record_created(shape)
         self.shape_selection_changed(True)
 
     def combo_selection_changed(self, index):
+        # 空行显示全部类别，否则只显示所选类别
         text = self.combo_box.cb.itemText(index)
-        for i in range(self.label_list.count()):
-            if text == "":
-                self.label_list.item(i).setCheckState(Qt.CheckState.Checked)
-            elif text != self.label_list.item(i).text():
-                self.label_list.item(i).setCheckState(Qt.CheckState.Checked)
-            else:
-                self.label_list.item(i).setCheckState(Qt.CheckState.Checked)
+        changes = {}
+        for label, items in self.label_items.items():
+            visible = text == "" or label == text
+            for item in items:
+                changes[item] = visible
+        self.set_items_visible(changes)
+
+    def apply_label_filter(self, items):
+        """新加入的列表项按当前过滤类别设置可见性"""
+        text = self.combo_box.cb.currentText()
+        if text:
+            self.set_items_visible({item: self.items_to_shapes[item].label == text for item in items})
+
+    def set_items_visible(self, changes):
+        """按 {列表项: 是否可见} 批量勾选，并只刷新一次画布"""
+        state = {True: Qt.Checked, False: Qt.Unchecked}
+        shapes = {}
+        self.label_list.blockSignals(True)
+        try:
+            for item, visible in changes.items():
+                if item.checkState() != state[visible]:
+                    item.setCheckState(state[visible])
+                    shapes[self.items_to_shapes[item]] = visible
+        finally:
+            self.label_list.blockSignals(False)
+        self.canvas.set_shapes_visible(shapes)
 
     def default_label_combo_selection_changed(self, index):
-        self.default_label = self.label_hist[index]
+        if 0 <= index < len(self.label_hist):
+            self.default_label = self.label_hist[index]
 
     def label_selection_changed(self):
         item = self.current_item()
@@ -927,19 +1031,24 @@ class MainWindow(QMainWindow, WindowMixin):
         shape = self.items_to_shapes[item]
         label = item.text()
         if label != shape.label:
-            shape.label = item.text()
-            shape.line_color = generate_color_by_text(shape.label)
+            self.undo_stack.relabeled(shape, shape.label, label)
+            self.update_undo_actions()
+            self._relabel(shape, item, label)
             self.set_dirty()
         else:  # 用户可能更改了项的可见性
             self.canvas.set_shape_visible(shape, item.checkState() == Qt.Checked)
 
+    def _relabel(self, shape, item, label):
+        self.label_hist.adjust_count(shape.label, -1)
+        self.label_hist.adjust_count(label, 1)
+        self._unindex_item(shape.label, item)
+        self.label_items.setdefault(label, {})[item] = None
+        shape.label = label
+        shape.line_color = self.label_hist.color(label)
+
     # 新形状创建
     def new_shape(self):
         if not self.use_default_label_checkbox.isChecked():
-            if len(self.label_hist) > 0:
-                self.label_dialog = LabelDialog(
-                    parent=self, list_item=self.label_hist)
-
             # 单类别模式
             if self.single_class_mode.isChecked() and self.lastLabel:
                 text = self.lastLabel
@@ -952,9 +1061,10 @@ class MainWindow(QMainWindow, WindowMixin):
         self.diffc_button.setChecked(False)
         if text is not None:
             self.prev_label_text = text
-            generate_color = generate_color_by_text(text)
+            generate_color = self.label_hist.color(text)
             shape = self.canvas.set_last_label(text, generate_color, generate_color)
             self.add_label(shape)
+            self.record_created(shape)
             if self.beginner():  # 切换到编辑模式
                 self.canvas.set_editing(True)
                 self.actions.create.setEnabled(True)
@@ -962,8 +1072,7 @@ class MainWindow(QMainWindow, WindowMixin):
                 self.actions.editMode.setEnabled(True)
             self.set_dirty()
 
-            if text not in self.label_hist:
-                self.label_hist.append(text)
+            self.label_hist.intern(text)
         else:
             self.canvas.reset_all_lines()
 
@@ -1065,11 +1174,16 @@ class MainWindow(QMainWindow, WindowMixin):
         self.set_light(self.light_widget.value() + increment)
 
     def toggle_polygons(self, value):
-        for item, shape in self.items_to_shapes.items():
-            item.setCheckState(Qt.Checked if value else Qt.Unchecked)
+        self.set_items_visible(dict.fromkeys(self.items_to_shapes, bool(value)))
 
     def load_file(self, file_path=None):
         """加载指定文件，如果为None则加载最后打开的文件"""
+        # 记住离开的图像的标注（仅当与磁盘一致时），供“复制上一张”直接使用
+        if self.file_path and not self.dirty:
+            self._previous_shapes = (self.file_path, self.current_shape_tuples())
+        # 直接加载某个文件时取消尚未完成的合并翻页
+        self._nav_timer.stop()
+        self._nav_target = None
         self.reset_state()
         self.canvas.setEnabled(False)
         if file_path is None:
@@ -1088,6 +1202,11 @@ class MainWindow(QMainWindow, WindowMixin):
             else:
                 self.file_list_widget.clear()
                 self.m_img_list.clear()
+        # 从最近文件等处直接打开时也要同步当前序号，“复制上一张”和向后复制依赖它
+        if unicode_file_path in self.m_img_list:
+            self.cur_img_idx = self.m_img_list.index(unicode_file_path)
+        else:
+            self.cur_img_idx = 0
 
         if unicode_file_path and os.path.exists(unicode_file_path):
             if LabelFile.is_label_file(unicode_file_path):
@@ -1152,34 +1271,16 @@ class MainWindow(QMainWindow, WindowMixin):
         # 先检查file_path是否为None
         if file_path is None:
             return
-
-        if self.default_save_dir is not None:
-            basename = os.path.basename(os.path.splitext(file_path)[0])
-            xml_path = os.path.join(self.default_save_dir, basename + XML_EXT)
-            txt_path = os.path.join(self.default_save_dir, basename + TXT_EXT)
-            json_path = os.path.join(self.default_save_dir, basename + JSON_EXT)
-
-            """标注文件优先级:
-            PascalXML > YOLO
-            """
-            if os.path.isfile(xml_path):
-                self.load_pascal_xml_by_filename(xml_path)
-            elif os.path.isfile(txt_path):
-                self.load_yolo_txt_by_filename(txt_path)
-            elif os.path.isfile(json_path):
-                self.load_create_ml_json_by_filename(json_path, file_path)
-
-        else:
-            xml_path = os.path.splitext(file_path)[0] + XML_EXT
-            txt_path = os.path.splitext(file_path)[0] + TXT_EXT
-            json_path = os.path.splitext(file_path)[0] + JSON_EXT
-
-            if os.path.isfile(xml_path):
-                self.load_pascal_xml_by_filename(xml_path)
-            elif os.path.isfile(txt_path):
-                self.load_yolo_txt_by_filename(txt_path)
-            elif os.path.isfile(json_path):
-                self.load_create_ml_json_by_filename(json_path, file_path)
+        # 该图像还有排队中的保存时，先等它写入磁盘再读取
+        if self.save_queue.is_pending(file_path):
+            self.save_queue.flush()
+
+        # 标注文件优先级按格式注册顺序: PascalVOC > YOLO > CreateML
+        base = self.annotation_base_path(file_path)
+        for label_format in formats():
+            if os.path.isfile(base + label_format.ext):
+                self.load_annotation(label_format, base + label_format.ext, file_path)
+                break
 
     def resizeEvent(self, event):
         if self.canvas and not self.image.isNull() \
@@ -1217,6 +1318,10 @@ class MainWindow(QMainWindow, WindowMixin):
     def closeEvent(self, event):
         if not self.may_continue():
             event.ignore()
+        # 确保后台队列中的保存全部写入磁盘，CreateML 日志合并回 JSON 文件
+        self.save_queue.flush()
+        close_formats()
+        self.canvas.close_profiler()
         settings = self.settings
         # 如果从目录加载图像，开始时不加载
         if self.dir_name is None:
@@ -1247,6 +1352,38 @@ class MainWindow(QMainWindow, WindowMixin):
         settings[SETTING_DRAW_SQUARE] = self.draw_squares_option.isChecked()
         settings[SETTING_LABEL_FILE_FORMAT] = self.label_file_format
         settings.save()
+        self.save_session()
+
+    def save_session(self):
+        if self.dir_name and self.file_path in self.m_img_list:
+            try:
+                self.session.save(self.dir_name, self.m_img_list, self.cur_img_idx, self.default_save_dir,
+                                  self.combo_box.cb.currentText(), self.scanned_dirs)
+            except (OSError, ValueError) as e:
+                print('Saving session failed: %s' % e)
+        else:
+            self.session.clear()
+
+    def restore_session(self):
+        """回到上次关闭时的目录和图像，目录未变化时不重新扫描"""
+        state = self.session.load()
+        if state is None or not self.may_continue():
+            return False
+        self.last_open_dir = self.dir_name = state['root']
+        if state['save_dir'] and os.path.isdir(state['save_dir']):
+            self.default_save_dir = state['save_dir']
+        self.file_path = None
+        self.m_img_list = state['images']
+        self.scanned_dirs = state['dirs']
+        self.img_count = len(self.m_img_list)
+        self.file_list_widget.clear()
+        self.file_list_widget.addItems(self.m_img_list)
+        self.cur_img_idx = state['index']
+        self.load_file(self.m_img_list[self.cur_img_idx])
+        index = self.combo_box.cb.findText(state['label_filter'])
+        if index > 0:
+            self.combo_box.cb.setCurrentIndex(index)
+        return True
 
     def load_recent(self, filename):
         if self.may_continue():
@@ -1255,8 +1392,11 @@ class MainWindow(QMainWindow, WindowMixin):
     def scan_all_images(self, folder_path):
         extensions = ['.%s' % fmt.data().decode("ascii").lower() for fmt in QImageReader.supportedImageFormats()]
         images = []
+        self.scanned_dirs = {}
 
         for root, dirs, files in os.walk(folder_path):
+            relative = os.path.relpath(root, folder_path)
+            self.scanned_dirs['' if relative == os.curdir else relative] = os.stat(root).st_mtime_ns
             for file in files:
                 if file.lower().endswith(tuple(extensions)):
                     relative_path = os.path.join(root, file)
@@ -1293,17 +1433,15 @@ class MainWindow(QMainWindow, WindowMixin):
 
         path = os.path.dirname(self.file_path) \
             if self.file_path else '.'
-        if self.label_file_format == LabelFileFormat.PASCAL_VOC:
-            filters = "打开标注XML文件 (%s)" % ' '.join(['*.xml'])
-            filename, _ = QFileDialog.getOpenFileName(self, '%s - 选择xml文件' % __appname__, path, filters)
-            if filename:
-                self.load_pascal_xml_by_filename(filename)
-
-        elif self.label_file_format == LabelFileFormat.CREATE_ML:
-            filters = "打开标注JSON文件 (%s)" % ' '.join(['*.json'])
-            filename, _ = QFileDialog.getOpenFileName(self, '%s - 选择json文件' % __appname__, path, filters)
-            if filename:
-                self.load_create_ml_json_by_filename(filename, self.file_path)
+        label_format = get_format(self.label_file_format)
+        if label_format.needs_image_size:
+            # YOLO 文件依赖图像尺寸与 classes.txt，只随图像自动加载
+            return
+        ext = label_format.ext[1:]
+        filters = "打开标注%s文件 (*.%s)" % (ext.upper(), ext)
+        filename, _ = QFileDialog.getOpenFileName(self, '%s - 选择%s文件' % (__appname__, ext), path, filters)
+        if filename:
+            self.load_annotation(label_format, filename, self.file_path)
 
     def open_dir_dialog(self, _value=False, dir_path=None, silent=False):
         if not self.may_continue():
@@ -1360,16 +1498,7 @@ class MainWindow(QMainWindow, WindowMixin):
             self.save_file()
 
     def open_prev_image(self, _value=False):
-        # 如果有标签，继续上一张图像时不显示对话框
-        if self.auto_saving.isChecked():
-            if self.default_save_dir is not None:
-                if self.dirty is True:
-                    self.save_file()
-            else:
-                self.change_save_dir_dialog()
-                return
-
-        if not self.may_continue():
+        if not self.leave_image():
             return
 
         if self.img_count <= 0:
@@ -1378,23 +1507,12 @@ class MainWindow(QMainWindow, WindowMixin):
         if self.file_path is None:
             return
 
-        if self.cur_img_idx - 1 >= 0:
-            self.cur_img_idx -= 1
-            filename = self.m_img_list[self.cur_img_idx]
-            if filename:
-                self.load_file(filename)
+        index = self.navigation_index() - 1
+        if index >= 0:
+            self.navigate_to(index)
 
     def open_next_image(self, _value=False):
-        # 如果有标签，继续下一张图像时不显示对话框
-        if self.auto_saving.isChecked():
-            if self.default_save_dir is not None:
-                if self.dirty is True:
-                    self.save_file()
-            else:
-                self.change_save_dir_dialog()
-                return
-
-        if not self.may_continue():
+        if not self.leave_image():
             return
 
         if self.img_count <= 0:
@@ -1403,17 +1521,60 @@ class MainWindow(QMainWindow, WindowMixin):
         if not self.m_img_list:
             return
 
-        filename = None
         if self.file_path is None:
-            filename = self.m_img_list[0]
             self.cur_img_idx = 0
+            self.load_file(self.m_img_list[0])
         else:
-            if self.cur_img_idx + 1 < self.img_count:
-                self.cur_img_idx += 1
-                filename = self.m_img_list[self.cur_img_idx]
+            index = self.navigation_index() + 1
+            if index < self.img_count:
+                self.navigate_to(index)
 
-        if filename:
-            self.load_file(filename)
+    def leave_image(self):
+        """离开当前图像前保存或确认未保存的修改；返回 False 表示留在当前图像"""
+        # 如果有标签，继续上/下一张图像时不显示对话框
+        if self.auto_saving.isChecked():
+            if self.default_save_dir is not None:
+                if self.dirty is True:
+                    self.save_file(background=True)
+            else:
+                self.change_save_dir_dialog()
+                return False
+
+        return self.may_continue()
+
+    def navigation_index(self):
+        return self.cur_img_idx if self._nav_target is None else self._nav_target
+
+    def navigate_to(self, index):
+        """
+        单次翻页立即加载；与上一次翻页间隔很短（按键自动重复）时只记下目标，
+        更新计数和文件列表，等翻页停止 NAV_SETTLE_MS 后再加载目标图像。
+        """
+        repeating = self._nav_clock.isValid() and self._nav_clock.elapsed() < NAV_SETTLE_MS
+        if not repeating and self._nav_target is None:
+            self.cur_img_idx = index
+            self.load_file(self.m_img_list[index])
+            # 加载完成后才开始计时，加载慢于 NAV_SETTLE_MS 时排队的自动重复仍会被合并
+            self._nav_clock.start()
+            return
+        self._nav_clock.start()
+        self._nav_target = index
+        self.file_list_widget.setCurrentRow(index)
+        self.statusBar().showMessage('%d / %d  %s' % (index + 1, self.img_count,
+                                                     os.path.basename(self.m_img_list[index])))
+        self._nav_timer.start()
+
+    def finish_navigation(self):
+        index = self._nav_target
+        if index is None:
+            return
+        self._nav_target = None
+        # 等待期间当前图像可能又被修改，加载目标前同样需要保存或确认
+        if not self.leave_image():
+            self.file_list_widget.setCurrentRow(self.cur_img_idx)
+            return
+        self.cur_img_idx = index
+        self.load_file(self.m_img_list[index])
 
     def open_file(self, _value=False):
         if not self.may_continue():
@@ -1427,7 +1588,7 @@ class MainWindow(QMainWindow, WindowMixin):
             self.img_count = 1
             self.load_file(filename)
 
-    def save_file(self, _value=False):
+    def save_file(self, _value=False, background=False):
         if not self.file_path:
             # 可以弹出提示或直接返回
             QMessageBox.warning(self, "警告", "没有可保存的文件，请先打开一张图片")
@@ -1437,7 +1598,7 @@ class MainWindow(QMainWindow, WindowMixin):
                 image_file_name = os.path.basename(self.file_path)
                 saved_file_name = os.path.splitext(image_file_name)[0]
                 saved_path = os.path.join(self.default_save_dir, saved_file_name)
-                self._save_file(saved_path)
+                self._save_file(saved_path, background)
         else:
             image_file_dir = os.path.dirname(self.file_path)
             image_file_name = os.path.basename(self.file_path)
@@ -1468,8 +1629,8 @@ class MainWindow(QMainWindow, WindowMixin):
                 return full_file_path
         return ''
 
-    def _save_file(self, annotation_file_path):
-        if annotation_file_path and self.save_labels(annotation_file_path):
+    def _save_file(self, annotation_file_path, background=False):
+        if annotation_file_path and self.save_labels(annotation_file_path, background):
             self.set_clean()
             self.statusBar().showMessage('已保存到 %s' % annotation_file_path)
             self.statusBar().show()
@@ -1499,6 +1660,7 @@ class MainWindow(QMainWindow, WindowMixin):
 
     def reset_all(self):
         self.settings.reset()
+        self.session.reset()
         self.close()
         process = QProcess()
         process.startDetached(os.path.abspath(__file__))
@@ -1539,7 +1701,13 @@ class MainWindow(QMainWindow, WindowMixin):
             self.set_dirty()
 
     def delete_selected_shape(self):
-        self.remove_label(self.canvas.delete_selected())
+        if self.canvas.selected_shape is None:
+            return
+        index = self.canvas.shapes.index(self.canvas.selected_shape)
+        shape = self.canvas.delete_selected()
+        self.remove_label(shape)
+        self.undo_stack.deleted(shape, index)
+        self.update_undo_actions()
         self.set_dirty()
         if self.no_shapes():
             for action in self.actions.onShapesPresent:
@@ -1566,12 +1734,130 @@ class MainWindow(QMainWindow, WindowMixin):
             return
         self.canvas.end_move(copy=True)
         self.add_label(self.canvas.selected_shape)
+        self.record_created(self.canvas.selected_shape)
         self.set_dirty()
 
     def move_shape(self):
+        shape = self.canvas.selected_shape
+        before = list(shape.points)
         self.canvas.end_move(copy=False)
+        self.shape_edited(shape, before)
         self.set_dirty()
 
+    # 撤销/重做
+    def record_created(self, shape):
+        self.undo_stack.created(shape, self.canvas.shapes.index(shape))
+        self.update_undo_actions()
+
+    def shape_edited(self, shape, before):
+        self.undo_stack.moved(shape, before)
+        self.update_undo_actions()
+
+    def update_undo_actions(self):
+        self.actions.undo.setEnabled(self.undo_stack.can_undo())
+        self.actions.redo.setEnabled(self.undo_stack.can_redo())
+
+    def undo(self):
+        # 创建模式下同样可用；先放弃正在绘制的形状
+        self.canvas.cancel_drawing()
+        if self.undo_stack.undo(self):
+            self.set_dirty()
+        self.update_undo_actions()
+
+    def redo(self):
+        self.canvas.cancel_drawing()
+        if self.undo_stack.redo(self):
+            self.set_dirty()
+        self.update_undo_actions()
+
+    def insert_shape(self, index, shape):
+        self.canvas.insert_shape(index, shape)
+        self.add_label(shape, index)
+
+    def remove_shape(self, shape):
+        self.canvas.remove_shape(shape)
+        self.remove_label(shape)
+        if self.no_shapes():
+            for action in self.actions.onShapesPresent:
+                action.setEnabled(False)
+
+    def set_shape_points(self, shape, points):
+        self.canvas.set_shape_points(shape, points)
+
+    def set_shape_label(self, shape, label):
+        item = self.shapes_to_items[shape]
+        self.label_list.blockSignals(True)
+        item.setText(label)
+        item.setBackground(self.label_hist.color(label))
+        self.label_list.blockSignals(False)
+        self._relabel(shape, item, label)
+        self.canvas.invalidate_background()
+        self.canvas.update()
+        self.update_combo_box()
+
+    def set_shape_difficult(self, shape, value):
+        shape.difficult = value
+        if shape is self.canvas.selected_shape:
+            self.diffc_button.blockSignals(True)
+            self.diffc_button.setChecked(value)
+            self.diffc_button.blockSignals(False)
+
+    def bulk_label_operation(self, _value=False):
+        """对当前数据集的所有标注文件批量重命名/合并/删除类别"""
+        from libs.labelOps import LabelOpTask, parse_mapping
+
+        directory = self.default_save_dir or self.dir_name
+        if not directory:
+            self.status('请先打开图像目录或设置标注保存目录')
+            return
+        if not self.may_continue():
+            return
+        text, ok = QInputDialog.getText(
+            self, '%s - 批量修改类别' % __appname__,
+            '规则以 ";" 分隔，例如 "cat, kitty -> feline; dog ->"\n'
+            '箭头右侧为空表示删除该类别的标注框:')
+        if not ok or not text.strip():
+            return
+        try:
+            mapping = parse_mapping(text)
+        except ValueError as e:
+            self.error_message('规则错误', '<b>%s</b>' % e)
+            return
+        # 等待后台保存写完，避免与批量修改同时写同一文件
+        self.save_queue.flush()
+        close_formats()
+
+        task = LabelOpTask(directory, self.label_file_format, mapping)
+        dialog = QProgressDialog('正在修改标注文件...', '取消', 0, 0, self)
+        dialog.setWindowModality(Qt.WindowModal)
+        dialog.canceled.connect(task.cancel)
+
+        def show_progress(done, total):
+            dialog.setMaximum(total)
+            dialog.setValue(done)
+        task.signals.progress.connect(show_progress)
+        task.signals.finished.connect(partial(self.bulk_label_finished, dialog, mapping))
+        dialog.show()
+        self._label_op = task
+        QThreadPool.globalInstance().start(task)
+
+    def bulk_label_finished(self, dialog, mapping, changed, errors):
+        from libs.labelOps import map_label_list
+
+        self._label_op = None
+        dialog.reset()
+        dialog.deleteLater()
+        # 标签注册表与各组件只在结束时更新一次
+        self.label_hist.reset(map_label_list(self.label_hist.names, mapping))
+        self.default_label_combo_box.update_items(self.label_hist.names)
+        self.label_dialog.set_items(self.label_hist.names)
+        if self.file_path:
+            self.load_file(self.file_path)
+        self.status('已修改 %d 个标注框' % changed)
+        if errors:
+            self.error_message('部分文件修改失败',
+                               '<br>'.join('%s: %s' % error for error in errors[:20]))
+
     def load_predefined_classes(self, predef_classes_file):
         # 只在提供了预定义类别文件且文件存在时加载
         if predef_classes_file and os.path.exists(predef_classes_file):
@@ -1579,10 +1865,7 @@ class MainWindow(QMainWindow, WindowMixin):
                 for line in f:
                     line = line.strip()
                     if line:  # 忽略空行
-                        if self.label_hist is None:
-                            self.label_hist = [line]
-                        else:
-                            self.label_hist.append(line)
+                        self.label_hist.intern(line)
 
     def load_classes_dialog(self):
         """打开对话框让用户选择标签文件并加载"""
@@ -1593,62 +1876,94 @@ class MainWindow(QMainWindow, WindowMixin):
                                                  path,
                                                  filters)
         if filename and os.path.exists(filename):
-            # 清空现有标签历史
-            self.label_hist = []
-            # 加载新的标签文件
-            self.load_predefined_classes(filename)
+            # 清空现有标签历史并加载新的标签文件
+            with codecs.open(filename, 'r', 'utf8') as f:
+                self.label_hist.reset(line.strip() for line in f if line.strip())
             # 更新相关组件
-            self.default_label_combo_box.update_items(self.label_hist)
-            self.label_dialog = LabelDialog(parent=self, list_item=self.label_hist)
+            self.default_label_combo_box.update_items(self.label_hist.names)
+            self.label_dialog.set_items(self.label_hist.names)
             if self.label_hist:
                 self.default_label = self.label_hist[0]
             self.statusBar().showMessage(f'已加载标签文件: {filename}')
 
-    def load_pascal_xml_by_filename(self, xml_path):
+    def load_annotation(self, label_format, annotation_path, file_path):
+        """用 label_format 读取 annotation_path 中 file_path 的标注框，并切换到该保存格式"""
         if self.file_path is None:
             return
-        if os.path.isfile(xml_path) is False:
+        if os.path.isfile(annotation_path) is False:
             return
 
-        self.set_format(FORMAT_PASCALVOC)
-
-        t_voc_parse_reader = PascalVocReader(xml_path)
-        shapes = t_voc_parse_reader.get_shapes()
-        self.load_labels(shapes)
-        self.canvas.verified = t_voc_parse_reader.verified
-
-    def load_yolo_txt_by_filename(self, txt_path):
-        if self.file_path is None:
-            return
-        if os.path.isfile(txt_path) is False:
-            return
+        self.set_format(label_format.key)
 
-        self.set_format(FORMAT_YOLO)
-        t_yolo_parse_reader = YoloReader(txt_path, self.image)
-        shapes = t_yolo_parse_reader.get_shapes()
-        print(shapes)
-        self.load_labels(shapes)
-        self.canvas.verified = t_yolo_parse_reader.verified
+        reader = label_format.read(annotation_path, file_path, self.image)
+        self.load_labels(reader.get_shapes())
+        self.canvas.verified = reader.verified
 
-    def load_create_ml_json_by_filename(self, json_path, file_path):
-        if self.file_path is None:
-            return
-        if os.path.isfile(json_path) is False:
+    def copy_previous_bounding_boxes(self):
+        if self.file_path is None or self.cur_img_idx < 1:
             return
+        prev_file_path = self.m_img_list[self.cur_img_idx - 1]
+        self.clear_labels()
+        # 上一张图像的标注仍在内存中时直接使用，否则从磁盘读取
+        snapshot_path, shapes = self._previous_shapes
+        if snapshot_path == prev_file_path:
+            self.load_labels(shapes)
+        else:
+            self.show_bounding_box_from_annotation_file(prev_file_path)
+        self.save_file()
 
-        self.set_format(FORMAT_CREATEML)
+    def current_shape_tuples(self):
+        return [(s.label, [(p.x(), p.y()) for p in s.points], s.line_color.getRgb(), s.fill_color.getRgb(),
+                 s.difficult) for s in self.canvas.shapes]
 
-        create_ml_parse_reader = CreateMLReader(json_path, file_path)
-        shapes = create_ml_parse_reader.get_shapes()
-        self.load_labels(shapes)
-        self.canvas.verified = create_ml_parse_reader.verified
+    def clear_labels(self):
+        self.canvas.load_shapes([])
+        self.items_to_shapes.clear()
+        self.shapes_to_items.clear()
+        self.label_items.clear()
+        self.label_hist.clear_counts()
+        self.label_list.clear()
+        self.undo_stack.clear()
+        self.update_undo_actions()
 
-    def copy_previous_bounding_boxes(self):
-        current_index = self.m_img_list.index(self.file_path)
-        if current_index - 1 >= 0:
-            prev_file_path = self.m_img_list[current_index - 1]
-            self.show_bounding_box_from_annotation_file(prev_file_path)
-            self.save_file()
+    def propagate_boxes(self, _value=False):
+        if self.file_path is None or not self.canvas.shapes:
+            return
+        count, ok = QInputDialog.getInt(self, '%s - 传播标注框' % __appname__,
+                                        '将当前标注框复制到后续多少张图像:', 5, 1, max(1, self.img_count))
+        if ok:
+            self.propagate_shapes(count)
+
+    def propagate_shapes(self, count):
+        """把当前标注框写入后续 count 张尚无标注的图像，写入在后台队列中完成"""
+        shapes = self.format_shapes()
+        class_list = self.class_list_snapshot(shapes)
+        written = skipped = 0
+        for image_path in self.m_img_list[self.cur_img_idx + 1:self.cur_img_idx + 1 + count]:
+            base = self.annotation_base_path(image_path)
+            if any(os.path.isfile(base + label_format.ext) for label_format in formats()):
+                skipped += 1
+                continue
+            # 只读取文件头获得尺寸，不解码整张图像
+            reader = QImageReader(image_path)
+            size = reader.size()
+            if not size.isValid():
+                skipped += 1
+                continue
+            gray = reader.imageFormat() in (QImage.Format_Grayscale8, QImage.Format_Grayscale16,
+                                            QImage.Format_Mono, QImage.Format_MonoLSB)
+            image_shape = [size.height(), size.width(), 1 if gray else 3]
+            clipped = clip_shapes(shapes, size.width(), size.height())
+            annotation_path, save = self.label_save_job(LabelFile(), base, clipped, image_path, None,
+                                                        image_shape, class_list)
+            self.save_queue.submit(annotation_path, image_path, save)
+            written += 1
+        self.status('已复制到 %d 张图像，跳过 %d 张' % (written, skipped))
+        return written, skipped
+
+    def annotation_base_path(self, image_path):
+        save_dir = self.default_save_dir or os.path.dirname(image_path)
+        return os.path.join(save_dir, os.path.splitext(os.path.basename(image_path))[0])
 
     def toggle_paint_labels_option(self):
         for shape in self.canvas.shapes:
@@ -1658,6 +1973,17 @@ class MainWindow(QMainWindow, WindowMixin):
         self.canvas.set_drawing_shape_to_square(self.draw_squares_option.isChecked())
 
 
+def clip_shapes(shapes, width, height):
+    """把格式化后的标注框裁剪到 width x height 的图像内，丢弃完全落在外面的框"""
+    clipped = []
+    for shape in shapes:
+        points = [(min(max(x, 0), width), min(max(y, 0), height)) for x, y in shape['points']]
+        xs, ys = [p[0] for p in points], [p[1] for p in points]
+        if max(xs) > min(xs) and max(ys) > min(ys):
+            clipped.append(dict(shape, points=points))
+    return clipped
+
+
 def inverted(color):
     return QColor(*[255 - v for v in color.getRgb()])
 
@@ -1675,7 +2001,7 @@ def get_main_app(argv=None):
     """标准Qt应用程序代码"""
     if not argv:
         argv = []
-    app = QApplication(argv)
+    app = QApplication.instance() or QApplication(argv)
     app.setApplicationName(__appname__)
     app.setWindowIcon(new_icon("app"))
 
@@ -1699,6 +2025,8 @@ def get_main_app(argv=None):
 
 def main():
     """构建主应用并运行"""
+    # 打包后的程序中，批量修改类别使用的 spawn 子进程需要它
+    multiprocessing.freeze_support()
     app, _win = get_main_app(sys.argv)
     return app.exec()
 
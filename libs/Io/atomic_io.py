@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+import os
+import tempfile
+from contextlib import contextmanager
+
+
+def _current_umask():
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+# 读取 umask 需要临时修改它，只在导入时读一次，避免与其他线程创建文件竞争
+_UMASK = _current_umask()
+
+
+@contextmanager
+def atomic_write(path, mode='w', encoding=None, newline=None):
+    """
+    Open a temporary file next to ``path`` for writing and move it over
+    ``path`` when the block exits without an exception, so readers never see
+    a half-written annotation file. The result keeps the permissions of the
+    file it replaces; a new file gets the usual ``0o666 & ~umask``, not the
+    owner-only mode of the temporary file. ``encoding`` and ``newline`` are
+    passed to ``open``.
+    """
+    fd, temp_path = _temp_file(path)
+    try:
+        with os.fdopen(fd, mode, encoding=encoding, newline=newline) as f:
+            yield f
+        _copy_permissions(temp_path, path)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def stage_file(path, data, mode='w', encoding=None, newline=None):
+    """
+    Write ``data`` to a temporary file next to ``path``, with the permissions
+    ``atomic_write`` would give it, and return the temporary path. The caller
+    moves it into place with ``os.replace`` or deletes it, so several files
+    can be prepared before any of them is replaced.
+    """
+    fd, temp_path = _temp_file(path)
+    try:
+        with os.fdopen(fd, mode, encoding=encoding, newline=newline) as f:
+            f.write(data)
+        _copy_permissions(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return temp_path
+
+
+def _temp_file(path):
+    directory = os.path.dirname(os.path.abspath(path))
+    return tempfile.mkstemp(dir=directory, prefix='.%s.' % os.path.basename(path), suffix='.tmp')
+
+
+def _copy_permissions(temp_path, path):
+    try:
+        permissions = os.stat(path).st_mode & 0o7777
+    except OSError:
+        permissions = 0o666 & ~_UMASK
+    os.chmod(temp_path, permissions)
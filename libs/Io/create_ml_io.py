@@ -1,14 +1,247 @@
 #!/usr/bin/env python
 # -*- coding: utf8 -*-
 import json
-from pathlib import Path
+import threading
+from collections import OrderedDict
 
+from libs.Io.atomic_io import atomic_write
 from libs.constants import DEFAULT_ENCODING
 import os
 
-JSON_EXT = '.json'
+JOURNAL_EXT = '.journal'
 ENCODE_METHOD = DEFAULT_ENCODING
 
+# Stores with at most this many images are rewritten on every save.
+SMALL_STORE = 64
+# Otherwise the journal is folded back once it holds this many records,
+# or a quarter of the image count if that is larger.
+COMPACT_MIN_RECORDS = 64
+# Stores kept open by get_store; the least recently used one is closed beyond this.
+MAX_OPEN_STORES = 8
+
+
+class CreateMLStore(object):
+    """
+    In-memory copy of one CreateML JSON file, indexed by image name.
+
+    Entries keep their order in the file. If an image is listed more than
+    once, every entry is kept; lookups and saves use the first one, as the
+    original read-modify-write did. A save replaces one image entry. For small files the JSON is
+    rewritten at once. For large files the entry is appended as one line to
+    ``<file>.journal``, so a save does not re-read or re-serialize the whole
+    dataset. ``compact`` writes the standard CreateML list back to the JSON
+    file and removes the journal. It runs when the journal grows past a
+    fraction of the dataset, and on ``close``. Journal entries left over
+    from a crash are replayed the next time the file is opened. If the last
+    line was only partly written, the file is compacted right away so that
+    later appends do not land on the torn line.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.journal_path = self.path + JOURNAL_EXT
+        self._lock = threading.RLock()
+        self.load()
+
+    @staticmethod
+    def _file_key(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _disk_key(self):
+        return self._file_key(self.path), self._file_key(self.journal_path)
+
+    def load(self):
+        with self._lock:
+            self.entries = []
+            self._positions = {}
+            if os.path.isfile(self.path):
+                with open(self.path, 'r', encoding=ENCODE_METHOD) as f:
+                    self.entries = json.load(f)
+                for position, entry in enumerate(self.entries):
+                    self._positions.setdefault(entry['image'], position)
+            self.journal_records = 0
+            torn = False
+            if os.path.isfile(self.journal_path):
+                with open(self.journal_path, 'r', encoding=ENCODE_METHOD) as f:
+                    for line in f:
+                        try:
+                            if not line.endswith('\n'):
+                                raise ValueError('unterminated record')
+                            entry = json.loads(line)
+                        except ValueError:
+                            # 崩溃时写了一半的最后一行
+                            torn = True
+                            break
+                        self._replace(entry)
+                        self.journal_records += 1
+            if torn:
+                # 否则下一次追加会接在残缺行之后，重新加载时连同新记录一起丢失
+                self.compact()
+            self.disk_key = self._disk_key()
+
+    def is_stale(self):
+        """
+        True if the JSON file or its journal changed (mtime or size) since
+        this store last read or wrote them, i.e. someone else modified them.
+        """
+        return self._disk_key() != self.disk_key
+
+    def _replace(self, entry):
+        position = self._positions.get(entry['image'])
+        if position is None:
+            self._positions[entry['image']] = len(self.entries)
+            self.entries.append(entry)
+        else:
+            self.entries[position] = entry
+
+    def get(self, image):
+        with self._lock:
+            position = self._positions.get(image)
+            return None if position is None else self.entries[position]
+
+    def images(self):
+        with self._lock:
+            return list(self.entries)
+
+    def put(self, entry):
+        with self._lock:
+            self._replace(entry)
+            if len(self.entries) <= SMALL_STORE or self.disk_key[0] is None:
+                self.compact()
+                return
+            with open(self.journal_path, 'a', encoding=ENCODE_METHOD) as f:
+                f.write(json.dumps(entry) + '\n')
+            self.journal_records += 1
+            self.disk_key = self._disk_key()
+            if self.journal_records >= max(COMPACT_MIN_RECORDS, len(self.entries) // 4):
+                self.compact()
+
+    def compact(self):
+        with self._lock:
+            write_create_ml_stream(self.path, self.entries)
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+            self.journal_records = 0
+            self.disk_key = self._disk_key()
+
+    def close(self):
+        with self._lock:
+            if self.journal_records:
+                self.compact()
+
+
+def write_create_ml_stream(path, entries):
+    """
+    Write the image ``entries`` (any iterable, e.g. a generator) as a
+    CreateML JSON array, one entry at a time, so memory use does not grow
+    with the dataset. The bytes match ``json.dumps(list(entries))``. The file
+    is replaced atomically once complete. Returns the number of entries.
+    """
+    count = 0
+    with atomic_write(path, encoding=ENCODE_METHOD) as out_file:
+        out_file.write('[')
+        for entry in entries:
+            if count:
+                out_file.write(', ')
+            out_file.write(json.dumps(entry))
+            count += 1
+        out_file.write(']')
+    return count
+
+
+def iter_create_ml(path, chunk_size=1 << 16):
+    """
+    Yield the image entries of a CreateML JSON file one at a time, reading
+    it in chunks of ``chunk_size`` characters rather than loading the whole
+    document. Raises ``ValueError`` if the file is not a JSON array of objects.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding=ENCODE_METHOD) as f:
+        buf, pos, eof = '', 0, False
+
+        def fill():
+            nonlocal buf, pos, eof
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+
+        def next_char(skip):
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos] in skip:
+                    pos += 1
+                if pos < len(buf):
+                    return buf[pos]
+                if eof:
+                    return ''
+                fill()
+
+        if next_char(' \t\r\n') != '[':
+            raise ValueError('%s is not a JSON array' % path)
+        pos += 1
+        while True:
+            char = next_char(' \t\r\n')
+            if char == ']':
+                return
+            if char != '{':
+                raise ValueError('Unexpected %r in %s' % (char or 'end of file', path))
+            while True:
+                try:
+                    entry, end = decoder.raw_decode(buf, pos)
+                    break
+                except ValueError:
+                    # 条目跨越了读取块的边界
+                    if eof:
+                        raise
+                    fill()
+            pos = end
+            yield entry
+            char = next_char(' \t\r\n')
+            if char == ',':
+                pos += 1
+            elif char != ']':
+                raise ValueError('Expected "," or "]" in %s' % path)
+
+
+_stores = OrderedDict()
+_stores_lock = threading.Lock()
+
+
+def get_store(path):
+    """
+    Shared ``CreateMLStore`` for ``path``, reloaded if the file changed on
+    disk. At most ``MAX_OPEN_STORES`` stay open; the least recently used
+    one is closed, which flushes its journal, when another is opened.
+    """
+    path = os.path.abspath(path)
+    evicted = []
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = CreateMLStore(path)
+            while len(_stores) > MAX_OPEN_STORES:
+                evicted.append(_stores.popitem(last=False)[1])
+        else:
+            _stores.move_to_end(path)
+            if store.is_stale():
+                store.load()
+    for old in evicted:
+        old.close()
+    return store
+
+
+def close_stores():
+    """Compact every open store, leaving only standard CreateML files on disk."""
+    with _stores_lock:
+        stores = list(_stores.values())
+        _stores.clear()
+    for store in stores:
+        store.close()
+
 
 class CreateMLWriter:
     def __init__(self, folder_name, filename, img_size, shapes, output_file, database_src='Unknown',
@@ -24,13 +257,11 @@ class CreateMLWriter:
         self.output_file = output_file
 
     def write(self):
-        if os.path.isfile(self.output_file):
-            with open(self.output_file, "r") as file:
-                input_data = file.read()
-                output_dict = json.loads(input_data)
-        else:
-            output_dict = []
+        # replaces the entry for this image, or appends it
+        get_store(self.output_file).put(self.image_entry())
 
+    def image_entry(self):
+        """The CreateML entry for this image."""
         output_image_dict = {
             "image": self.filename,
             "verified": self.verified,
@@ -57,19 +288,7 @@ class CreateMLWriter:
                 }
             }
             output_image_dict["annotations"].append(shape_dict)
-
-        # check if image already in output
-        exists = False
-        for i in range(0, len(output_dict)):
-            if output_dict[i]["image"] == output_image_dict["image"]:
-                exists = True
-                output_dict[i] = output_image_dict
-                break
-
-        if not exists:
-            output_dict.append(output_image_dict)
-
-        Path(self.output_file).write_text(json.dumps(output_dict), ENCODE_METHOD)
+        return output_image_dict
 
     def calculate_coordinates(self, x1, x2, y1, y2):
         if x1 < x2:
@@ -106,21 +325,16 @@ class CreateMLReader:
             print("JSON decoding failed")
 
     def parse_json(self):
-        with open(self.json_path, "r") as file:
-            input_data = file.read()
-
-        # Returns a list
-        output_list = json.loads(input_data)
-
-        if output_list:
-            self.verified = output_list[0].get("verified", False)
+        # 通过进程内共享的索引按文件名查找，文件（含日志）未变化时不重新解析；
+        # 索引包含尚未合并进 JSON 文件的日志记录
+        image = get_store(self.json_path).get(self.filename)
 
         if len(self.shapes) > 0:
             self.shapes = []
-        for image in output_list:
-            if image["image"] == self.filename:
-                for shape in image["annotations"]:
-                    self.add_shape(shape["label"], shape["coordinates"])
+        if image is not None:
+            self.verified = image.get("verified", False)
+            for shape in image["annotations"]:
+                self.add_shape(shape["label"], shape["coordinates"])
 
     def add_shape(self, label, bnd_box):
         x_min = bnd_box["x"] - (bnd_box["width"] / 2)
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+Image dimensions without decoding pixels.
+
+``probe_image_size`` reads only the file header through Pillow, so
+annotation readers and writers can run headless (no ``QGuiApplication``)
+and without decoding images. Results are cached by path, modification
+time and size.
+"""
+import os
+
+# Pillow modes that labelImg's QImage path reports as grayscale.
+GRAYSCALE_MODES = frozenset(('1', 'L', 'I', 'I;16', 'I;16B', 'I;16L', 'F'))
+
+_sizes = {}
+
+
+def probe_image_size(path):
+    """
+    Return ``[height, width, depth]`` of the image at ``path``, where depth
+    is 1 for grayscale images and 3 otherwise. Raises ``OSError`` if the file
+    cannot be read or its format is not recognised.
+    """
+    from PIL import Image
+
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _sizes.get(path)
+    if cached is not None and cached[0] == key:
+        return list(cached[1])
+    # Image.open 只解析文件头，像素数据在访问前不会被解码
+    try:
+        with Image.open(path) as image:
+            width, height = image.size
+            depth = 1 if image.mode in GRAYSCALE_MODES else 3
+    except Image.DecompressionBombError as e:
+        raise OSError(str(e))
+    _sizes[path] = (key, (height, width, depth))
+    return [height, width, depth]
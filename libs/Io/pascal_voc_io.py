@@ -1,16 +1,42 @@
 #!/usr/bin/env python
 # -*- coding: utf8 -*-
-import codecs
+import re
 from xml.etree import ElementTree
 from xml.etree.ElementTree import Element, SubElement
 
 from lxml import etree
 
-from libs.constants import DEFAULT_ENCODING
+from libs.Io.atomic_io import atomic_write
+from libs.constants import DEFAULT_ENCODING, XML_EXT
 
-XML_EXT = '.xml'
 ENCODE_METHOD = DEFAULT_ENCODING
 
+# Characters lxml refuses in text; the old round trip failed on them as well.
+_INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]')
+
+
+def _xml_text(value):
+    """
+    Escape ``value`` exactly as the former ElementTree -> lxml pretty-print
+    round trip did: line ends normalised by the XML parser, ``&<>`` escaped
+    and every pair of spaces turned into a tab.
+    """
+    text = str(value)
+    if _INVALID_XML_CHARS.search(text):
+        raise ValueError('All strings must be XML compatible: %r' % text)
+    return (text.replace('\r\n', '\n').replace('\r', '\n')
+            .replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+            .replace('  ', '\t'))
+
+
+def _leaf(indent, tag, value):
+    if value is None:
+        return '%s<%s/>\n' % (indent, tag)
+    text = _xml_text(value)
+    if not text:
+        return '%s<%s/>\n' % (indent, tag)
+    return '%s<%s>%s</%s>\n' % (indent, tag, text, tag)
+
 
 class PascalVocWriter:
 
@@ -91,14 +117,7 @@ class PascalVocWriter:
             pose = SubElement(object_item, 'pose')
             pose.text = "Unspecified"
             truncated = SubElement(object_item, 'truncated')
-            if int(float(each_object['ymax'])) == int(float(self.img_size[0])) or (
-                    int(float(each_object['ymin'])) == 1):
-                truncated.text = "1"  # max == height or min
-            elif (int(float(each_object['xmax'])) == int(float(self.img_size[1]))) or (
-                    int(float(each_object['xmin'])) == 1):
-                truncated.text = "1"  # max == width or min
-            else:
-                truncated.text = "0"
+            truncated.text = "1" if self.is_truncated(each_object) else "0"
             difficult = SubElement(object_item, 'difficult')
             difficult.text = str(bool(each_object['difficult']) & 1)
             bnd_box = SubElement(object_item, 'bndbox')
@@ -111,19 +130,56 @@ class PascalVocWriter:
             y_max = SubElement(bnd_box, 'ymax')
             y_max.text = str(each_object['ymax'])
 
+    def is_truncated(self, each_object):
+        if int(float(each_object['ymax'])) == int(float(self.img_size[0])) or (
+                int(float(each_object['ymin'])) == 1):
+            return True  # max == height or min
+        return (int(float(each_object['xmax'])) == int(float(self.img_size[1]))) or (
+                int(float(each_object['xmin'])) == 1)  # max == width or min
+
+    def serialize(self):
+        """
+            Return the document as text in a single pass over the fixed VOC
+            layout. The result is identical to prettify(gen_xml() + objects).
+        """
+        if self.filename is None or self.folder_name is None or self.img_size is None:
+            return None
+        parts = ['<annotation verified="yes">\n' if self.verified else '<annotation>\n',
+                 _leaf('\t', 'folder', self.folder_name),
+                 _leaf('\t', 'filename', self.filename)]
+        if self.local_img_path is not None:
+            parts.append(_leaf('\t', 'path', self.local_img_path))
+        parts += ['\t<source>\n', _leaf('\t\t', 'database', self.database_src), '\t</source>\n',
+                  '\t<size>\n',
+                  _leaf('\t\t', 'width', self.img_size[1]),
+                  _leaf('\t\t', 'height', self.img_size[0]),
+                  _leaf('\t\t', 'depth', self.img_size[2] if len(self.img_size) == 3 else 1),
+                  '\t</size>\n',
+                  '\t<segmented>0</segmented>\n']
+        for each_object in self.box_list:
+            parts += ['\t<object>\n',
+                      _leaf('\t\t', 'name', each_object['name']),
+                      '\t\t<pose>Unspecified</pose>\n',
+                      '\t\t<truncated>%d</truncated>\n' % self.is_truncated(each_object),
+                      '\t\t<difficult>%s</difficult>\n' % (bool(each_object['difficult']) & 1),
+                      '\t\t<bndbox>\n',
+                      _leaf('\t\t\t', 'xmin', each_object['xmin']),
+                      _leaf('\t\t\t', 'ymin', each_object['ymin']),
+                      _leaf('\t\t\t', 'xmax', each_object['xmax']),
+                      _leaf('\t\t\t', 'ymax', each_object['ymax']),
+                      '\t\t</bndbox>\n',
+                      '\t</object>\n']
+        parts.append('</annotation>\n')
+        return ''.join(parts)
+
     def save(self, target_file=None):
-        root = self.gen_xml()
-        self.append_objects(root)
-        out_file = None
         if target_file is None:
-            out_file = codecs.open(
-                self.filename + XML_EXT, 'w', encoding=ENCODE_METHOD)
-        else:
-            out_file = codecs.open(target_file, 'w', encoding=ENCODE_METHOD)
+            target_file = self.filename + XML_EXT
 
-        prettify_result = self.prettify(root)
-        out_file.write(prettify_result.decode('utf8'))
-        out_file.close()
+        result = self.serialize()
+        # 与原先 codecs.open 的输出一致，任何平台上都写 LF 换行
+        with atomic_write(target_file, encoding=ENCODE_METHOD, newline='\n') as out_file:
+            out_file.write(result)
 
 
 class PascalVocReader:
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+Bulk reading of Pascal VOC annotations into columnar arrays.
+
+``read_voc_dataset`` is meant for training-data preparation, where the number
+of files makes one ``PascalVocReader`` per file too slow. Files are parsed
+with lxml ``iterparse`` in chunks, on a process pool when there are enough of
+them. Workers send back compact ``array`` buffers rather than Python tuples.
+The result is one NumPy array per column, with one row per box.
+
+A file that cannot be parsed contributes no rows; its path and error message
+are listed in ``errors`` instead of being dropped silently.
+
+NumPy is optional for labelImg itself but required here.
+"""
+from array import array
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from lxml import etree
+
+# Below this many files the pool start-up costs more than it saves.
+MIN_FILES_FOR_POOL = 256
+CHUNK_SIZE = 512
+
+VocDataset = namedtuple('VocDataset', ['paths', 'classes', 'image_index', 'class_id',
+                                       'xmin', 'ymin', 'xmax', 'ymax', 'difficult', 'errors'])
+VocDataset.__doc__ = """
+Boxes of a VOC dataset, one array element per box.
+
+``image_index`` points into ``paths`` and ``class_id`` into ``classes``.
+Class ids follow the order in which labels first appear. Coordinates are
+float32 and ``difficult`` is bool. ``errors`` lists ``(path, message)``
+for files that could not be read.
+"""
+
+
+def _parse_objects(path):
+    """Yield ``(label, xmin, ymin, xmax, ymax, difficult)`` for each object in one file."""
+    for _, obj in etree.iterparse(path, events=('end',), tag='object'):
+        label = None
+        difficult = False
+        box = {}
+        for child in obj:
+            tag = child.tag
+            if tag == 'name':
+                label = child.text
+            elif tag == 'difficult':
+                difficult = bool(int(child.text))
+            elif tag == 'bndbox':
+                for value in child:
+                    box[value.tag] = value.text
+        if label is None:
+            raise ValueError('object without a name')
+        yield label, float(box['xmin']), float(box['ymin']), float(box['xmax']), float(box['ymax']), difficult
+        obj.clear()
+
+
+def _read_chunk(start, paths):
+    """
+    Parse ``paths`` (numbered from ``start``) and return local columns:
+    the chunk's own class list, image indices, local class ids, coordinates
+    (four per box), difficult flags and errors.
+    """
+    classes = {}
+    image_index, class_id, coords, difficult = array('i'), array('i'), array('f'), array('b')
+    errors = []
+    for index, path in enumerate(paths, start):
+        try:
+            objects = list(_parse_objects(path))
+        except Exception as e:
+            errors.append((path, '%s: %s' % (type(e).__name__, e)))
+            continue
+        for label, x_min, y_min, x_max, y_max, flag in objects:
+            image_index.append(index)
+            class_id.append(classes.setdefault(label, len(classes)))
+            coords.extend((x_min, y_min, x_max, y_max))
+            difficult.append(flag)
+    return list(classes), image_index, class_id, coords, difficult, errors
+
+
+def read_voc_dataset(paths, workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Read the VOC files in ``paths`` and return a ``VocDataset``.
+    ``workers`` is the process count (``None`` for one per CPU). With
+    ``workers=1``, or only a few files, everything is parsed in this process.
+    """
+    if np is None:
+        raise ImportError('read_voc_dataset requires numpy')
+    paths = list(paths)
+    chunks = [(start, paths[start:start + chunk_size]) for start in range(0, len(paths), chunk_size)]
+    if workers == 1 or len(paths) < MIN_FILES_FOR_POOL:
+        results = [_read_chunk(start, chunk) for start, chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_read_chunk, *zip(*chunks)))
+
+    classes = {}
+    image_index, class_id, coords, difficult, errors = [], [], [], [], []
+    for local_classes, chunk_images, chunk_classes, chunk_coords, chunk_difficult, chunk_errors in results:
+        # 各块的类别编号是局部的，按首次出现顺序映射到全局编号
+        remap = np.array([classes.setdefault(label, len(classes)) for label in local_classes], dtype=np.int32)
+        image_index.append(np.frombuffer(chunk_images, dtype=np.intc))
+        class_id.append(remap[np.frombuffer(chunk_classes, dtype=np.intc)] if len(remap) else
+                        np.zeros(0, dtype=np.int32))
+        coords.append(np.frombuffer(chunk_coords, dtype=np.float32))
+        difficult.append(np.frombuffer(chunk_difficult, dtype=np.int8))
+        errors.extend(chunk_errors)
+
+    def join(parts, dtype):
+        return np.concatenate(parts).astype(dtype, copy=False) if parts else np.zeros(0, dtype=dtype)
+
+    coords = join(coords, np.float32).reshape(-1, 4)
+    return VocDataset(paths=paths, classes=list(classes),
+                      image_index=join(image_index, np.int32), class_id=join(class_id, np.int32),
+                      xmin=np.ascontiguousarray(coords[:, 0]), ymin=np.ascontiguousarray(coords[:, 1]),
+                      xmax=np.ascontiguousarray(coords[:, 2]), ymax=np.ascontiguousarray(coords[:, 3]),
+                      difficult=join(difficult, bool), errors=errors)
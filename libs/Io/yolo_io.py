@@ -1,12 +1,105 @@
 #!/usr/bin/env python
 # -*- coding: utf8 -*-
-import codecs
 import os
+from collections import namedtuple
 
-from libs.constants import DEFAULT_ENCODING
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from libs.Io.atomic_io import atomic_write
+from libs.Io.image_meta import probe_image_size
+from libs.constants import DEFAULT_ENCODING, TXT_EXT
 
-TXT_EXT = '.txt'
 ENCODE_METHOD = DEFAULT_ENCODING
+CLASSES_FILE = 'classes.txt'
+
+
+class ClassList(object):
+    """
+    Ordered class names with a name -> index dict. It supports the list
+    operations the YOLO code uses (``append``, ``index``, ``in``, iteration,
+    indexing), each in constant time.
+    """
+    __slots__ = ('names', '_ids')
+
+    def __init__(self, names=()):
+        self.names = []
+        self._ids = {}
+        for name in names:
+            self.intern(name)
+
+    def intern(self, name):
+        """Return the index of ``name``, appending it if it is new."""
+        index = self._ids.get(name)
+        if index is None:
+            index = self._ids[name] = len(self.names)
+            self.names.append(name)
+        return index
+
+    def append(self, name):
+        self.intern(name)
+
+    def index(self, name):
+        index = self._ids.get(name)
+        if index is None:
+            raise ValueError('%r is not in the class list' % (name,))
+        return index
+
+    def __contains__(self, name):
+        return name in self._ids
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, index):
+        return self.names[index]
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return 'ClassList(%r)' % self.names
+
+
+# classes.txt 路径 -> ((mtime_ns, size), ClassList)；文件未变化时不再重新读取
+_class_lists = {}
+
+
+def _class_list_key(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_class_list(path):
+    """
+    Return the ``ClassList`` stored in ``path``. The result is shared between
+    callers and must not be modified; it is re-read only when the file's
+    modification time or size changes.
+    """
+    path = os.path.abspath(path)
+    key = _class_list_key(path)
+    cached = _class_lists.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    with open(path, 'r') as f:
+        text = f.read().strip('\n')
+    classes = ClassList(text.split('\n') if text else ())
+    _class_lists[path] = (key, classes)
+    return classes
+
+
+def save_class_list(path, class_list):
+    """Write ``class_list`` to ``path`` and keep a copy in the cache so it is not read back."""
+    path = os.path.abspath(path)
+    classes = ClassList(class_list)
+    with atomic_write(path) as f:
+        f.write(''.join(c + '\n' for c in classes))
+    _class_lists[path] = (_class_list_key(path), classes)
 
 
 class YOLOWriter:
@@ -40,68 +133,143 @@ class YOLOWriter:
 
         # PR387
         box_name = box['name']
-        if box_name not in class_list:
-            class_list.append(box_name)
-
-        class_index = class_list.index(box_name)
+        intern = getattr(class_list, 'intern', None)
+        if intern is not None:
+            class_index = intern(box_name)
+        else:
+            if box_name not in class_list:
+                class_list.append(box_name)
+            class_index = class_list.index(box_name)
 
         return class_index, x_center, y_center, w, h
 
     def save(self, class_list=[], target_file=None):
 
-        out_file = None  # Update yolo .txt
-        out_class_file = None  # Update class list .txt
-
         if target_file is None:
-            out_file = open(
-                self.filename + TXT_EXT, 'w', encoding=ENCODE_METHOD)
-            classes_file = os.path.join(os.path.dirname(os.path.abspath(self.filename)), "classes.txt")
-            out_class_file = open(classes_file, 'w')
-
-        else:
-            out_file = codecs.open(target_file, 'w', encoding=ENCODE_METHOD)
-            classes_file = os.path.join(os.path.dirname(os.path.abspath(target_file)), "classes.txt")
-            out_class_file = open(classes_file, 'w')
-
+            target_file = self.filename + TXT_EXT
+        classes_file = os.path.join(os.path.dirname(os.path.abspath(target_file)), CLASSES_FILE)
+        # 磁盘上的 classes.txt 决定已有类别的编号（可能已被其他标注者扩充），
+        # 内存中的新类别追加在其后
+        try:
+            on_disk = load_class_list(classes_file)
+        except FileNotFoundError:
+            on_disk = ClassList()
+        classes = ClassList(on_disk)
+        for name in class_list:
+            classes.intern(name)
+
+        lines = []
         for box in self.box_list:
-            class_index, x_center, y_center, w, h = self.bnd_box_to_yolo_line(box, class_list)
-            # print (classIndex, x_center, y_center, w, h)
-            out_file.write("%d %.6f %.6f %.6f %.6f\n" % (class_index, x_center, y_center, w, h))
-
-        # print (classList)
-        # print (out_class_file)
-        for c in class_list:
-            out_class_file.write(c + '\n')
-
-        out_class_file.close()
-        out_file.close()
+            class_index, x_center, y_center, w, h = self.bnd_box_to_yolo_line(box, classes)
+            lines.append("%d %.6f %.6f %.6f %.6f\n" % (class_index, x_center, y_center, w, h))
+
+        # 只在类别增加时重写 classes.txt，并先于标注文件写入，读者不会看到越界的编号
+        if len(classes) > len(on_disk) or not os.path.isfile(classes_file):
+            save_class_list(classes_file, classes)  # Update class list .txt
+        with atomic_write(target_file, encoding=ENCODE_METHOD, newline='\n') as out_file:  # Update yolo .txt
+            out_file.write(''.join(lines))
+
+        # 调用方的列表补上文件中和新出现的类别
+        if hasattr(class_list, 'intern'):
+            for name in classes:
+                class_list.intern(name)
+        else:
+            known = set(class_list)
+            class_list.extend(name for name in classes if name not in known)
+
+
+def parse_yolo_text(text):
+    """
+    Parse YOLO label text into an (N, 5) float array of
+    ``class, x_center, y_center, w, h`` rows. Blank lines are skipped and
+    columns after the fifth are ignored. Requires NumPy.
+    """
+    rows = [row for row in map(str.split, text.splitlines()) if row]
+    # 列数逐行检查：只比较总数会把参差不齐的行拼接成错误的框
+    if any(len(row) != 5 for row in rows):
+        for row in rows:
+            if len(row) < 5:
+                raise ValueError('YOLO line has %d columns, expected 5' % len(row))
+        rows = [row[:5] for row in rows]
+    return np.array(rows, dtype=np.float64).reshape(-1, 5)
+
+
+def read_yolo_array(path):
+    with open(path, 'r', encoding=ENCODE_METHOD) as f:
+        return parse_yolo_text(f.read())
+
+
+def yolo_to_boxes(rows, img_size):
+    """
+    Clip normalised ``rows`` to the image and scale them to pixels. Returns
+    class indices and an (N, 4) array of ``x_min, y_min, x_max, y_max``
+    rounded like ``round()``.
+    """
+    height, width = img_size[0], img_size[1]
+    centers, half = rows[:, 1:3], rows[:, 3:5] / 2
+    scale = np.array([width, height], dtype=np.float64)
+    mins = np.rint(np.maximum(centers - half, 0) * scale)
+    maxs = np.rint(np.minimum(centers + half, 1) * scale)
+    return rows[:, 0].astype(np.int64), np.hstack((mins, maxs)).astype(np.int64)
+
+
+YoloDataset = namedtuple('YoloDataset', ['paths', 'image_index', 'rows', 'errors'])
+
+
+def read_yolo_dataset(paths):
+    """
+    Read YOLO label files into one (N, 5) array. ``image_index`` maps each
+    row to its file in ``paths``. Files that cannot be read are listed in
+    ``errors`` as ``(path, message)`` and add no rows. Requires NumPy.
+    """
+    paths = list(paths)
+    arrays, indices, errors = [], [], []
+    for index, path in enumerate(paths):
+        try:
+            rows = read_yolo_array(path)
+        except (OSError, ValueError) as e:
+            errors.append((path, '%s: %s' % (type(e).__name__, e)))
+            continue
+        arrays.append(rows)
+        indices.append(np.full(len(rows), index, dtype=np.int32))
+    if not arrays:
+        return YoloDataset(paths, np.zeros(0, dtype=np.int32), np.zeros((0, 5)), errors)
+    return YoloDataset(paths, np.concatenate(indices), np.concatenate(arrays), errors)
 
 
 class YoloReader:
 
-    def __init__(self, file_path, image, class_list_path=None):
+    def __init__(self, file_path, image=None, class_list_path=None, image_size=None):
+        """
+        The image dimensions come from ``image_size`` (``[height, width,
+        depth]``) when given, otherwise from ``image``. That is either a
+        QImage or the path of the image file, whose header is probed without
+        decoding it.
+        """
         # shapes type:
         # [labbel, [(x1,y1), (x2,y2), (x3,y3), (x4,y4)], color, color, difficult]
-        self.shapes = []
+        self._shapes = None
+        self.boxes = None
         self.file_path = file_path
 
         if class_list_path is None:
             dir_path = os.path.dirname(os.path.realpath(self.file_path))
-            self.class_list_path = os.path.join(dir_path, "classes.txt")
+            self.class_list_path = os.path.join(dir_path, CLASSES_FILE)
         else:
             self.class_list_path = class_list_path
 
-        # print (file_path, self.class_list_path)
-
-        classes_file = open(self.class_list_path, 'r')
-        self.classes = classes_file.read().strip('\n').split('\n')
+        self.classes = load_class_list(self.class_list_path)
 
         # print (self.classes)
 
-        img_size = [image.height(), image.width(),
-                    1 if image.isGrayscale() else 3]
-
-        self.img_size = img_size
+        if image_size is None:
+            if isinstance(image, str):
+                image_size = probe_image_size(image)
+            elif image is not None:
+                image_size = [image.height(), image.width(), 1 if image.isGrayscale() else 3]
+            else:
+                raise ValueError('YoloReader needs an image, an image path or image_size')
+        self.img_size = list(image_size)
 
         self.verified = False
         # try:
@@ -109,6 +277,17 @@ class YoloReader:
         # except:
         #     pass
 
+    @property
+    def shapes(self):
+        # 形状元组只在界面需要时才由数组生成
+        if self._shapes is None:
+            self._shapes = []
+            if self.boxes is not None:
+                class_ids, boxes = self.boxes
+                for class_index, (x_min, y_min, x_max, y_max) in zip(class_ids.tolist(), boxes.tolist()):
+                    self.add_shape(self.classes[class_index], x_min, y_min, x_max, y_max, False)
+        return self._shapes
+
     def get_shapes(self):
         return self.shapes
 
@@ -133,10 +312,20 @@ class YoloReader:
         return label, x_min, y_min, x_max, y_max
 
     def parse_yolo_format(self):
-        bnd_box_file = open(self.file_path, 'r')
-        for bndBox in bnd_box_file:
-            class_index, x_center, y_center, w, h = bndBox.strip().split(' ')
-            label, x_min, y_min, x_max, y_max = self.yolo_line_to_shape(class_index, x_center, y_center, w, h)
-
-            # Caveat: difficult flag is discarded when saved as yolo format.
-            self.add_shape(label, x_min, y_min, x_max, y_max, False)
+        if np is not None:
+            rows = read_yolo_array(self.file_path)
+            self.boxes = yolo_to_boxes(rows, self.img_size)
+            if len(rows) and not 0 <= self.boxes[0].min() <= self.boxes[0].max() < len(self.classes):
+                raise IndexError('class index out of range of %s' % self.class_list_path)
+            return
+        self._shapes = []
+        with open(self.file_path, 'r', encoding=ENCODE_METHOD) as bnd_box_file:
+            for bndBox in bnd_box_file:
+                fields = bndBox.split()
+                if not fields:
+                    continue
+                class_index, x_center, y_center, w, h = fields[:5]
+                label, x_min, y_min, x_max, y_max = self.yolo_line_to_shape(class_index, x_center, y_center, w, h)
+
+                # Caveat: difficult flag is discarded when saved as yolo format.
+                self.add_shape(label, x_min, y_min, x_max, y_max, False)
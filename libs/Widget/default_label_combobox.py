@@ -7,10 +7,20 @@ class DefaultLabelComboBox(QWidget):
 
         layout = QHBoxLayout()
         self.cb = QComboBox()
-        self.items = items
+        self.items = list(items)
         self.cb.addItems(self.items)
 
         self.cb.currentIndexChanged.connect(parent.default_label_combo_selection_changed)
 
         layout.addWidget(self.cb)
         self.setLayout(layout)
+
+    def update_items(self, items):
+        self.items = list(items)
+
+        self.cb.clear()
+        self.cb.addItems(self.items)
+
+    def add_item(self, item):
+        self.items.append(item)
+        self.cb.addItem(item)
@@ -1,7 +1,13 @@
+import os
+import sys
+import time
+
 from PySide6.QtGui import *
 from PySide6.QtCore import *
 from PySide6.QtWidgets import *
+from libs.frameProfiler import FrameProfiler
 from libs.shape import Shape
+from libs.shapeStore import ShapeStore
 from libs.utils import distance
 
 CURSOR_DEFAULT = Qt.ArrowCursor
@@ -10,6 +16,55 @@ CURSOR_DRAW = Qt.CrossCursor
 CURSOR_MOVE = Qt.ClosedHandCursor
 CURSOR_GRAB = Qt.OpenHandCursor
 
+# 鼠标移动每帧最多处理一次；状态栏文本按更长的间隔节流
+FRAME_INTERVAL_MS = 16
+STATUS_INTERVAL_MS = 100
+# 缩放/平移停止多久后改用平滑重采样
+SETTLE_INTERVAL_MS = 150
+# 最小一级缩略图的短边长度
+MIPMAP_MIN_SIZE = 64
+
+
+def build_mipmaps(image, min_size=MIPMAP_MIN_SIZE):
+    """
+    Return the power-of-two reductions of ``image`` (1/2, 1/4, ...), each
+    smoothly scaled from the previous one, stopping at ``min_size``.
+    """
+    levels = []
+    width, height = image.width(), image.height()
+    while min(width, height) // 2 >= min_size:
+        width, height = width // 2, height // 2
+        image = image.scaled(width, height, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+        levels.append(image)
+    return levels
+
+
+def mipmap_level(scale):
+    """Index k of the 1/2**k reduction closest to ``scale`` without going below it."""
+    level = 0
+    if scale <= 0:
+        return level
+    while scale * 2 ** (level + 1) <= 1.0:
+        level += 1
+    return level
+
+
+class _MipmapSignals(QObject):
+    ready = Signal(int, int, QImage)
+
+
+class _MipmapBuilder(QRunnable):
+
+    def __init__(self, generation, image, signals):
+        super(_MipmapBuilder, self).__init__()
+        self.generation = generation
+        self.image = image
+        self.signals = signals
+
+    def run(self):
+        for level, image in enumerate(build_mipmaps(self.image), 1):
+            self.signals.ready.emit(self.generation, level, image)
+
 
 class Canvas(QWidget):
     zoomRequest = Signal(int)
@@ -18,11 +73,15 @@ class Canvas(QWidget):
     newShape = Signal()
     selectionChanged = Signal(bool)
     shapeMoved = Signal()
+    # 一次拖动/键盘微调结束：(形状, 编辑前的顶点列表)
+    shapeEdited = Signal(object, object)
     drawingPolygon = Signal(bool)
 
     CREATE, EDIT = list(range(2))
 
     epsilon = 24.0
+    # 形状数量达到该值且安装了 numpy 时，命中测试和绘制裁剪改用列式存储
+    store_threshold = 64
 
     def __init__(self, *args, **kwargs):
         super(Canvas, self).__init__(*args, **kwargs)
@@ -47,6 +106,36 @@ class Canvas(QWidget):
         self.hide_background = False
         self.h_shape = None
         self.h_vertex = None
+        self._store = None
+        # 拖动/绘制时缓存的静态背景层 (key, pixmap)
+        self._background = None
+        self._dragging = False
+        self._edit_origin = None
+        # 后台生成的 2 的幂缩略图 {level: QPixmap}；亮度叠加后的图像缓存
+        self._mipmaps = {}
+        self._mipmap_generation = 0
+        self._mipmap_signals = _MipmapSignals(self)
+        self._mipmap_signals.ready.connect(self._mipmap_ready)
+        self._overlay_cache = None
+        # 缩放或平移期间使用快速缩放，停止后再平滑重采样
+        self._view_state = None
+        self._settled = True
+        self._settle_timer = QTimer(self)
+        self._settle_timer.setSingleShot(True)
+        self._settle_timer.setInterval(SETTLE_INTERVAL_MS)
+        self._settle_timer.timeout.connect(self._settle)
+        # 帧耗时统计：叠加层显示，或设置 LABELIMG_PROFILE 后写入日志
+        # （值为 1 时输出到 stderr，否则视为日志文件路径）
+        self.profiler = None
+        self.show_profiler_overlay = False
+        self._frame_drawn = 0
+        self._frame_culled = 0
+        profile_log = os.environ.get('LABELIMG_PROFILE')
+        if profile_log:
+            if profile_log == '1':
+                self.profiler = FrameProfiler(log_stream=sys.stderr)
+            else:
+                self.profiler = FrameProfiler(log_stream=open(profile_log, 'a', encoding='utf-8'), owns_stream=True)
         self._painter = QPainter()
         self._cursor = CURSOR_DEFAULT
         # Menus:
@@ -60,6 +149,19 @@ class Canvas(QWidget):
         # initialisation for panning
         self.pan_initial_pos = QPoint()
 
+        # Coalesced mouse moves: only the latest position is kept.
+        self._pending_move = None
+        self._move_clock = QElapsedTimer()
+        self._move_timer = QTimer(self)
+        self._move_timer.setSingleShot(True)
+        self._move_timer.timeout.connect(self.flush_mouse_move)
+        # Throttled status bar text.
+        self._status_text = None
+        self._status_timer = QTimer(self)
+        self._status_timer.setSingleShot(True)
+        self._status_timer.setInterval(STATUS_INTERVAL_MS)
+        self._status_timer.timeout.connect(self._apply_status_text)
+
     def set_drawing_color(self, qcolor):
         self.drawing_line_color = qcolor
         self.drawing_rect_color = qcolor
@@ -100,15 +202,38 @@ class Canvas(QWidget):
         return self.h_vertex is not None
 
     def mouseMoveEvent(self, ev):
+        """Queue the latest position; moves are processed at most once per frame."""
+        self._pending_move = (ev.pos(), ev.buttons())
+        if not self._move_timer.isActive():
+            elapsed = self._move_clock.elapsed() if self._move_clock.isValid() else FRAME_INTERVAL_MS
+            self._move_timer.start(max(0, FRAME_INTERVAL_MS - elapsed))
+
+    def flush_mouse_move(self):
+        """处理挂起的鼠标移动（按下/释放前调用，保证最后位置不丢失）"""
+        self._move_timer.stop()
+        if self._pending_move is None:
+            return
+        widget_pos, buttons = self._pending_move
+        self._pending_move = None
+        self._move_clock.restart()
+        self.handle_mouse_move(widget_pos, buttons)
+
+    def handle_mouse_move(self, widget_pos, buttons):
         """Update line with last point and current coordinates."""
-        pos = self.transform_pos(ev.pos())
+        pos = self.transform_pos(widget_pos)
 
         # Update coordinates in status bar if image is opened
-        window = self.parent().window()
-        if window.file_path is not None:
-            self.parent().window().label_coordinates.setText(
-                'X: %d; Y: %d' % (pos.x(), pos.y()))
+        status = None
+        if getattr(self.window(), 'file_path', None) is not None:
+            status = 'X: %d; Y: %d' % (pos.x(), pos.y())
+
+        status = self._mouse_move(pos, widget_pos, buttons) or status
+        if status is not None:
+            self.set_status_text(status)
 
+    def _mouse_move(self, pos, widget_pos, buttons):
+        """Process one coalesced move; returns the status text to show, if any."""
+        status = None
         # Polygon drawing.
         if self.drawing():
             self.override_cursor(CURSOR_DRAW)
@@ -116,8 +241,7 @@ class Canvas(QWidget):
                 # Display annotation width and height while drawing
                 current_width = abs(self.current[0].x() - pos.x())
                 current_height = abs(self.current[0].y() - pos.y())
-                self.parent().window().label_coordinates.setText(
-                    'Width: %d, Height: %d / X: %d; Y: %d' % (current_width, current_height, pos.x(), pos.y()))
+                status = 'Width: %d, Height: %d / X: %d; Y: %d' % (current_width, current_height, pos.x(), pos.y())
 
                 color = self.drawing_line_color
                 if self.out_of_pixmap(pos):
@@ -152,62 +276,61 @@ class Canvas(QWidget):
                 self.current.highlight_clear()
             else:
                 self.prev_point = pos
-            self.repaint()
-            return
+            self.update()
+            return status
 
         # Polygon copy moving.
-        if Qt.RightButton & ev.buttons():
+        if Qt.RightButton & buttons:
             if self.selected_shape_copy and self.prev_point:
                 self.override_cursor(CURSOR_MOVE)
                 self.bounded_move_shape(self.selected_shape_copy, pos)
-                self.repaint()
+                self.update()
             elif self.selected_shape:
                 self.selected_shape_copy = self.selected_shape.copy()
-                self.repaint()
-            return
+                self.update()
+            return status
 
         # Polygon/Vertex moving.
-        if Qt.LeftButton & ev.buttons():
+        if Qt.LeftButton & buttons:
             if self.selected_vertex():
                 self.bounded_move_vertex(pos)
                 self.shapeMoved.emit()
-                self.repaint()
+                self.update()
 
                 # Display annotation width and height while moving vertex
                 point1 = self.h_shape[1]
                 point3 = self.h_shape[3]
                 current_width = abs(point1.x() - point3.x())
                 current_height = abs(point1.y() - point3.y())
-                self.parent().window().label_coordinates.setText(
-                    'Width: %d, Height: %d / X: %d; Y: %d' % (current_width, current_height, pos.x(), pos.y()))
+                status = 'Width: %d, Height: %d / X: %d; Y: %d' % (current_width, current_height, pos.x(), pos.y())
             elif self.selected_shape and self.prev_point:
                 self.override_cursor(CURSOR_MOVE)
                 self.bounded_move_shape(self.selected_shape, pos)
                 self.shapeMoved.emit()
-                self.repaint()
+                self.update()
 
                 # Display annotation width and height while moving shape
                 point1 = self.selected_shape[1]
                 point3 = self.selected_shape[3]
                 current_width = abs(point1.x() - point3.x())
                 current_height = abs(point1.y() - point3.y())
-                self.parent().window().label_coordinates.setText(
-                    'Width: %d, Height: %d / X: %d; Y: %d' % (current_width, current_height, pos.x(), pos.y()))
+                status = 'Width: %d, Height: %d / X: %d; Y: %d' % (current_width, current_height, pos.x(), pos.y())
             else:
                 # pan
-                delta = ev.pos() - self.pan_initial_pos
+                delta = widget_pos - self.pan_initial_pos
                 self.scrollRequest.emit(delta.x(), Qt.Horizontal)
                 self.scrollRequest.emit(delta.y(), Qt.Vertical)
                 self.update()
-            return
+            return status
 
         # Just hovering over the canvas, 2 possibilities:
         # - Highlight shapes
         # - Highlight vertex
         # Update shape/vertex fill and tooltip value accordingly.
-        self.setToolTip("Image")
-        priority_list = self.shapes + ([self.selected_shape] if self.selected_shape else [])
-        for shape in reversed([s for s in priority_list if self.isVisible(s)]):
+        # Only repaint when the highlight actually changes.
+        previous = (self.h_shape, self.h_vertex)
+        started = time.perf_counter()
+        for shape in self._hover_candidates(pos):
             # Look for a nearby vertex to highlight. If that fails,
             # check if we happen to be inside a shape.
             index = shape.nearest_vertex(pos, self.epsilon)
@@ -217,36 +340,88 @@ class Canvas(QWidget):
                 self.h_vertex, self.h_shape = index, shape
                 shape.highlight_vertex(index, shape.MOVE_VERTEX)
                 self.override_cursor(CURSOR_POINT)
-                self.setToolTip("Click & drag to move point")
-                self.setStatusTip(self.toolTip())
-                self.update()
+                self.set_tool_tip("Click & drag to move point")
                 break
             elif shape.contains_point(pos):
                 if self.selected_vertex():
                     self.h_shape.highlight_clear()
                 self.h_vertex, self.h_shape = None, shape
-                self.setToolTip(
-                    "Click & drag to move shape '%s'" % shape.label)
-                self.setStatusTip(self.toolTip())
+                self.set_tool_tip("Click & drag to move shape '%s'" % shape.label)
                 self.override_cursor(CURSOR_GRAB)
-                self.update()
 
                 # Display annotation width and height while hovering inside
                 point1 = self.h_shape[1]
                 point3 = self.h_shape[3]
                 current_width = abs(point1.x() - point3.x())
                 current_height = abs(point1.y() - point3.y())
-                self.parent().window().label_coordinates.setText(
-                    'Width: %d, Height: %d / X: %d; Y: %d' % (current_width, current_height, pos.x(), pos.y()))
+                status = 'Width: %d, Height: %d / X: %d; Y: %d' % (current_width, current_height, pos.x(), pos.y())
                 break
         else:  # Nothing found, clear highlights, reset state.
             if self.h_shape:
                 self.h_shape.highlight_clear()
-                self.update()
             self.h_vertex, self.h_shape = None, None
+            self.set_tool_tip("Image")
             self.override_cursor(CURSOR_DEFAULT)
+        if self.profiler is not None:
+            self.profiler.record_hit_test(time.perf_counter() - started)
+        if previous != (self.h_shape, self.h_vertex):
+            self.update()
+        return status
+
+    def _hover_candidates(self, pos):
+        """Shapes to test under the cursor, in priority order (selected shape first)."""
+        store = self.shape_store()
+        if store is None:
+            priority_list = self.shapes + ([self.selected_shape] if self.selected_shape else [])
+            return reversed([s for s in priority_list if self.isVisible(s)])
+        candidates = []
+        if self.selected_shape and self.isVisible(self.selected_shape):
+            candidates.append(self.selected_shape)
+        row = store.hit_test(pos.x(), pos.y(), self.epsilon)
+        if row is not None:
+            candidates.append(self.shapes[row])
+        return candidates
+
+    def shape_store(self):
+        """返回与 self.shapes 同步的列式存储；形状较少或未安装 numpy 时返回 None"""
+        # 先比较数量，形状较少时不导入 numpy
+        if len(self.shapes) < self.store_threshold or not ShapeStore.available():
+            self._store = None
+            return None
+        if self._store is None or len(self._store) != len(self.shapes):
+            self._store = ShapeStore.from_shapes(self.shapes, self.visible)
+        return self._store
+
+    def invalidate_shape_store(self):
+        self._store = None
+        self._background = None
+
+    def _shape_changed(self, shape):
+        if self._store is not None:
+            self._store.update(shape)
+
+    def set_tool_tip(self, text):
+        if text != self.toolTip():
+            self.setToolTip(text)
+            self.setStatusTip(text)
+
+    def set_status_text(self, text):
+        """节流更新状态栏坐标文本：立即显示第一次更新，其余在间隔结束时合并显示"""
+        self._status_text = text
+        if not self._status_timer.isActive():
+            self._apply_status_text()
+            self._status_timer.start()
+
+    def _apply_status_text(self):
+        text, self._status_text = self._status_text, None
+        if text is None:
+            return
+        label = getattr(self.window(), 'label_coordinates', None)
+        if label is not None and label.text() != text:
+            label.setText(text)
 
     def mousePressEvent(self, ev):
+        self.flush_mouse_move()
         pos = self.transform_pos(ev.pos())
 
         if ev.button() == Qt.LeftButton:
@@ -255,6 +430,10 @@ class Canvas(QWidget):
             else:
                 selection = self.select_shape_point(pos)
                 self.prev_point = pos
+                self._dragging = selection is not None
+                if selection is not None:
+                    shape = self.selected_shape
+                    self._edit_origin = (shape, [QPointF(p) for p in shape.points])
 
                 if selection is None:
                     # pan
@@ -267,6 +446,12 @@ class Canvas(QWidget):
         self.update()
 
     def mouseReleaseEvent(self, ev):
+        self.flush_mouse_move()
+        if self._dragging and ev.button() == Qt.LeftButton:
+            self._dragging = False
+            self.invalidate_background()
+            self.update()
+            self._finish_edit()
         if ev.button() == Qt.RightButton:
             menu = self.menus[bool(self.selected_shape_copy)]
             self.restore_cursor()
@@ -288,6 +473,13 @@ class Canvas(QWidget):
                 # pan
                 QApplication.restoreOverrideCursor()
 
+    def _finish_edit(self):
+        if self._edit_origin is not None:
+            shape, before = self._edit_origin
+            self._edit_origin = None
+            if before != shape.points:
+                self.shapeEdited.emit(shape, before)
+
     def end_move(self, copy=False):
         assert self.selected_shape and self.selected_shape_copy
         shape = self.selected_shape_copy
@@ -295,11 +487,13 @@ class Canvas(QWidget):
         # del shape.line_color
         if copy:
             self.shapes.append(shape)
+            self.invalidate_shape_store()
             self.selected_shape.selected = False
             self.selected_shape = shape
             self.repaint()
         else:
             self.selected_shape.points = [p for p in shape.points]
+            self._shape_changed(self.selected_shape)
         self.selected_shape_copy = None
 
     def hide_background_shapes(self, value):
@@ -332,6 +526,7 @@ class Canvas(QWidget):
 
     def set_hiding(self, enable=True):
         self._hide_background = self.hide_background if enable else False
+        self.invalidate_background()
 
     def can_close_shape(self):
         return self.drawing() and self.current and len(self.current) > 2
@@ -359,7 +554,13 @@ class Canvas(QWidget):
             shape.highlight_vertex(index, shape.MOVE_VERTEX)
             self.select_shape(shape)
             return self.h_vertex
-        for shape in reversed(self.shapes):
+        store = self.shape_store()
+        if store is not None:
+            row = store.hit_test(point.x(), point.y(), 0.0)
+            candidates = [self.shapes[row]] if row is not None else []
+        else:
+            candidates = reversed(self.shapes)
+        for shape in candidates:
             if self.isVisible(shape) and shape.contains_point(point):
                 self.select_shape(shape)
                 self.calculate_offsets(shape, point)
@@ -423,6 +624,7 @@ class Canvas(QWidget):
             right_shift = QPointF(0, shift_pos.y())
         shape.move_vertex_by(right_index, right_shift)
         shape.move_vertex_by(left_index, left_shift)
+        self._shape_changed(shape)
 
     def bounded_move_shape(self, shape, pos):
         if self.out_of_pixmap(pos):
@@ -442,6 +644,7 @@ class Canvas(QWidget):
         dp = pos - self.prev_point
         if dp:
             shape.move_by(dp)
+            self._shape_changed(shape)
             self.prev_point = pos
             return True
         return False
@@ -459,6 +662,7 @@ class Canvas(QWidget):
             shape = self.selected_shape
             self.un_highlight(shape)
             self.shapes.remove(self.selected_shape)
+            self.invalidate_shape_store()
             self.selected_shape = None
             self.update()
             return shape
@@ -468,6 +672,7 @@ class Canvas(QWidget):
             shape = self.selected_shape.copy()
             self.de_select_shape()
             self.shapes.append(shape)
+            self.invalidate_shape_store()
             shape.selected = True
             self.selected_shape = shape
             self.bounded_shift_shape(shape)
@@ -487,30 +692,147 @@ class Canvas(QWidget):
         if not self.pixmap:
             return super(Canvas, self).paintEvent(event)
 
+        Shape.scale = self.scale
+        Shape.label_font_size = self.label_font_size
+        self._track_view_state()
+        started = time.perf_counter()
+        self._frame_drawn = self._frame_culled = 0
+
         p = self._painter
         p.begin(self)
+        layered, active = self._interaction_layers()
+        if layered:
+            # 拖动/绘制期间：静态内容从缓存层直接贴图，只重绘活动形状
+            area, layer = self._background_layer(active)
+            p.drawPixmap(area.topLeft(), layer)
+            self._begin_scene(p)
+            if active is not None and self.isVisible(active):
+                active.fill = True
+                active.paint(p)
+                self._frame_drawn += 1
+        else:
+            self._background = None
+            self._begin_scene(p)
+            self._paint_scene(p, event.rect())
+        self._paint_overlays(p)
+
+        self.setAutoFillBackground(True)
+        if self.verified:
+            background = QColor(184, 239, 38, 128)
+        else:
+            background = QColor(232, 232, 232, 255)
+        pal = self.palette()
+        if pal.color(self.backgroundRole()) != background:
+            pal.setColor(self.backgroundRole(), background)
+            self.setPalette(pal)
+
+        if self.profiler is not None:
+            self.profiler.record_paint(time.perf_counter() - started, self._frame_drawn, self._frame_culled)
+            if self.show_profiler_overlay:
+                self._paint_profiler_overlay(p)
+        p.end()
+
+    def close_profiler(self):
+        """关闭帧耗时日志（窗口关闭时调用）"""
+        if self.profiler is not None:
+            self.profiler.close()
+
+    def _paint_profiler_overlay(self, p):
+        p.resetTransform()
+        p.setRenderHint(QPainter.Antialiasing, False)
+        lines = self.profiler.summary_lines()
+        metrics = p.fontMetrics()
+        width = max(metrics.horizontalAdvance(line) for line in lines) + 12
+        height = metrics.height() * len(lines) + 8
+        origin = self.visibleRegion().boundingRect().topLeft() + QPoint(6, 6)
+        p.fillRect(QRect(origin, QSize(width, height)), QColor(0, 0, 0, 160))
+        p.setPen(QColor(255, 255, 255))
+        for i, line in enumerate(lines):
+            p.drawText(origin + QPoint(6, 4 + metrics.ascent() + i * metrics.height()), line)
+
+    def set_profiler_overlay(self, value):
+        """显示或隐藏帧耗时叠加层"""
+        self.show_profiler_overlay = value
+        if value and self.profiler is None:
+            self.profiler = FrameProfiler()
+        self.update()
+
+    def _begin_scene(self, p):
+        """设置渲染选项，并把画笔坐标系切换到图像坐标"""
         p.setRenderHint(QPainter.Antialiasing)
-        p.setRenderHint(QPainter.RenderHint.Antialiasing)
         p.setRenderHint(QPainter.SmoothPixmapTransform)
-
         p.scale(self.scale, self.scale)
         p.translate(self.offset_to_center())
 
-        temp = self.pixmap
-        if self.overlay_color:
-            temp = QPixmap(self.pixmap)
+    def _paint_scene(self, p, exposed, exclude=None):
+        """Paint the image and every shape except ``exclude``."""
+        self._paint_image(p)
+        for shape in self._shapes_to_paint(exposed):
+            if shape is exclude:
+                continue
+            if (shape.selected or not self._hide_background) and self.isVisible(shape):
+                shape.fill = shape.selected or shape == self.h_shape
+                shape.paint(p)
+                self._frame_drawn += 1
+
+    def _paint_image(self, p):
+        """用最接近当前缩放的缩略图绘制图像，剩余缩放比例不超过 2 倍"""
+        level, image = self._image_for_scale()
+        p.setRenderHint(QPainter.SmoothPixmapTransform, self._settled)
+        if level == 0:
+            p.drawPixmap(0, 0, image)
+        else:
+            target = QRectF(0, 0, self.pixmap.width(), self.pixmap.height())
+            p.drawPixmap(target, image, QRectF(image.rect()))
+        p.setRenderHint(QPainter.SmoothPixmapTransform)
+
+    def _image_for_scale(self):
+        level = mipmap_level(self.scale)
+        while level and level not in self._mipmaps:
+            level -= 1
+        image = self._mipmaps[level] if level else self.pixmap
+        if not self.overlay_color.alpha():
+            return level, image
+        # 亮度叠加只对所选级别计算一次
+        key = (level, image.cacheKey(), self.overlay_color.rgba())
+        if self._overlay_cache is None or self._overlay_cache[0] != key:
+            temp = QPixmap(image)
             painter = QPainter(temp)
             painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_Overlay)
             painter.fillRect(temp.rect(), self.overlay_color)
             painter.end()
+            self._overlay_cache = (key, temp)
+        return level, self._overlay_cache[1]
+
+    def _build_mipmaps(self):
+        self._mipmap_generation += 1
+        self._mipmaps = {}
+        self._overlay_cache = None
+        if self.pixmap and not self.pixmap.isNull():
+            builder = _MipmapBuilder(self._mipmap_generation, self.pixmap.toImage(), self._mipmap_signals)
+            QThreadPool.globalInstance().start(builder)
+
+    def _mipmap_ready(self, generation, level, image):
+        if generation != self._mipmap_generation:
+            return
+        self._mipmaps[level] = QPixmap.fromImage(image)
+        if level == mipmap_level(self.scale):
+            self.update()
 
-        p.drawPixmap(0, 0, temp)
-        Shape.scale = self.scale
-        Shape.label_font_size = self.label_font_size
-        for shape in self.shapes:
-            if (shape.selected or not self._hide_background) and self.isVisible(shape):
-                shape.fill = shape.selected or shape == self.h_shape
-                shape.paint(p)
+    def _track_view_state(self):
+        state = (self.scale, self.visibleRegion().boundingRect())
+        if state != self._view_state:
+            if self._view_state is not None:
+                self._settled = False
+                self._settle_timer.start()
+            self._view_state = state
+
+    def _settle(self):
+        self._settled = True
+        self.update()
+
+    def _paint_overlays(self, p):
+        """Paint the shape being drawn, the moved copy and the crosshair."""
         if self.current:
             self.current.paint(p)
             self.line.paint(p)
@@ -533,17 +855,55 @@ class Canvas(QWidget):
             p.drawLine(int(self.prev_point.x()), 0, int(self.prev_point.x()), int(self.pixmap.height()))
             p.drawLine(0, int(self.prev_point.y()), int(self.pixmap.width()), int(self.prev_point.y()))
 
-        self.setAutoFillBackground(True)
-        if self.verified:
-            pal = self.palette()
-            pal.setColor(self.backgroundRole(), QColor(184, 239, 38, 128))
-            self.setPalette(pal)
-        else:
-            pal = self.palette()
-            pal.setColor(self.backgroundRole(), QColor(232, 232, 232, 255))
-            self.setPalette(pal)
-
-        p.end()
+    def _interaction_layers(self):
+        """
+        (layered, active)：正在绘制新形状、拖动形状或拖动副本时使用缓存背景层，
+        active 为需要逐帧重绘、因而不进入背景层的形状。
+        缓存键不含形状内容，所以只在鼠标按住、外部无法修改形状的交互期间使用。
+        """
+        if (self.drawing() and self.current is not None) or self.selected_shape_copy is not None:
+            return True, None
+        if self._dragging and self.selected_shape is not None:
+            return True, self.selected_shape
+        return False, None
+
+    def _background_layer(self, exclude):
+        """返回 (区域, 缓存层)；缩放、可见区域或内容变化时重建"""
+        area = self.visibleRegion().boundingRect() & self.rect()
+        key = (self.scale, area, self.size(), self.pixmap.cacheKey(), self.overlay_color.rgba(),
+               self._hide_background, self.label_font_size, id(exclude), self._settled,
+               tuple(self._mipmaps))
+        if self._background is None or self._background[0] != key:
+            ratio = self.devicePixelRatioF()
+            layer = QPixmap(area.size() * ratio)
+            layer.setDevicePixelRatio(ratio)
+            layer.fill(Qt.transparent)
+            painter = QPainter(layer)
+            painter.translate(-area.topLeft())
+            self._begin_scene(painter)
+            self._paint_scene(painter, area, exclude)
+            painter.end()
+            self._background = (key, layer)
+        return area, self._background[1]
+
+    def invalidate_background(self):
+        self._background = None
+
+    def _shapes_to_paint(self, exposed):
+        """按绘制顺序返回与重绘区域相交的形状（使用列式存储时跳过区域外的形状）"""
+        store = self.shape_store()
+        if store is None:
+            return self.shapes
+        top_left = self.transform_pos(exposed.topLeft())
+        bottom_right = self.transform_pos(exposed.bottomRight())
+        # Leave room for vertex handles and for labels drawn above/right of a box.
+        handle = Shape.point_size / self.scale
+        longest_label = max(map(len, store.labels)) if store.labels else 0
+        rows = store.cull(top_left.x(), top_left.y(), bottom_right.x(), bottom_right.y(),
+                          margin_x=handle + self.label_font_size * longest_label,
+                          margin_y=handle + 2 * self.label_font_size)
+        self._frame_culled += len(self.shapes) - len(rows)
+        return [self.shapes[row] for row in rows]
 
     def transform_pos(self, point):
         """将窗口坐标转换为图像坐标"""
@@ -584,6 +944,7 @@ class Canvas(QWidget):
 
         self.current.close()
         self.shapes.append(self.current)
+        self.invalidate_shape_store()
         self.current = None
         self.set_hiding(False)
         self.newShape.emit()
@@ -634,9 +995,7 @@ class Canvas(QWidget):
         key = ev.key()
         if key == Qt.Key_Escape and self.current:
             print('ESC press')
-            self.current = None
-            self.drawingPolygon.emit(False)
-            self.update()
+            self.cancel_drawing()
         elif key == Qt.Key_Return and self.can_close_shape():
             self.finalise()
         elif key == Qt.Key_Left and self.selected_shape:
@@ -650,6 +1009,7 @@ class Canvas(QWidget):
 
     def move_one_pixel(self, direction):
         # print(self.selectedShape.points)
+        self._edit_origin = (self.selected_shape, [QPointF(p) for p in self.selected_shape.points])
         if direction == 'Left' and not self.move_out_of_bound(QPointF(-1.0, 0)):
             # print("move Left one pixel")
             self.selected_shape.points[0] += QPointF(-1.0, 0)
@@ -674,8 +1034,10 @@ class Canvas(QWidget):
             self.selected_shape.points[1] += QPointF(0, 1.0)
             self.selected_shape.points[2] += QPointF(0, 1.0)
             self.selected_shape.points[3] += QPointF(0, 1.0)
+        self._shape_changed(self.selected_shape)
         self.shapeMoved.emit()
         self.repaint()
+        self._finish_edit()
 
     def move_out_of_bound(self, step):
         points = [p1 + p2 for p1, p2 in zip(self.selected_shape.points, [step] * 4)]
@@ -692,9 +1054,19 @@ class Canvas(QWidget):
 
         return self.shapes[-1]
 
+    def cancel_drawing(self):
+        """放弃正在绘制、尚未闭合的形状"""
+        if self.current is None:
+            return
+        self.current = None
+        self.invalidate_background()
+        self.drawingPolygon.emit(False)
+        self.update()
+
     def undo_last_line(self):
         assert self.shapes
         self.current = self.shapes.pop()
+        self.invalidate_shape_store()
         self.current.set_open()
         self.line.points = [self.current[-1], self.current[0]]
         self.drawingPolygon.emit(True)
@@ -702,6 +1074,7 @@ class Canvas(QWidget):
     def reset_all_lines(self):
         assert self.shapes
         self.current = self.shapes.pop()
+        self.invalidate_shape_store()
         self.current.set_open()
         self.line.points = [self.current[-1], self.current[0]]
         self.drawingPolygon.emit(True)
@@ -711,7 +1084,9 @@ class Canvas(QWidget):
 
     def load_pixmap(self, pixmap):
         self.pixmap = pixmap
+        self._build_mipmaps()
         self.shapes = []  # 清空标注
+        self.invalidate_shape_store()
         self.zoom = 1.0  # 重置缩放
         self.offset = (0, 0)  # 重置偏移
         self.updateGeometry()  # 更新布局
@@ -719,13 +1094,47 @@ class Canvas(QWidget):
 
     def load_shapes(self, shapes):
         self.shapes = list(shapes)
+        self.invalidate_shape_store()
         self.current = None
         self.repaint()
 
+    def insert_shape(self, index, shape):
+        self.shapes.insert(index, shape)
+        self.invalidate_shape_store()
+        self.update()
+
+    def remove_shape(self, shape):
+        if shape is self.selected_shape:
+            self.de_select_shape()
+        self.un_highlight(shape)
+        self.shapes.remove(shape)
+        self.invalidate_shape_store()
+        self.update()
+
+    def set_shape_points(self, shape, points):
+        shape.points = points
+        self._shape_changed(shape)
+        self.invalidate_background()
+        self.update()
+
     def set_shape_visible(self, shape, value):
         self.visible[shape] = value
+        if self._store is not None:
+            self._store.set_hidden(shape, not value)
+        self.invalidate_background()
         self.repaint()
 
+    def set_shapes_visible(self, shapes):
+        """批量设置 {形状: 是否可见}，只刷新一次"""
+        if not shapes:
+            return
+        for shape, value in shapes.items():
+            self.visible[shape] = value
+            if self._store is not None:
+                self._store.set_hidden(shape, not value)
+        self.invalidate_background()
+        self.update()
+
     def current_cursor(self):
         cursor = QApplication.overrideCursor()
         if cursor is not None:
@@ -746,9 +1155,16 @@ class Canvas(QWidget):
         self.de_select_shape()
         self.un_highlight()
         self.selected_shape_copy = None
+        self._pending_move = None
+        self._move_timer.stop()
+        self._status_text = None
+        self._status_timer.stop()
+        self._dragging = False
+        self.invalidate_background()
 
         self.restore_cursor()
         self.pixmap = None
+        self._build_mipmaps()
         self.update()
 
     def set_drawing_shape_to_square(self, status):
@@ -18,3 +18,6 @@ FORMAT_CREATEML = 'CreateML'
 SETTING_DRAW_SQUARE = 'draw/square'
 SETTING_LABEL_FILE_FORMAT = 'labelFileFormat'
 DEFAULT_ENCODING = 'utf-8'
+XML_EXT = '.xml'
+TXT_EXT = '.txt'
+JSON_EXT = '.json'
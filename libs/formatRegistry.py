@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Registry of annotation file formats.
+
+Each ``AnnotationFormat`` describes one format: its key, display name, file
+extension and icon, how to read and write it, and a few capabilities the
+main window takes into account:
+
+``dataset_level``
+    one file can hold the annotations of many images (CreateML);
+``needs_image_size``
+    reading requires the image dimensions (YOLO stores normalised boxes);
+``uses_class_list``
+    writing takes the ordered class list.
+
+Readers, writers and hooks are callables or ``"module:attribute"`` strings
+resolved on first use. The built-in adapters import their IO module inside
+the call, so lxml and the IO modules are not loaded at start-up.
+
+A reader is called as ``reader(annotation_path, image_path, image)`` and
+returns an object with ``get_shapes()`` and ``verified``. A writer is called
+as ``writer(label_file, annotation_path, shapes, image_path, image_data,
+class_list, image_shape, line_color, fill_color)``. The optional ``close``
+hook runs when the window closes. A hook given as a string only runs if its
+module has been imported, by the registry or by anything else.
+
+Formats are tried in registration order when looking for an image's
+annotation file. New formats are added with ``register_format``.
+"""
+import importlib
+import sys
+
+from libs.constants import FORMAT_CREATEML, FORMAT_PASCALVOC, FORMAT_YOLO, JSON_EXT, TXT_EXT, XML_EXT
+from libs.labelFile import LabelFileFormat
+
+
+def _resolve(spec):
+    if not isinstance(spec, str):
+        return spec
+    module, _, attribute = spec.partition(':')
+    target = importlib.import_module(module)
+    for name in attribute.split('.'):
+        target = getattr(target, name)
+    return target
+
+
+class AnnotationFormat(object):
+
+    def __init__(self, key, name, ext, icon, reader, writer, close=None,
+                 dataset_level=False, needs_image_size=False, uses_class_list=False):
+        self.key = key
+        self.name = name
+        self.ext = ext
+        self.icon = icon
+        self.dataset_level = dataset_level
+        self.needs_image_size = needs_image_size
+        self.uses_class_list = uses_class_list
+        self._specs = {'reader': reader, 'writer': writer, 'close': close}
+        self._loaded = {}
+
+    def _get(self, role):
+        if role not in self._loaded:
+            self._loaded[role] = _resolve(self._specs[role])
+        return self._loaded[role]
+
+    @property
+    def menu_text(self):
+        return '&' + self.name
+
+    def read(self, annotation_path, image_path, image=None):
+        return self._get('reader')(annotation_path, image_path, image)
+
+    def write(self, label_file, annotation_path, shapes, image_path, image_data, class_list, image_shape,
+              line_color=None, fill_color=None):
+        return self._get('writer')(label_file, annotation_path, shapes, image_path, image_data, class_list,
+                                   image_shape, line_color, fill_color)
+
+    def annotation_path(self, path):
+        """``path`` with this format's extension appended unless it already has it."""
+        return path if path.lower().endswith(self.ext) else path + self.ext
+
+    def close(self):
+        spec = self._specs['close']
+        if spec is None:
+            return
+        # 模块已被导入（无论经由注册表、labelOps 还是工具脚本）才需要收尾，
+        # 未加载的模块不会因此被导入
+        if isinstance(spec, str) and spec.partition(':')[0] not in sys.modules:
+            return
+        self._get('close')()
+
+    def __repr__(self):
+        return 'AnnotationFormat(%r)' % self.name
+
+
+_formats = []
+
+
+def register_format(annotation_format):
+    """Add ``annotation_format``, replacing a registered format with the same key."""
+    _formats[:] = [f for f in _formats if f.key != annotation_format.key]
+    _formats.append(annotation_format)
+    return annotation_format
+
+
+def formats():
+    return list(_formats)
+
+
+def get_format(key):
+    """The format registered under ``key`` (a ``LabelFileFormat`` or a format name)."""
+    for annotation_format in _formats:
+        if key == annotation_format.key or key == annotation_format.name:
+            return annotation_format
+    raise ValueError('Unknown label file format %r' % (key,))
+
+
+def next_format(key):
+    """The format after ``key`` in registration order, wrapping around."""
+    index = _formats.index(get_format(key))
+    return _formats[(index + 1) % len(_formats)]
+
+
+def close_formats():
+    for annotation_format in _formats:
+        annotation_format.close()
+
+
+# 内置格式的读写适配函数，各 IO 模块在首次调用时才导入
+def read_pascal_voc(annotation_path, image_path, image):
+    from libs.Io.pascal_voc_io import PascalVocReader
+    return PascalVocReader(annotation_path)
+
+
+def write_pascal_voc(label_file, annotation_path, shapes, image_path, image_data, class_list, image_shape,
+                     line_color=None, fill_color=None):
+    label_file.save_pascal_voc_format(annotation_path, shapes, image_path, image_data, line_color, fill_color,
+                                      image_shape=image_shape)
+
+
+def read_yolo(annotation_path, image_path, image):
+    from libs.Io.yolo_io import YoloReader
+    return YoloReader(annotation_path, image if image is not None and not image.isNull() else image_path)
+
+
+def write_yolo(label_file, annotation_path, shapes, image_path, image_data, class_list, image_shape,
+               line_color=None, fill_color=None):
+    label_file.save_yolo_format(annotation_path, shapes, image_path, image_data, class_list, line_color, fill_color,
+                                image_shape=image_shape)
+
+
+def read_create_ml(annotation_path, image_path, image):
+    from libs.Io.create_ml_io import CreateMLReader
+    return CreateMLReader(annotation_path, image_path)
+
+
+def write_create_ml(label_file, annotation_path, shapes, image_path, image_data, class_list, image_shape,
+                    line_color=None, fill_color=None):
+    label_file.save_create_ml_format(annotation_path, shapes, image_path, image_data, class_list, line_color,
+                                     fill_color, image_shape=image_shape)
+
+
+register_format(AnnotationFormat(LabelFileFormat.PASCAL_VOC, FORMAT_PASCALVOC, XML_EXT, 'format_voc',
+                                 read_pascal_voc, write_pascal_voc))
+register_format(AnnotationFormat(LabelFileFormat.YOLO, FORMAT_YOLO, TXT_EXT, 'format_yolo',
+                                 read_yolo, write_yolo, needs_image_size=True, uses_class_list=True))
+register_format(AnnotationFormat(LabelFileFormat.CREATE_ML, FORMAT_CREATEML, JSON_EXT, 'format_createml',
+                                 read_create_ml, write_create_ml, close='libs.Io.create_ml_io:close_stores',
+                                 dataset_level=True))
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Rolling frame statistics for the canvas.
+
+``FrameProfiler`` collects per-frame paint times, shapes drawn/culled,
+hit-test times and repaint rate. The canvas shows them as an overlay, and
+they can also be written once per interval to a text stream so numbers can
+be attached to bug reports without a visible window.
+"""
+import time
+from collections import deque
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of ``values`` (0 <= q <= 1), 0.0 when empty."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[int(round(q * (len(ordered) - 1)))]
+
+
+class FrameProfiler(object):
+
+    def __init__(self, window=240, log_stream=None, log_interval=1.0, clock=time.perf_counter, owns_stream=False):
+        self.paint_times = deque(maxlen=window)
+        self.hit_test_times = deque(maxlen=window)
+        self.shapes_drawn = 0
+        self.shapes_culled = 0
+        self.log_stream = log_stream
+        self.log_interval = log_interval
+        self.owns_stream = owns_stream
+        self._clock = clock
+        self._repaints = deque()
+        self._last_log = clock()
+
+    def record_paint(self, seconds, drawn, culled):
+        now = self._clock()
+        self.paint_times.append(seconds)
+        self.shapes_drawn = drawn
+        self.shapes_culled = culled
+        self._repaints.append(now)
+        self._expire(now)
+        if self.log_stream is not None and now - self._last_log >= self.log_interval:
+            self._last_log = now
+            self.log_stream.write(' | '.join(self.summary_lines()) + '\n')
+            self.log_stream.flush()
+
+    def close(self):
+        """Stop logging, closing the stream if the profiler owns it."""
+        if self.owns_stream and self.log_stream is not None:
+            self.log_stream.close()
+        self.log_stream = None
+
+    def record_hit_test(self, seconds):
+        self.hit_test_times.append(seconds)
+
+    def repaints_per_second(self):
+        self._expire(self._clock())
+        return len(self._repaints)
+
+    def summary(self):
+        return {
+            'paint_p50_ms': percentile(self.paint_times, 0.5) * 1000,
+            'paint_p99_ms': percentile(self.paint_times, 0.99) * 1000,
+            'hit_test_p50_ms': percentile(self.hit_test_times, 0.5) * 1000,
+            'hit_test_p99_ms': percentile(self.hit_test_times, 0.99) * 1000,
+            'repaints_per_second': self.repaints_per_second(),
+            'shapes_drawn': self.shapes_drawn,
+            'shapes_culled': self.shapes_culled,
+        }
+
+    def summary_lines(self):
+        stats = self.summary()
+        return [
+            'paint p50 %.2f ms  p99 %.2f ms' % (stats['paint_p50_ms'], stats['paint_p99_ms']),
+            'hit-test p50 %.2f ms  p99 %.2f ms' % (stats['hit_test_p50_ms'], stats['hit_test_p99_ms']),
+            'repaints %d/s' % stats['repaints_per_second'],
+            'shapes drawn %d  culled %d' % (stats['shapes_drawn'], stats['shapes_culled']),
+        ]
+
+    def _expire(self, now):
+        while self._repaints and now - self._repaints[0] > 1.0:
+            self._repaints.popleft()
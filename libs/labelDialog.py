@@ -1,12 +1,15 @@
 from PySide6.QtGui import *
 from PySide6.QtCore import *
 from PySide6.QtWidgets import *
+from libs.labelIndex import LabelIndex
 from libs.utils import new_icon, label_validator
 
 BB = QDialogButtonBox
 
 
 class LabelDialog(QDialog):
+    # 列表中最多显示的匹配数，保证大词表下每次按键的刷新耗时固定
+    max_list_items = 200
 
     def __init__(self, text="Enter object label", parent=None, list_item=None):
         super(LabelDialog, self).__init__(parent)
@@ -15,11 +18,11 @@ class LabelDialog(QDialog):
         self.edit.setText(text)
         self.edit.setValidator(label_validator())
         self.edit.editingFinished.connect(self.post_process)
+        self.edit.textEdited.connect(self.filter_list)
 
-        model = QStringListModel()
-        model.setStringList(list_item)
+        self.model = QStringListModel()
         completer = QCompleter()
-        completer.setModel(model)
+        completer.setModel(self.model)
         self.edit.setCompleter(completer)
 
         self.button_box = bb = BB(BB.Ok | BB.Cancel, Qt.Horizontal, self)
@@ -32,15 +35,36 @@ class LabelDialog(QDialog):
         layout.addWidget(bb, alignment=Qt.AlignmentFlag.AlignLeft)
         layout.addWidget(self.edit)
 
-        if list_item is not None and len(list_item) > 0:
-            self.list_widget = QListWidget(self)
-            for item in list_item:
-                self.list_widget.addItem(item)
-            self.list_widget.itemClicked.connect(self.list_item_click)
-            self.list_widget.itemDoubleClicked.connect(self.list_item_double_click)
-            layout.addWidget(self.list_widget)
+        self.list_widget = QListWidget(self)
+        self.list_widget.itemClicked.connect(self.list_item_click)
+        self.list_widget.itemDoubleClicked.connect(self.list_item_double_click)
+        layout.addWidget(self.list_widget)
 
         self.setLayout(layout)
+        self.set_items(list_item or [])
+
+    def set_items(self, list_item):
+        """Replace all labels offered by the dialog."""
+        self.index = LabelIndex(list_item)
+        self.model.setStringList(self.index.labels)
+        self.filter_list()
+
+    def add_item(self, label):
+        """Offer one more label without rebuilding the list or the completer model."""
+        if not self.index.add(label):
+            return
+        row = self.model.rowCount()
+        self.model.insertRows(row, 1)
+        self.model.setData(self.model.index(row), label)
+        if self.isVisible():
+            self.filter_list(self.edit.text())
+
+    def filter_list(self, text=''):
+        self.list_widget.setUpdatesEnabled(False)
+        self.list_widget.clear()
+        self.list_widget.addItems(self.index.search(text, self.max_list_items))
+        self.list_widget.setUpdatesEnabled(True)
+        self.list_widget.setVisible(len(self.index) > 0)
 
     def validate(self):
         if self.edit.text():
@@ -57,6 +81,7 @@ class LabelDialog(QDialog):
         """
         self.edit.setText(text)
         self.edit.setSelection(0, len(text))
+        self.filter_list()
         self.edit.setFocus(Qt.PopupFocusReason)
         if move:
             cursor_pos = QCursor.pos()
@@ -7,10 +7,8 @@ from enum import Enum
 
 from PySide6.QtGui import QImage
 
-from libs.Io.create_ml_io import CreateMLWriter
-from libs.Io.pascal_voc_io import PascalVocWriter
-from libs.Io.pascal_voc_io import XML_EXT
-from libs.Io.yolo_io import YOLOWriter
+from libs.Io.image_meta import probe_image_size
+from libs.constants import XML_EXT
 
 
 class LabelFileFormat(Enum):
@@ -35,14 +33,14 @@ class LabelFile(object):
         self.verified = False
 
     def save_create_ml_format(self, filename, shapes, image_path, image_data, class_list, line_color=None,
-                              fill_color=None, database_src=None):
+                              fill_color=None, database_src=None, image_shape=None):
+        from libs.Io.create_ml_io import CreateMLWriter
+
         img_folder_name = os.path.basename(os.path.dirname(image_path))
         img_file_name = os.path.basename(image_path)
 
-        image = QImage()
-        image.load(image_path)
-        image_shape = [image.height(), image.width(),
-                       1 if image.isGrayscale() else 3]
+        if image_shape is None:
+            image_shape = LabelFile.image_shape(image_path, image_data)
         writer = CreateMLWriter(img_folder_name, img_file_name,
                                 image_shape, shapes, filename, local_img_path=image_path)
         writer.verified = self.verified
@@ -50,20 +48,15 @@ class LabelFile(object):
         return
 
     def save_pascal_voc_format(self, filename, shapes, image_path, image_data,
-                               line_color=None, fill_color=None, database_src=None):
+                               line_color=None, fill_color=None, database_src=None, image_shape=None):
+        from libs.Io.pascal_voc_io import PascalVocWriter
+
         img_folder_path = os.path.dirname(image_path)
         img_folder_name = os.path.split(img_folder_path)[-1]
         img_file_name = os.path.basename(image_path)
         # imgFileNameWithoutExt = os.path.splitext(img_file_name)[0]
-        # Read from file path because self.imageData might be empty if saving to
-        # Pascal format
-        if isinstance(image_data, QImage):
-            image = image_data
-        else:
-            image = QImage()
-            image.load(image_path)
-        image_shape = [image.height(), image.width(),
-                       1 if image.isGrayscale() else 3]
+        if image_shape is None:
+            image_shape = LabelFile.image_shape(image_path, image_data)
         writer = PascalVocWriter(img_folder_name, img_file_name,
                                  image_shape, local_img_path=image_path)
         writer.verified = self.verified
@@ -80,20 +73,15 @@ class LabelFile(object):
         return
 
     def save_yolo_format(self, filename, shapes, image_path, image_data, class_list,
-                         line_color=None, fill_color=None, database_src=None):
+                         line_color=None, fill_color=None, database_src=None, image_shape=None):
+        from libs.Io.yolo_io import YOLOWriter
+
         img_folder_path = os.path.dirname(image_path)
         img_folder_name = os.path.split(img_folder_path)[-1]
         img_file_name = os.path.basename(image_path)
         # imgFileNameWithoutExt = os.path.splitext(img_file_name)[0]
-        # Read from file path because self.imageData might be empty if saving to
-        # Pascal format
-        if isinstance(image_data, QImage):
-            image = image_data
-        else:
-            image = QImage()
-            image.load(image_path)
-        image_shape = [image.height(), image.width(),
-                       1 if image.isGrayscale() else 3]
+        if image_shape is None:
+            image_shape = LabelFile.image_shape(image_path, image_data)
         writer = YOLOWriter(img_folder_name, img_file_name,
                             image_shape, local_img_path=image_path)
         writer.verified = self.verified
@@ -141,6 +129,23 @@ class LabelFile(object):
                     f, ensure_ascii=True, indent=2)
     '''
 
+    @staticmethod
+    def image_shape(image_path, image_data=None):
+        """[height, width, depth] of the image, probing the file header unless a QImage is given."""
+        # Read from file path because self.imageData might be empty if saving to
+        # Pascal format
+        if isinstance(image_data, QImage):
+            image = image_data
+        else:
+            try:
+                return probe_image_size(image_path)
+            except OSError:
+                # Pillow 不认识的格式退回到 Qt 完整解码
+                image = QImage()
+                image.load(image_path)
+        return [image.height(), image.width(),
+                1 if image.isGrayscale() else 3]
+
     @staticmethod
     def is_label_file(filename):
         file_suffix = os.path.splitext(filename)[1].lower()
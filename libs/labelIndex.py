@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Search index over label names.
+
+Labels are kept in insertion order and, separately, in a case-folded sorted
+list so prefix lookups are two bisections. Searches that need more results
+fall back to substring and then subsequence ("fuzzy") matches, and stop as
+soon as ``limit`` results are found, so the cost of a keystroke does not grow
+with the vocabulary for the common prefix case.
+"""
+import re
+from itertools import accumulate
+from bisect import bisect_left, bisect_right, insort
+
+
+class LabelIndex(object):
+
+    def __init__(self, labels=()):
+        self.labels = []
+        self._keys = []
+        self._known = set()
+        # 所有折叠后的键以换行连接，子串/模糊匹配在一个字符串上由正则引擎完成
+        self._blob = None
+        self._offsets = None
+        for label in labels:
+            self.add(label)
+
+    def add(self, label):
+        """Add ``label``; returns False if it is already indexed."""
+        if label in self._known:
+            return False
+        self._known.add(label)
+        self.labels.append(label)
+        insort(self._keys, (label.casefold(), label))
+        self._blob = None
+        return True
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __contains__(self, label):
+        return label in self._known
+
+    def prefix(self, text, limit=None):
+        """Labels starting with ``text`` (case-insensitive), in sorted order."""
+        key = text.casefold()
+        matches = []
+        for i in range(bisect_left(self._keys, (key,)), len(self._keys)):
+            folded, label = self._keys[i]
+            if not folded.startswith(key) or (limit is not None and len(matches) >= limit):
+                break
+            matches.append(label)
+        return matches
+
+    def search(self, text, limit=200):
+        """
+        Up to ``limit`` labels matching ``text``: prefix matches first, then
+        labels containing it, then labels containing its characters in order.
+        An empty ``text`` returns labels in insertion order.
+        """
+        if not text:
+            return self.labels[:limit]
+        matches = self.prefix(text, limit)
+        if len(matches) >= limit:
+            return matches
+        key = text.casefold().replace('\n', '')
+        seen = set(matches)
+        substring = re.compile(re.escape(key))
+        fuzzy = re.compile('[^\n]*?'.join(re.escape(c) for c in key))
+        for pattern in (substring, fuzzy):
+            for row in self._matching_rows(pattern):
+                label = self._keys[row][1]
+                if label not in seen:
+                    seen.add(label)
+                    matches.append(label)
+                    if len(matches) >= limit:
+                        return matches
+        return matches
+
+    def _matching_rows(self, pattern):
+        if self._blob is None:
+            folded = [key for key, _ in self._keys]
+            self._blob = '\n'.join(folded)
+            self._offsets = list(accumulate((len(key) + 1 for key in folded), initial=0))
+        pos = 0
+        while True:
+            match = pattern.search(self._blob, pos)
+            if match is None:
+                return
+            row = bisect_right(self._offsets, match.start()) - 1
+            yield row
+            # 继续从下一行开始，每行最多报告一次
+            pos = self._offsets[row + 1]
@@ -0,0 +1,303 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Dataset-wide label operations.
+
+Rename, merge, delete and remap are all expressed as one mapping
+``{old_label: new_label}``, where a new label of ``None`` deletes the boxes.
+``remap_dataset`` applies a mapping to every annotation file of one format
+under a directory. Files are rewritten on a process pool, each with an
+atomic replace. YOLO files are staged next to the originals and only moved
+into place, together with the folder's new ``classes.txt``, once every file in
+the folder has been remapped.
+
+The pool uses the "spawn" start method: the operation runs on a Qt worker
+thread, and forking a multithreaded process is unsafe.
+"""
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from lxml import etree
+from PySide6.QtCore import QObject, QRunnable, Signal
+
+from libs.Io.atomic_io import atomic_write, stage_file
+from libs.Io.pascal_voc_io import ENCODE_METHOD, XML_EXT
+from libs.Io.yolo_io import CLASSES_FILE, TXT_EXT, load_class_list, save_class_list
+from libs.constants import JSON_EXT
+from libs.labelFile import LabelFileFormat
+
+# Below this many files the pool start-up costs more than it saves.
+MIN_FILES_FOR_POOL = 32
+
+
+def parse_mapping(text):
+    """
+    Parse rules such as ``"cat, kitty -> feline; dog -> ; car -> vehicle"``.
+    Labels on the left of ``->`` become the label on the right; an empty
+    right-hand side deletes them.
+    """
+    mapping = {}
+    for rule in text.split(';'):
+        if not rule.strip():
+            continue
+        if '->' not in rule:
+            raise ValueError('Missing "->" in rule %r' % rule.strip())
+        sources, target = rule.split('->', 1)
+        target = target.strip() or None
+        for source in sources.split(','):
+            source = source.strip()
+            if source:
+                mapping[source] = target
+    return mapping
+
+
+def map_label_list(labels, mapping):
+    """Apply ``mapping`` to an ordered label list, dropping deleted and duplicate labels."""
+    result = []
+    for label in labels:
+        label = mapping.get(label, label)
+        if label is not None and label not in result:
+            result.append(label)
+    return result
+
+
+def find_annotation_files(directory, label_format):
+    ext = {LabelFileFormat.PASCAL_VOC: XML_EXT,
+           LabelFileFormat.YOLO: TXT_EXT,
+           LabelFileFormat.CREATE_ML: JSON_EXT}[label_format]
+    paths = []
+    for root, dirs, files in os.walk(directory):
+        for name in files:
+            if name.lower().endswith(ext) and name != CLASSES_FILE:
+                paths.append(os.path.join(root, name))
+    paths.sort()
+    return paths
+
+
+def remap_voc_file(path, mapping):
+    parser = etree.XMLParser(remove_blank_text=True, encoding=ENCODE_METHOD)
+    root = etree.parse(path, parser).getroot()
+    changed = 0
+    for obj in root.findall('object'):
+        name = obj.find('name')
+        if name is None or name.text not in mapping:
+            continue
+        changed += 1
+        if mapping[name.text] is None:
+            root.remove(obj)
+        else:
+            name.text = mapping[name.text]
+    if changed:
+        data = etree.tostring(root, pretty_print=True, encoding=ENCODE_METHOD).replace("  ".encode(), "\t".encode())
+        with atomic_write(path, 'wb') as f:
+            f.write(data)
+    return changed
+
+
+def check_yolo_file(path, class_count):
+    """Raise ``ValueError`` if a box in ``path`` has a class index that is not an integer below ``class_count``."""
+    with open(path, 'r', encoding=ENCODE_METHOD) as f:
+        for number, line in enumerate(f, 1):
+            fields = line.split(' ', 1)
+            if not line.strip() or len(fields) < 2:
+                continue
+            try:
+                index = int(fields[0])
+            except ValueError:
+                raise ValueError('line %d: invalid class index %r' % (number, fields[0]))
+            if not 0 <= index < class_count:
+                raise ValueError('line %d: class index %d not in %s' % (number, index, CLASSES_FILE))
+
+
+def remap_yolo_file(path, index_map, affected=()):
+    """
+    ``index_map`` maps old class indices to new ones (``None`` deletes the
+    box); indices not in it are kept. Boxes whose old index is in
+    ``affected`` are counted as changed.
+
+    The file itself is not modified. Returns ``(changed, staged)``, where
+    ``staged`` is a temporary file with the new content to move over
+    ``path``, or None if no index changed.
+    """
+    with open(path, 'r', encoding=ENCODE_METHOD) as f:
+        lines = f.read().splitlines()
+    out = []
+    changed = 0
+    rewrite = False
+    for line in lines:
+        fields = line.split(' ', 1)
+        if not line.strip() or len(fields) < 2:
+            out.append(line)
+            continue
+        old = int(fields[0])
+        new = index_map.get(old, old)
+        if old in affected:
+            changed += 1
+        if new != old:
+            rewrite = True
+        if new is not None:
+            out.append('%d %s' % (new, fields[1]))
+    staged = None
+    if rewrite:
+        staged = stage_file(path, ''.join(line + '\n' for line in out), encoding=ENCODE_METHOD, newline='\n')
+    return changed, staged
+
+
+def remap_create_ml_file(path, mapping):
+    with open(path, 'r', encoding=ENCODE_METHOD) as f:
+        images = json.load(f)
+    changed = 0
+    for image in images:
+        annotations = []
+        for annotation in image.get('annotations', []):
+            label = annotation['label']
+            if label in mapping:
+                changed += 1
+                if mapping[label] is None:
+                    continue
+                annotation['label'] = mapping[label]
+            annotations.append(annotation)
+        image['annotations'] = annotations
+    if changed:
+        with atomic_write(path, encoding=ENCODE_METHOD) as f:
+            f.write(json.dumps(images))
+    return changed
+
+
+def remap_dataset(directory, label_format, mapping, workers=None, progress=None, cancelled=None):
+    """
+    Apply ``mapping`` to every annotation file of ``label_format`` under
+    ``directory``. ``progress(done, total)`` is called after each file and
+    ``cancelled()`` is polled between files. YOLO runs are not cancellable:
+    stopping half way would leave files indexed against different class lists.
+
+    Returns ``(changed_boxes, errors)`` where ``errors`` lists
+    ``(path, message)`` pairs for files that could not be rewritten.
+    """
+    paths = find_annotation_files(directory, label_format)
+    jobs = []
+    new_classes = {}
+    errors = []
+    if label_format == LabelFileFormat.YOLO:
+        # class indices are relative to the classes.txt next to each file
+        folders = {}
+        for path in paths:
+            folders.setdefault(os.path.dirname(path), []).append(path)
+        for folder, folder_paths in folders.items():
+            try:
+                classes = load_class_list(os.path.join(folder, CLASSES_FILE))
+            except OSError as e:
+                errors.append((os.path.join(folder, CLASSES_FILE), str(e)))
+                continue
+            # a file that cannot be remapped would keep its old indices against the
+            # new classes.txt, so one bad file leaves its whole folder untouched
+            invalid = []
+            for path in folder_paths:
+                try:
+                    check_yolo_file(path, len(classes))
+                except (OSError, ValueError) as e:
+                    invalid.append((path, str(e)))
+            if invalid:
+                errors.extend(invalid)
+                continue
+            new_classes[folder] = map_label_list(classes, mapping)
+            index_map, affected = {}, set()
+            for i, label in enumerate(classes):
+                target = mapping.get(label, label)
+                target = new_classes[folder].index(target) if target is not None else None
+                if target != i:
+                    index_map[i] = target
+                if label in mapping:
+                    affected.add(i)
+            jobs.extend((remap_yolo_file, path, (index_map, affected)) for path in folder_paths)
+    elif label_format == LabelFileFormat.CREATE_ML:
+        jobs = [(remap_create_ml_file, path, (mapping,)) for path in paths]
+    else:
+        jobs = [(remap_voc_file, path, (mapping,)) for path in paths]
+
+    if label_format == LabelFileFormat.YOLO:
+        cancelled = None
+    results = {}
+    total = len(jobs)
+    if total < MIN_FILES_FOR_POOL or workers == 1:
+        for done, (func, path, args) in enumerate(jobs, 1):
+            if cancelled is not None and cancelled():
+                break
+            try:
+                results[path] = func(path, *args)
+            except Exception as e:
+                errors.append((path, str(e)))
+            if progress is not None:
+                progress(done, total)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            futures = {executor.submit(func, path, *args): path for func, path, args in jobs}
+            for done, future in enumerate(as_completed(futures), 1):
+                try:
+                    results[futures[future]] = future.result()
+                except Exception as e:
+                    errors.append((futures[future], str(e)))
+                if progress is not None:
+                    progress(done, total)
+                if cancelled is not None and cancelled():
+                    executor.shutdown(cancel_futures=True)
+                    break
+
+    if label_format != LabelFileFormat.YOLO:
+        return sum(results.values()), errors
+    return _commit_yolo(results, new_classes, errors)
+
+
+def _commit_yolo(results, new_classes, errors):
+    """
+    Move the staged YOLO files into place and write the new ``classes.txt``,
+    for folders where every file was remapped. Other folders keep their old
+    files and class lists; their staged files are deleted.
+    """
+    failed = {}
+    for path, _ in errors:
+        failed[os.path.dirname(path)] = failed.get(os.path.dirname(path), 0) + 1
+    changed = 0
+    for path, (count, staged) in results.items():
+        if os.path.dirname(path) in failed:
+            if staged is not None:
+                os.remove(staged)
+            continue
+        if staged is not None:
+            os.replace(staged, path)
+        changed += count
+    for folder, classes in new_classes.items():
+        if folder in failed:
+            errors.append((folder, 'left unchanged because %d file(s) failed' % failed[folder]))
+        else:
+            save_class_list(os.path.join(folder, CLASSES_FILE), classes)
+    return changed, errors
+
+
+class LabelOpSignals(QObject):
+    progress = Signal(int, int)
+    finished = Signal(int, list)
+
+
+class LabelOpTask(QRunnable):
+    """Runs ``remap_dataset`` off the GUI thread and reports through ``signals``."""
+
+    def __init__(self, directory, label_format, mapping, workers=None):
+        super(LabelOpTask, self).__init__()
+        self.directory = directory
+        self.label_format = label_format
+        self.mapping = mapping
+        self.workers = workers
+        self.cancel_requested = False
+        self.signals = LabelOpSignals()
+
+    def cancel(self):
+        self.cancel_requested = True
+
+    def run(self):
+        changed, errors = remap_dataset(self.directory, self.label_format, self.mapping, self.workers,
+                                        progress=self.signals.progress.emit,
+                                        cancelled=lambda: self.cancel_requested)
+        self.signals.finished.emit(changed, errors)
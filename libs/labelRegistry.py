@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Single source of label names for the main window.
+
+``LabelRegistry`` interns label strings to integer ids in first-seen order,
+memoizes their display colors and keeps per-label counts of the boxes on the
+current image. It behaves like the plain list it replaces (``append``,
+``index``, ``in``, iteration, indexing), so the label dialog, the default
+label combo box and ``YOLOWriter`` class lists all read from the same object.
+"""
+from collections import Counter
+
+from PySide6.QtCore import QObject, Signal
+from PySide6.QtGui import QColor
+
+from libs.utils import generate_color_by_text
+
+
+class LabelRegistry(QObject):
+    labelAdded = Signal(str)
+
+    def __init__(self, labels=(), parent=None):
+        super(LabelRegistry, self).__init__(parent)
+        self.names = []
+        self.counts = Counter()
+        self._ids = {}
+        self._colors = {}
+        for label in labels:
+            self.intern(label)
+
+    def intern(self, label):
+        """Return the id of ``label``, registering it on first use."""
+        label_id = self._ids.get(label)
+        if label_id is None:
+            label_id = self._ids[label] = len(self.names)
+            self.names.append(label)
+            self.labelAdded.emit(label)
+        return label_id
+
+    def id_of(self, label):
+        return self._ids.get(label)
+
+    def reset(self, labels=()):
+        """Replace the registered labels without emitting ``labelAdded``."""
+        self.names = []
+        self._ids = {}
+        for label in labels:
+            if label not in self._ids:
+                self._ids[label] = len(self.names)
+                self.names.append(label)
+
+    def color(self, label):
+        """Display color of ``label``; the hash is computed once per label."""
+        color = self._colors.get(label)
+        if color is None:
+            color = self._colors[label] = generate_color_by_text(label)
+        return QColor(color)
+
+    def adjust_count(self, label, delta):
+        self.counts[label] += delta
+        if self.counts[label] <= 0:
+            del self.counts[label]
+
+    def clear_counts(self):
+        self.counts.clear()
+
+    def used_labels(self):
+        """Sorted labels that have at least one box on the current image."""
+        return sorted(self.counts)
+
+    # list interface, used by the YOLO writer and the dialogs
+    def append(self, label):
+        self.intern(label)
+
+    def index(self, label):
+        label_id = self._ids.get(label)
+        if label_id is None:
+            raise ValueError('%r is not a registered label' % (label,))
+        return label_id
+
+    def __contains__(self, label):
+        return label in self._ids
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, index):
+        return self.names[index]
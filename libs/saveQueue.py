@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Write-behind queue for annotation saves.
+
+The GUI thread snapshots what has to be written into a callable and submits
+it under a key (annotation path, image path). A single background thread
+runs the jobs in submission order; a job that is replaced before it starts
+is dropped, so only the last write for a key reaches the disk. ``saved`` and
+``failed`` are emitted from the worker and delivered on the GUI thread.
+
+Saves that must finish before returning go through ``run``. Writes to the
+same annotation path never overlap: ``run`` waits for queued and running
+jobs on that path, and the worker waits for a ``run`` on its path. This
+matters for formats such as CreateML, where several images share one file
+that every write reads, modifies and replaces.
+"""
+import threading
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+
+class _SaveTask(QRunnable):
+
+    def __init__(self, queue, key):
+        super(_SaveTask, self).__init__()
+        self.queue = queue
+        self.key = key
+
+    def run(self):
+        self.queue._run(self.key)
+
+
+class SaveQueue(QObject):
+    saved = Signal(str)
+    failed = Signal(str, str)
+
+    def __init__(self, parent=None):
+        super(SaveQueue, self).__init__(parent)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+        self._lock = threading.Condition()
+        self._pending = {}
+        self._running = None
+        self._writing = set()
+
+    def submit(self, annotation_path, image_path, job):
+        """Queue ``job()``; replaces a queued job with the same paths that has not started yet."""
+        key = (annotation_path, image_path)
+        with self._lock:
+            scheduled = key in self._pending
+            self._pending[key] = job
+        if not scheduled:
+            self._pool.start(_SaveTask(self, key))
+
+    def run(self, annotation_path, image_path, job):
+        """
+        Run ``job()`` on the calling thread once no queued or running job
+        writes ``annotation_path``, and return its result. A queued job for
+        the same paths is dropped, since ``job`` supersedes it.
+        """
+        with self._lock:
+            self._pending.pop((annotation_path, image_path), None)
+            self._lock.wait_for(lambda: not self._busy(annotation_path))
+            self._writing.add(annotation_path)
+        try:
+            return job()
+        finally:
+            with self._lock:
+                self._writing.discard(annotation_path)
+                self._lock.notify_all()
+
+    def _busy(self, annotation_path):
+        if self._running is not None and self._running[0] == annotation_path:
+            return True
+        return any(key[0] == annotation_path for key in self._pending)
+
+    def is_pending(self, image_path):
+        with self._lock:
+            keys = list(self._pending)
+            if self._running is not None:
+                keys.append(self._running)
+        return any(key[1] == image_path for key in keys)
+
+    def flush(self):
+        """Block until every queued save has been written."""
+        self._pool.waitForDone()
+
+    def _run(self, key):
+        with self._lock:
+            self._lock.wait_for(lambda: key[0] not in self._writing)
+            job = self._pending.pop(key, None)
+            self._running = key
+        try:
+            if job is not None:
+                job()
+                self.saved.emit(key[0])
+        except Exception as e:
+            self.failed.emit(key[0], str(e))
+        finally:
+            with self._lock:
+                self._running = None
+                self._lock.notify_all()
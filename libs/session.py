@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Persisted browsing session.
+
+When the window closes on a directory, the session stores the dataset root,
+the image list in its display order, the current image and the label filter.
+On the next start the list is read back instead of walking the directory
+again, so the last image is shown right away.
+
+The file has a small JSON header followed by the image paths, relative to
+the root and separated by NUL bytes. It is read through ``mmap`` and the
+path block is decoded in one go. A session is only trusted if every
+directory the image scan walked still has the modification time recorded
+for it. Adding, removing or renaming an entry changes the time of its
+directory, including directories that held no images when scanned.
+"""
+import json
+import mmap
+import os
+import struct
+
+from libs.Io.atomic_io import atomic_write
+
+MAGIC = b'LBLSESS1'
+_HEADER = struct.Struct('<8sI')
+
+
+def directory_times(root):
+    """Modification times of ``root`` and every directory below it, keyed by path relative to ``root``."""
+    times = {}
+    for path, _dirs, _files in os.walk(root):
+        relative = os.path.relpath(path, root)
+        times['' if relative == os.curdir else relative] = os.stat(path).st_mtime_ns
+    return times
+
+
+class Session(object):
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(os.path.expanduser("~"), '.labelImgSession')
+
+    def save(self, root, images, index, save_dir=None, label_filter='', dirs=None):
+        """
+        Write the session for ``images`` (absolute paths under ``root``) with
+        ``index`` current. ``dirs`` are the directory times recorded when the
+        images were scanned (see ``directory_times``). Without them the tree
+        is walked now, which misses changes made since the scan.
+        """
+        if not self.path:
+            return False
+        relative = [os.path.relpath(path, root) for path in images]
+        if dirs is None:
+            dirs = directory_times(root)
+        header = dict(root=root, index=index, save_dir=save_dir or '', label_filter=label_filter or '',
+                      dirs=dirs)
+        header = json.dumps(header).encode('utf-8')
+        with atomic_write(self.path, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, len(header)))
+            f.write(header)
+            f.write('\0'.join(relative).encode('utf-8'))
+        return True
+
+    def load(self):
+        """
+        Return the saved state as a dict with ``root``, ``images``, ``index``,
+        ``save_dir``, ``label_filter`` and ``dirs``, or None if there is no session or
+        the dataset changed since it was written.
+        """
+        try:
+            with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                magic, size = _HEADER.unpack_from(data)
+                if magic != MAGIC:
+                    return None
+                start = _HEADER.size + size
+                header = json.loads(data[_HEADER.size:start].decode('utf-8'))
+                blob = data[start:].decode('utf-8')
+        except (OSError, ValueError, struct.error, TypeError):
+            return None
+        root = header['root']
+        for d, mtime in header['dirs'].items():
+            try:
+                if os.stat(os.path.join(root, d)).st_mtime_ns != mtime:
+                    return None
+            except OSError:
+                return None
+        images = [os.path.join(root, path) for path in blob.split('\0')] if blob else []
+        if not 0 <= header['index'] < len(images):
+            return None
+        header['images'] = images
+        return header
+
+    def clear(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def reset(self):
+        self.clear()
+        self.path = None
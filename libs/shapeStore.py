@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Columnar storage of box annotations.
+
+The canvas keeps one ``Shape`` object per box, which is convenient for editing
+but slow to scan when an image carries thousands of boxes. ``ShapeStore`` keeps
+the same boxes as NumPy arrays (vertex coordinates, class ids, flags and
+colors) so hit-testing and viewport culling are a handful of vectorised
+operations. ``Shape`` views are only materialised on demand.
+
+NumPy is optional; use ``ShapeStore.available()`` before building a store.
+It is imported on that first call, so images below the canvas threshold never
+pay for it.
+"""
+from PySide6.QtCore import QPointF
+from PySide6.QtGui import QColor
+
+from libs.shape import Shape
+
+np = None
+
+
+def _import_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return False
+        np = numpy
+    return True
+
+
+class ShapeStore(object):
+    FLAG_DIFFICULT = 1
+    FLAG_HIDDEN = 2
+
+    def __init__(self, size=0):
+        if not _import_numpy():
+            raise ImportError('ShapeStore requires numpy')
+        # (N, 4, 2) vertex coordinates, in the same order as Shape.points.
+        self.coords = np.zeros((size, 4, 2), dtype=np.float64)
+        # (N, 4) x_min, y_min, x_max, y_max
+        self.boxes = np.zeros((size, 4), dtype=np.float64)
+        self.class_ids = np.zeros(size, dtype=np.int32)
+        self.flags = np.zeros(size, dtype=np.uint8)
+        # ARGB32, 0 means "use the Shape class default".
+        self.line_colors = np.zeros(size, dtype=np.uint32)
+        self.fill_colors = np.zeros(size, dtype=np.uint32)
+        self.labels = []
+        self._label_ids = {}
+        self._shapes = [None] * size
+        self._rows = {}
+
+    @staticmethod
+    def available():
+        return _import_numpy()
+
+    @classmethod
+    def from_shapes(cls, shapes, visible=None):
+        """Build a store mirroring existing ``Shape`` objects (rows keep their order)."""
+        shapes = list(shapes)
+        store = cls(len(shapes))
+        for row, shape in enumerate(shapes):
+            store._shapes[row] = shape
+            store._rows[id(shape)] = row
+            store._fill_row(row, shape)
+            if visible is not None and not visible.get(shape, True):
+                store.flags[row] |= cls.FLAG_HIDDEN
+        store._update_boxes()
+        return store
+
+    @classmethod
+    def from_label_tuples(cls, shapes):
+        """
+        Build a store straight from reader output
+        ``(label, points, line_color, fill_color, difficult)`` without creating
+        any ``Shape`` objects.
+        """
+        shapes = list(shapes)
+        store = cls(len(shapes))
+        for row, (label, points, line_color, fill_color, difficult) in enumerate(shapes):
+            points = list(points)[:4]
+            points += [points[-1]] * (4 - len(points))
+            store.coords[row] = points
+            store.class_ids[row] = store.intern(label)
+            if difficult:
+                store.flags[row] |= cls.FLAG_DIFFICULT
+            if line_color:
+                store.line_colors[row] = QColor(*line_color).rgba()
+            if fill_color:
+                store.fill_colors[row] = QColor(*fill_color).rgba()
+        store._update_boxes()
+        return store
+
+    def __len__(self):
+        return len(self._shapes)
+
+    def intern(self, label):
+        label = label or ''
+        class_id = self._label_ids.get(label)
+        if class_id is None:
+            class_id = self._label_ids[label] = len(self.labels)
+            self.labels.append(label)
+        return class_id
+
+    def row_of(self, shape):
+        return self._rows.get(id(shape))
+
+    def shape(self, row):
+        """Return the ``Shape`` view of a row, materialising it on first access."""
+        shape = self._shapes[row]
+        if shape is None:
+            shape = Shape(label=self.labels[self.class_ids[row]],
+                          difficult=bool(self.flags[row] & self.FLAG_DIFFICULT))
+            for x, y in self.coords[row]:
+                shape.add_point(QPointF(float(x), float(y)))
+            shape.close()
+            if self.line_colors[row]:
+                shape.line_color = QColor.fromRgba(int(self.line_colors[row]))
+            if self.fill_colors[row]:
+                shape.fill_color = QColor.fromRgba(int(self.fill_colors[row]))
+            self._shapes[row] = shape
+            self._rows[id(shape)] = row
+        return shape
+
+    def update(self, shape):
+        """Refresh the row of an edited shape. Returns False if the shape is unknown."""
+        row = self.row_of(shape)
+        if row is None:
+            return False
+        self._fill_row(row, shape)
+        self._update_boxes(row)
+        return True
+
+    def set_hidden(self, shape, hidden):
+        row = self.row_of(shape)
+        if row is None:
+            return False
+        if hidden:
+            self.flags[row] |= self.FLAG_HIDDEN
+        else:
+            self.flags[row] &= ~np.uint8(self.FLAG_HIDDEN)
+        return True
+
+    def hit_test(self, x, y, epsilon, rows=None):
+        """
+        Return the topmost row whose box contains (x, y) or that has a vertex
+        within ``epsilon``, or None. ``rows`` restricts the search to a subset.
+        """
+        if rows is None:
+            candidates = np.flatnonzero((self.flags & self.FLAG_HIDDEN) == 0)
+        else:
+            candidates = np.asarray(rows, dtype=np.intp)
+        if not len(candidates):
+            return None
+        boxes = self.boxes[candidates]
+        inside = (boxes[:, 0] <= x) & (x <= boxes[:, 2]) & (boxes[:, 1] <= y) & (y <= boxes[:, 3])
+        delta = self.coords[candidates] - (x, y)
+        near = (np.einsum('ijk,ijk->ij', delta, delta) <= epsilon * epsilon).any(axis=1)
+        hits = np.flatnonzero(inside | near)
+        if not len(hits):
+            return None
+        return int(candidates[hits[-1]])
+
+    def cull(self, x_min, y_min, x_max, y_max, margin_x=0.0, margin_y=0.0):
+        """Return the visible rows, in paint order, whose box intersects the rectangle."""
+        boxes = self.boxes
+        keep = ((self.flags & self.FLAG_HIDDEN) == 0) & \
+               (boxes[:, 2] >= x_min - margin_x) & (boxes[:, 0] <= x_max + margin_x) & \
+               (boxes[:, 3] >= y_min - margin_y) & (boxes[:, 1] <= y_max + margin_y)
+        return np.flatnonzero(keep)
+
+    def _fill_row(self, row, shape):
+        points = [(p.x(), p.y()) for p in shape.points[:4]]
+        if not points:
+            points = [(0.0, 0.0)]
+        points += [points[-1]] * (4 - len(points))
+        self.coords[row] = points
+        self.class_ids[row] = self.intern(shape.label)
+        if shape.difficult:
+            self.flags[row] |= self.FLAG_DIFFICULT
+        else:
+            self.flags[row] &= ~np.uint8(self.FLAG_DIFFICULT)
+        self.line_colors[row] = shape.line_color.rgba() if shape.line_color != Shape.line_color else 0
+        self.fill_colors[row] = shape.fill_color.rgba() if shape.fill_color != Shape.fill_color else 0
+
+    def _update_boxes(self, row=None):
+        coords = self.coords if row is None else self.coords[row:row + 1]
+        target = self.boxes if row is None else self.boxes[row:row + 1]
+        target[:, 0:2] = coords.min(axis=1)
+        target[:, 2:4] = coords.max(axis=1)
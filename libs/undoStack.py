@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Undo/redo history for canvas edits.
+
+Every edit is pushed as a small command that refers to its shape by an
+integer id and stores only what changed: vertex coordinates as ``array('d')``
+for moves and resizes, the old and new text for relabels, and a compact
+``ShapeRecord`` for creations and deletions. The history is bounded by an
+approximate byte budget (and optionally a step count); the oldest steps are
+dropped first.
+
+Commands are applied through an *editor* object that keeps the canvas and
+the label list in sync. It must provide ``insert_shape(index, shape)``,
+``remove_shape(shape)``, ``set_shape_points(shape, points)``,
+``set_shape_label(shape, label)`` and ``set_shape_difficult(shape, value)``.
+"""
+import sys
+from array import array
+from collections import deque
+
+from PySide6.QtCore import QPointF
+from PySide6.QtGui import QColor
+
+from libs.shape import Shape
+
+
+def points_to_array(points):
+    coords = array('d')
+    for p in points:
+        coords.append(p.x())
+        coords.append(p.y())
+    return coords
+
+
+def array_to_points(coords):
+    return [QPointF(coords[i], coords[i + 1]) for i in range(0, len(coords), 2)]
+
+
+class ShapeRecord(object):
+    """Everything needed to rebuild a deleted shape."""
+    __slots__ = ('label', 'coords', 'difficult', 'line_color', 'fill_color')
+
+    def __init__(self, shape):
+        self.label = shape.label
+        self.coords = points_to_array(shape.points)
+        self.difficult = shape.difficult
+        self.line_color = shape.line_color.rgba()
+        self.fill_color = shape.fill_color.rgba()
+
+    def to_shape(self):
+        shape = Shape(label=self.label, difficult=self.difficult)
+        shape.points = array_to_points(self.coords)
+        shape.close()
+        shape.line_color = QColor.fromRgba(self.line_color)
+        shape.fill_color = QColor.fromRgba(self.fill_color)
+        return shape
+
+    def nbytes(self):
+        return 64 + len(self.coords) * self.coords.itemsize + sys.getsizeof(self.label or '')
+
+
+class Command(object):
+    __slots__ = ('sid',)
+    text = ''
+
+    def __init__(self, sid):
+        self.sid = sid
+
+    def nbytes(self):
+        return 64
+
+
+class CreateShape(Command):
+    __slots__ = ('index', 'record')
+    text = 'create'
+
+    def __init__(self, sid, index, record):
+        super(CreateShape, self).__init__(sid)
+        self.index = index
+        self.record = record
+
+    def undo(self, stack, editor):
+        editor.remove_shape(stack.release(self.sid))
+
+    def redo(self, stack, editor):
+        editor.insert_shape(self.index, stack.bind(self.sid, self.record.to_shape()))
+
+    def nbytes(self):
+        return 64 + self.record.nbytes()
+
+
+class DeleteShape(CreateShape):
+    __slots__ = ()
+    text = 'delete'
+
+    undo, redo = CreateShape.redo, CreateShape.undo
+
+
+class MoveShape(Command):
+    __slots__ = ('before', 'after')
+    text = 'move'
+
+    def __init__(self, sid, before, after):
+        super(MoveShape, self).__init__(sid)
+        self.before = before
+        self.after = after
+
+    def undo(self, stack, editor):
+        editor.set_shape_points(stack.shape_of(self.sid), array_to_points(self.before))
+
+    def redo(self, stack, editor):
+        editor.set_shape_points(stack.shape_of(self.sid), array_to_points(self.after))
+
+    def nbytes(self):
+        return 64 + (len(self.before) + len(self.after)) * self.before.itemsize
+
+
+class Relabel(Command):
+    __slots__ = ('before', 'after')
+    text = 'relabel'
+
+    def __init__(self, sid, before, after):
+        super(Relabel, self).__init__(sid)
+        self.before = before
+        self.after = after
+
+    def undo(self, stack, editor):
+        editor.set_shape_label(stack.shape_of(self.sid), self.before)
+
+    def redo(self, stack, editor):
+        editor.set_shape_label(stack.shape_of(self.sid), self.after)
+
+    def nbytes(self):
+        return 64 + sys.getsizeof(self.before or '') + sys.getsizeof(self.after or '')
+
+
+class SetDifficult(Command):
+    __slots__ = ('value',)
+    text = 'difficult'
+
+    def __init__(self, sid, value):
+        super(SetDifficult, self).__init__(sid)
+        self.value = value
+
+    def undo(self, stack, editor):
+        editor.set_shape_difficult(stack.shape_of(self.sid), not self.value)
+
+    def redo(self, stack, editor):
+        editor.set_shape_difficult(stack.shape_of(self.sid), self.value)
+
+
+class UndoStack(object):
+
+    def __init__(self, max_bytes=4 * 1024 * 1024, max_steps=None):
+        self.max_bytes = max_bytes
+        self.max_steps = max_steps
+        self._done = deque()
+        self._undone = []
+        self._nbytes = 0
+        self._ids = {}
+        self._shapes = {}
+        self._next_id = 0
+
+    def clear(self):
+        self._done.clear()
+        self._undone = []
+        self._nbytes = 0
+        self._ids = {}
+        self._shapes = {}
+
+    # shape ids
+    def id_of(self, shape):
+        sid = self._ids.get(shape)
+        if sid is None:
+            sid = self._next_id
+            self._next_id += 1
+            self.bind(sid, shape)
+        return sid
+
+    def bind(self, sid, shape):
+        self._ids[shape] = sid
+        self._shapes[sid] = shape
+        return shape
+
+    def release(self, sid):
+        shape = self._shapes.pop(sid)
+        del self._ids[shape]
+        return shape
+
+    def shape_of(self, sid):
+        return self._shapes[sid]
+
+    # recording
+    def created(self, shape, index):
+        self.push(CreateShape(self.id_of(shape), index, ShapeRecord(shape)))
+
+    def deleted(self, shape, index):
+        sid = self.id_of(shape)
+        self.release(sid)
+        self.push(DeleteShape(sid, index, ShapeRecord(shape)))
+
+    def moved(self, shape, before_points):
+        before = points_to_array(before_points)
+        after = points_to_array(shape.points)
+        if before != after:
+            self.push(MoveShape(self.id_of(shape), before, after))
+
+    def relabeled(self, shape, before, after):
+        if before != after:
+            self.push(Relabel(self.id_of(shape), before, after))
+
+    def difficulty_changed(self, shape, value):
+        self.push(SetDifficult(self.id_of(shape), value))
+
+    def push(self, command):
+        self._undone = []
+        self._done.append(command)
+        self._nbytes += command.nbytes()
+        while self._done and (self._nbytes > self.max_bytes or
+                              (self.max_steps is not None and len(self._done) > self.max_steps)):
+            self._nbytes -= self._done.popleft().nbytes()
+
+    # applying
+    def can_undo(self):
+        return bool(self._done)
+
+    def can_redo(self):
+        return bool(self._undone)
+
+    def undo(self, editor):
+        if not self._done:
+            return None
+        command = self._done.pop()
+        self._nbytes -= command.nbytes()
+        command.undo(self, editor)
+        self._undone.append(command)
+        return command
+
+    def redo(self, editor):
+        if not self._undone:
+            return None
+        command = self._undone.pop()
+        command.redo(self, editor)
+        self._done.append(command)
+        self._nbytes += command.nbytes()
+        return command
+
+    def __len__(self):
+        return len(self._done)
+
+    def nbytes(self):
+        return self._nbytes
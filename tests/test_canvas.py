@@ -0,0 +1,224 @@
+import io
+import os
+import subprocess
+import sys
+import unittest
+
+from PySide6.QtCore import QEvent, QPoint, QPointF, Qt, QThreadPool
+from PySide6.QtGui import QImage, QMouseEvent, QPixmap
+from PySide6.QtWidgets import QApplication
+
+from libs.canvas import Canvas, build_mipmaps, mipmap_level
+from libs.frameProfiler import FrameProfiler, percentile
+from libs.shape import Shape
+from libs.shapeStore import ShapeStore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_shape(x_min, y_min, x_max, y_max, label='box'):
+    shape = Shape(label=label)
+    for x, y in ((x_min, y_min), (x_max, y_min), (x_max, y_max), (x_min, y_max)):
+        shape.add_point(QPointF(x, y))
+    shape.close()
+    return shape
+
+
+class TestCanvas(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def setUp(self):
+        self.canvas = Canvas()
+        self.canvas.resize(200, 200)
+        self.canvas.load_pixmap(QPixmap(200, 200))
+
+    def test_mouse_moves_are_coalesced(self):
+        processed = []
+        self.canvas.handle_mouse_move = lambda pos, buttons: processed.append(pos)
+        for x in range(10):
+            self.canvas._pending_move = (QPoint(x, x), Qt.NoButton)
+            self.canvas._move_timer.start(0)
+        self.canvas.flush_mouse_move()
+        self.canvas.flush_mouse_move()
+        self.assertEqual([QPoint(9, 9)], processed)
+
+    def test_hover_highlights_latest_position(self):
+        shape = make_shape(50, 50, 150, 150)
+        self.canvas.load_shapes([shape])
+        self.canvas._pending_move = (QPoint(100, 100), Qt.NoButton)
+        self.canvas.flush_mouse_move()
+        self.assertIs(shape, self.canvas.h_shape)
+        self.assertIsNone(self.canvas.h_vertex)
+
+    def test_drag_frames_reuse_background_layer(self):
+        moving, still = make_shape(10, 10, 50, 50), make_shape(100, 100, 150, 150)
+        self.canvas.load_shapes([moving, still])
+        self.canvas.show()
+        scenes = []
+        paint_scene = self.canvas._paint_scene
+        self.canvas._paint_scene = lambda *args: scenes.append(args[-1]) or paint_scene(*args)
+        self.canvas.mousePressEvent(self.mouse_event(QEvent.MouseButtonPress, QPoint(30, 30), Qt.LeftButton))
+        for x in range(31, 36):
+            self.canvas.mouseMoveEvent(self.mouse_event(QEvent.MouseMove, QPoint(x, 30), Qt.NoButton, Qt.LeftButton))
+            self.canvas.flush_mouse_move()
+            self.canvas.grab()
+        self.assertEqual([moving], scenes)
+        self.assertEqual(15.0, moving[0].x())
+        edits = []
+        self.canvas.shapeEdited.connect(lambda shape, before: edits.append((shape, before[0].x())))
+        self.canvas.mouseReleaseEvent(self.mouse_event(QEvent.MouseButtonRelease, QPoint(35, 30), Qt.LeftButton))
+        self.assertIsNone(self.canvas._background)
+        self.assertEqual([(moving, 10.0)], edits)
+
+    def test_create_mode_paints_shape_changes_until_drawing_starts(self):
+        shape = make_shape(10, 10, 50, 50)
+        self.canvas.load_shapes([shape])
+        self.canvas.set_editing(False)
+        self.canvas.show()
+        scenes = []
+        paint_scene = self.canvas._paint_scene
+        self.canvas._paint_scene = lambda *args: scenes.append(args) or paint_scene(*args)
+        self.canvas.grab()
+        self.canvas.grab()
+        self.assertEqual(2, len(scenes))
+        self.assertIsNone(self.canvas._background)
+        self.canvas.current = make_shape(100, 100, 120, 120)
+        self.canvas.grab()
+        self.canvas.grab()
+        self.assertEqual(3, len(scenes))
+
+    def test_mipmaps_are_built_in_background(self):
+        self.canvas.load_pixmap(QPixmap(600, 400))
+        QThreadPool.globalInstance().waitForDone()
+        QApplication.processEvents()
+        self.assertEqual({1: (300, 200), 2: (150, 100)},
+                         {level: (pixmap.width(), pixmap.height())
+                          for level, pixmap in self.canvas._mipmaps.items()})
+        self.canvas.scale = 0.2
+        self.assertEqual(2, self.canvas._image_for_scale()[0])
+
+    def test_mipmap_level_keeps_residual_scale_below_two(self):
+        self.assertEqual([0, 0, 1, 1, 2, 3], [mipmap_level(s) for s in (2.0, 0.6, 0.5, 0.3, 0.25, 0.1)])
+        self.assertEqual([(32, 32), (16, 16)],
+                         [(image.width(), image.height()) for image in build_mipmaps(QImage(64, 64, QImage.Format_RGB32), 16)])
+
+    @staticmethod
+    def mouse_event(kind, pos, button, buttons=None):
+        return QMouseEvent(kind, QPointF(pos), QPointF(pos), button,
+                           button if buttons is None else buttons, Qt.NoModifier)
+
+    @unittest.skipUnless(ShapeStore.available(), 'numpy is not installed')
+    def test_store_hit_test_matches_shape_scan(self):
+        shapes = [make_shape(x, x, x + 20, x + 20) for x in range(0, 160, 2)]
+        self.canvas.load_shapes(shapes)
+        for point in (QPoint(50, 50), QPoint(3, 12), QPoint(190, 5), QPoint(170, 175)):
+            highlights = []
+            for threshold in (10 ** 6, 1):
+                self.canvas.store_threshold = threshold
+                self.canvas.un_highlight()
+                self.canvas._pending_move = (point, Qt.NoButton)
+                self.canvas.flush_mouse_move()
+                highlights.append((self.canvas.h_shape, self.canvas.h_vertex))
+            self.assertIsNotNone(self.canvas.shape_store())
+            self.assertEqual(highlights[0], highlights[1])
+
+    @unittest.skipUnless(ShapeStore.available(), 'numpy is not installed')
+    def test_store_tracks_moves_and_visibility(self):
+        shapes = [make_shape(x, 0, x + 1, 1) for x in range(100)]
+        self.canvas.load_shapes(shapes)
+        store = self.canvas.shape_store()
+        self.canvas.calculate_offsets(shapes[0], QPointF(0, 0))
+        self.canvas.prev_point = QPointF(0, 0)
+        self.canvas.bounded_move_shape(shapes[0], QPointF(10, 150))
+        self.assertEqual([10.0, 150.0, 11.0, 151.0], list(store.boxes[0]))
+        self.canvas.set_shape_visible(shapes[1], False)
+        self.assertNotIn(1, list(store.cull(0, 0, 200, 200)))
+
+    def test_profiler_overlay_records_frames(self):
+        self.canvas.load_shapes([make_shape(10, 10, 50, 50)])
+        self.canvas.show()
+        self.canvas.set_profiler_overlay(True)
+        self.canvas.grab()
+        self.canvas._pending_move = (QPoint(30, 30), Qt.NoButton)
+        self.canvas.flush_mouse_move()
+        stats = self.canvas.profiler.summary()
+        self.assertEqual(1, stats['shapes_drawn'])
+        self.assertEqual(1, len(self.canvas.profiler.hit_test_times))
+        self.assertGreater(stats['repaints_per_second'], 0)
+
+
+class TestFrameProfiler(unittest.TestCase):
+
+    def test_percentile(self):
+        self.assertEqual(0.0, percentile([], 0.5))
+        self.assertEqual(3, percentile([5, 1, 3, 2, 4], 0.5))
+        self.assertEqual(5, percentile([5, 1, 3, 2, 4], 0.99))
+
+    def test_log_stream_written_once_per_interval(self):
+        now = [0.0]
+        log = io.StringIO()
+        profiler = FrameProfiler(log_stream=log, log_interval=1.0, clock=lambda: now[0])
+        for step in range(10):
+            now[0] = step * 0.25
+            profiler.record_paint(0.004, 10, 90)
+        self.assertEqual(2, len(log.getvalue().splitlines()))
+        self.assertIn('shapes drawn 10  culled 90', log.getvalue())
+        self.assertEqual(5, profiler.repaints_per_second())
+
+    def test_close_only_closes_owned_stream(self):
+        shared, owned = io.StringIO(), io.StringIO()
+        FrameProfiler(log_stream=shared).close()
+        profiler = FrameProfiler(log_stream=owned, owns_stream=True)
+        profiler.close()
+        self.assertFalse(shared.closed)
+        self.assertTrue(owned.closed)
+        self.assertIsNone(profiler.log_stream)
+        profiler.record_paint(0.004, 1, 0)
+
+
+@unittest.skipUnless(ShapeStore.available(), 'numpy is not installed')
+class TestShapeStore(unittest.TestCase):
+
+    def test_numpy_imported_only_above_threshold(self):
+        script = ('import sys\n'
+                  'from PySide6.QtWidgets import QApplication\n'
+                  'from PySide6.QtGui import QPixmap\n'
+                  'app = QApplication([])\n'
+                  'import labelImg\n'
+                  'from libs.canvas import Canvas\n'
+                  'canvas = Canvas()\n'
+                  'canvas.load_pixmap(QPixmap(10, 10))\n'
+                  'canvas.shape_store()\n'
+                  'assert "numpy" not in sys.modules\n'
+                  'canvas.store_threshold = 0\n'
+                  'assert canvas.shape_store() is not None and "numpy" in sys.modules\n')
+        env = dict(os.environ, QT_QPA_PLATFORM='offscreen')
+        subprocess.run([sys.executable, '-c', script], cwd=ROOT, env=env, check=True)
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def test_from_label_tuples_materializes_lazily(self):
+        store = ShapeStore.from_label_tuples([
+            ('cat', [(1, 2), (10, 2), (10, 20), (1, 20)], None, None, True),
+            ('dog', [(5, 5), (8, 5), (8, 8), (5, 8)], (255, 0, 0, 128), None, False),
+        ])
+        self.assertEqual(['cat', 'dog'], store.labels)
+        self.assertEqual(1, store.hit_test(6, 6, 0.0))
+        self.assertEqual(0, store.hit_test(2, 19, 0.0))
+        self.assertIsNone(store.hit_test(50, 50, 0.0))
+        self.assertEqual([0], list(store.cull(0, 0, 3, 3)))
+        shape = store.shape(0)
+        self.assertEqual('cat', shape.label)
+        self.assertTrue(shape.difficult)
+        self.assertEqual((10.0, 20.0), (shape[2].x(), shape[2].y()))
+        self.assertIs(shape, store.shape(0))
+        self.assertEqual((255, 0, 0, 128), store.shape(1).line_color.getRgb())
+
+
+if __name__ == '__main__':
+    unittest.main()
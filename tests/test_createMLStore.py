@@ -0,0 +1,154 @@
+import json
+import os
+import tempfile
+import unittest
+
+from libs.Io import create_ml_io
+from libs.Io.create_ml_io import (CreateMLReader, CreateMLStore, CreateMLWriter, close_stores, get_store,
+                                  iter_create_ml, write_create_ml_stream)
+
+
+def entry(name, label='cat'):
+    return {'image': name, 'verified': False,
+            'annotations': [{'label': label, 'coordinates': {'x': 5, 'y': 5, 'width': 4, 'height': 4}}]}
+
+
+class TestCreateMLStore(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'dataset.json')
+        self.limits = create_ml_io.SMALL_STORE, create_ml_io.COMPACT_MIN_RECORDS
+        create_ml_io.SMALL_STORE, create_ml_io.COMPACT_MIN_RECORDS = 2, 3
+
+    def tearDown(self):
+        create_ml_io.SMALL_STORE, create_ml_io.COMPACT_MIN_RECORDS = self.limits
+        close_stores()
+        self.dir.cleanup()
+
+    def read(self):
+        with open(self.path) as f:
+            return json.load(f)
+
+    def test_small_store_writes_json_directly(self):
+        store = CreateMLStore(self.path)
+        store.put(entry('a.jpg'))
+        store.put(entry('a.jpg', 'dog'))
+        self.assertEqual([entry('a.jpg', 'dog')], self.read())
+        self.assertFalse(os.path.exists(store.journal_path))
+
+    def test_journal_replay_and_compaction(self):
+        store = CreateMLStore(self.path)
+        for name in ('a.jpg', 'b.jpg'):
+            store.put(entry(name))
+        store.put(entry('c.jpg'))
+        store.put(entry('a.jpg', 'dog'))
+        # 大数据集的保存只追加日志，JSON 文件不变
+        self.assertEqual(2, len(self.read()))
+        self.assertEqual(2, store.journal_records)
+
+        reopened = CreateMLStore(self.path)
+        self.assertEqual('dog', reopened.get('a.jpg')['annotations'][0]['label'])
+        self.assertEqual(['a.jpg', 'b.jpg', 'c.jpg'], [e['image'] for e in reopened.images()])
+
+        store.put(entry('d.jpg'))
+        self.assertFalse(os.path.exists(store.journal_path))
+        self.assertEqual(['a.jpg', 'b.jpg', 'c.jpg', 'd.jpg'], [e['image'] for e in self.read()])
+
+    def test_duplicate_image_entries_survive_compaction(self):
+        write_create_ml_stream(self.path, [entry('a.jpg'), entry('b.jpg'), entry('a.jpg', 'bird')])
+        store = CreateMLStore(self.path)
+        self.assertEqual('cat', store.get('a.jpg')['annotations'][0]['label'])
+        # 日志中的保存替换第一个同名条目，其余条目原样保留
+        store.put(entry('a.jpg', 'dog'))
+        self.assertEqual(1, store.journal_records)
+        reopened = CreateMLStore(self.path)
+        self.assertEqual(store.images(), reopened.images())
+        store.compact()
+        self.assertEqual([entry('a.jpg', 'dog'), entry('b.jpg'), entry('a.jpg', 'bird')], self.read())
+
+    def test_torn_journal_tail_is_compacted_on_load(self):
+        store = CreateMLStore(self.path)
+        for name in ('a.jpg', 'b.jpg', 'c.jpg'):
+            store.put(entry(name))
+        with open(store.journal_path, 'a') as f:
+            f.write('{"image": "d.jpg", "annot')
+        reopened = CreateMLStore(self.path)
+        self.assertFalse(os.path.exists(reopened.journal_path))
+        self.assertEqual(['a.jpg', 'b.jpg', 'c.jpg'], [e['image'] for e in self.read()])
+        reopened.put(entry('e.jpg'))
+        self.assertEqual(['a.jpg', 'b.jpg', 'c.jpg', 'e.jpg'],
+                         [e['image'] for e in CreateMLStore(self.path).images()])
+
+    def test_least_recently_used_store_is_closed(self):
+        limit = create_ml_io.MAX_OPEN_STORES
+        create_ml_io.MAX_OPEN_STORES = 2
+        self.addCleanup(setattr, create_ml_io, 'MAX_OPEN_STORES', limit)
+        paths = [os.path.join(self.dir.name, '%s.json' % name) for name in 'abc']
+        for path in paths:
+            with open(path, 'w') as f:
+                json.dump([entry('x.jpg'), entry('y.jpg')], f)
+        first = get_store(paths[0])
+        first.put(entry('z.jpg'))
+        self.assertEqual(1, first.journal_records)
+        get_store(paths[1])
+        get_store(paths[0])
+        get_store(paths[2])
+        self.assertEqual([paths[0], paths[2]], list(create_ml_io._stores))
+        get_store(paths[1])
+        self.assertEqual([paths[2], paths[1]], list(create_ml_io._stores))
+        with open(paths[0]) as f:
+            self.assertEqual(['x.jpg', 'y.jpg', 'z.jpg'], [e['image'] for e in json.load(f)])
+
+    def test_writer_goes_through_shared_store(self):
+        shapes = [{'label': 'cat', 'points': ((1, 1), (5, 1), (5, 5), (1, 5))}]
+        for name in ('a.jpg', 'b.jpg', 'c.jpg'):
+            CreateMLWriter('images', name, (10, 10, 3), shapes, self.path).write()
+        self.assertEqual(3, len(get_store(self.path).images()))
+        self.assertEqual(2, len(self.read()))
+        close_stores()
+        self.assertEqual(['a.jpg', 'b.jpg', 'c.jpg'], [e['image'] for e in self.read()])
+        self.assertFalse(os.path.exists(self.path + create_ml_io.JOURNAL_EXT))
+
+    def test_reader_uses_cached_index_and_matching_verified_flag(self):
+        with open(self.path, 'w') as f:
+            json.dump([entry('a.jpg'), dict(entry('b.jpg', 'dog'), verified=True)], f)
+        reader = CreateMLReader(self.path, '/images/b.jpg')
+        self.assertTrue(reader.verified)
+        self.assertEqual(['dog'], [shape[0] for shape in reader.get_shapes()])
+        self.assertFalse(CreateMLReader(self.path, '/images/a.jpg').verified)
+
+        loads = []
+        store = get_store(self.path)
+        store.load = lambda: loads.append(1)
+        CreateMLReader(self.path, '/images/a.jpg')
+        self.assertEqual([], loads)
+        # 其他进程追加日志后重新读取
+        with open(store.journal_path, 'a') as f:
+            f.write(json.dumps(entry('c.jpg')) + '\n')
+        CreateMLReader(self.path, '/images/c.jpg')
+        self.assertEqual([1], loads)
+
+
+class TestCreateMLStream(unittest.TestCase):
+
+    def test_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'export.json')
+            entries = [entry('%d.jpg' % i, 'label, with ] and {') for i in range(50)]
+            self.assertEqual(50, write_create_ml_stream(path, (e for e in entries)))
+            with open(path) as f:
+                self.assertEqual(json.dumps(entries), f.read())
+            # 很小的读取块迫使条目跨越块边界
+            self.assertEqual(entries, list(iter_create_ml(path, chunk_size=7)))
+            with open(path, 'w') as f:
+                json.dump(entries[:2], f, indent=2)
+            self.assertEqual(entries[:2], list(iter_create_ml(path)))
+            with open(path, 'w') as f:
+                f.write('[{"image": "a.jpg"} {"image": "b.jpg"}]')
+            with self.assertRaises(ValueError):
+                list(iter_create_ml(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from libs.constants import FORMAT_CREATEML, FORMAT_PASCALVOC, FORMAT_YOLO
+from libs import formatRegistry
+from libs.formatRegistry import AnnotationFormat, formats, get_format, next_format, register_format
+from libs.labelFile import LabelFile, LabelFileFormat
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test.512.512.bmp')
+
+
+class TestFormatRegistry(unittest.TestCase):
+
+    def test_lookup_and_cycle(self):
+        self.assertEqual([LabelFileFormat.PASCAL_VOC, LabelFileFormat.YOLO, LabelFileFormat.CREATE_ML],
+                         [f.key for f in formats()])
+        self.assertIs(get_format(FORMAT_YOLO), get_format(LabelFileFormat.YOLO))
+        self.assertEqual(FORMAT_CREATEML, next_format(LabelFileFormat.YOLO).name)
+        self.assertEqual(FORMAT_PASCALVOC, next_format(LabelFileFormat.CREATE_ML).name)
+        self.assertRaises(ValueError, get_format, 'LabelMe')
+        self.assertEqual('a.xml', get_format(FORMAT_PASCALVOC).annotation_path('a'))
+        self.assertEqual('a.XML', get_format(FORMAT_PASCALVOC).annotation_path('a.XML'))
+
+    def test_register_replaces_same_key(self):
+        registered = formats()
+        replacement = AnnotationFormat(LabelFileFormat.YOLO, 'Custom', '.txt', 'format_yolo',
+                                       'os.path:join', 'os.path:join')
+        try:
+            register_format(replacement)
+            self.assertIs(replacement, get_format('Custom'))
+            self.assertEqual(3, len(formats()))
+            self.assertIs(os.path.join, replacement._get('reader'))
+        finally:
+            formatRegistry._formats[:] = registered
+
+    def test_close_hook_runs_once_its_module_is_imported(self):
+        import libs.Io.create_ml_io  # noqa: F401  已由注册表以外的代码导入
+
+        hooked = AnnotationFormat('hooked', 'Hooked', '.json', 'format_createml', 'os.path:join',
+                                  'os.path:join', close='libs.Io.create_ml_io:close_stores')
+        with mock.patch('libs.Io.create_ml_io.close_stores') as close_stores:
+            hooked.close()
+        close_stores.assert_called_once_with()
+        AnnotationFormat('unused', 'Unused', '.x', '', 'os.path:join', 'os.path:join',
+                         close='libs.no_such_module:close').close()
+
+    def test_io_modules_load_on_first_use(self):
+        code = ('import sys\n'
+                'from libs.formatRegistry import close_formats, get_format\n'
+                'close_formats()\n'
+                'assert "lxml" not in sys.modules and "libs.Io.create_ml_io" not in sys.modules\n'
+                'get_format("PascalVOC").read(sys.argv[1], None)\n'
+                'assert "lxml" in sys.modules and "libs.Io.yolo_io" not in sys.modules\n')
+        subprocess.run([sys.executable, '-c', code, os.path.join(ROOT, 'tests', 'test.xml')],
+                       cwd=ROOT, check=True)
+
+    def test_round_trip_each_format(self):
+        with tempfile.TemporaryDirectory() as folder:
+            image_path = os.path.join(folder, 'img.bmp')
+            shutil.copy(IMAGE, image_path)
+            shapes = [dict(label='cat', points=[(10, 20), (100, 20), (100, 200), (10, 200)], difficult=False)]
+            for label_format in formats():
+                annotation_path = label_format.annotation_path(os.path.join(folder, 'img'))
+                label_format.write(LabelFile(), annotation_path, shapes, image_path, None, ['cat'], None)
+                reader = label_format.read(annotation_path, image_path)
+                self.assertEqual('cat', reader.get_shapes()[0][0], label_format.name)
+                self.assertEqual([(10, 20), (100, 20), (100, 200), (10, 200)],
+                                 [tuple(p) for p in reader.get_shapes()[0][1]], label_format.name)
+                label_format.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -17,6 +17,9 @@ class TestPascalVocRW(unittest.TestCase):
         writer.add_bnd_box(60, 40, 430, 504, 'person', difficult)
         writer.add_bnd_box(113, 40, 450, 403, 'face', difficult)
         writer.save('tests/test.xml')
+        # 文件内容与 serialize() 逐字节一致，换行不随平台变成 CRLF
+        with open('tests/test.xml', 'rb') as f:
+            self.assertEqual(writer.serialize().encode('utf8'), f.read())
 
         reader = PascalVocReader('tests/test.xml')
         shapes = reader.get_shapes()
@@ -28,6 +31,19 @@ class TestPascalVocRW(unittest.TestCase):
         self.assertEqual(face[0], 'face')
         self.assertEqual(face[1], [(113, 40), (450, 40), (450, 403), (113, 403)])
 
+    def test_serialize_matches_pretty_printed_tree(self):
+        from libs.Io.pascal_voc_io import PascalVocWriter
+
+        writer = PascalVocWriter('tests', 'a  b&<c>', (512, 512), local_img_path='x\r\ny')
+        writer.verified = True
+        writer.add_bnd_box(1, 40, 430, 504, 'person  \u4eba', True)
+        writer.add_bnd_box(113, 40, 512, 403, '', 0)
+        root = writer.gen_xml()
+        writer.append_objects(root)
+        self.assertEqual(writer.prettify(root).decode('utf8'), writer.serialize())
+        with self.assertRaises(ValueError):
+            PascalVocWriter('tests', 'bad\x01', (1, 1)).serialize()
+
 
 class TestCreateMLRW(unittest.TestCase):
 
@@ -97,5 +113,115 @@ class TestCreateMLRW(unittest.TestCase):
         self.assertEqual(365, y_max, 'ymax is wrong')
 
 
+class TestYoloClassList(unittest.TestCase):
+
+    def test_class_list_cache(self):
+        import tempfile
+        from libs.Io import yolo_io
+        from libs.Io.yolo_io import YOLOWriter, load_class_list
+
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'classes.txt')
+        with open(path, 'w') as f:
+            f.write('cat\ndog\n')
+        classes = load_class_list(path)
+        self.assertEqual(['cat', 'dog'], classes.names)
+        self.assertEqual(1, classes.index('dog'))
+        self.assertIs(classes, load_class_list(path))
+
+        class_list = ['cat']
+        writer = YOLOWriter(directory, 'a.jpg', [100, 100, 3])
+        writer.add_bnd_box(10, 10, 20, 20, 'bird', 0)
+        writer.add_bnd_box(10, 10, 20, 20, 'cat', 0)
+        writer.save(class_list=class_list, target_file=os.path.join(directory, 'a.txt'))
+        # 文件中已有的类别保留编号，新类别追加在后面
+        self.assertEqual(['cat', 'dog', 'bird'], class_list)
+        with open(os.path.join(directory, 'a.txt')) as f:
+            self.assertEqual(['2', '0'], [line.split()[0] for line in f])
+        # 写入后缓存已更新，不需要重新读取文件
+        reads = []
+        yolo_io.open = lambda *args, **kwargs: reads.append(args) or open(*args, **kwargs)
+        try:
+            self.assertEqual(['cat', 'dog', 'bird'], load_class_list(path).names)
+        finally:
+            del yolo_io.open
+        self.assertEqual([], reads)
+
+        # 类别没有增加时不再重写 classes.txt
+        mtime = os.stat(path).st_mtime_ns
+        os.utime(path, ns=(mtime - 10 ** 9, mtime - 10 ** 9))
+        writer.save(class_list=['dog'], target_file=os.path.join(directory, 'b.txt'))
+        self.assertEqual(mtime - 10 ** 9, os.stat(path).st_mtime_ns)
+        with open(os.path.join(directory, 'b.txt')) as f:
+            self.assertEqual(['2', '0'], [line.split()[0] for line in f])
+
+
+class TestYoloParsing(unittest.TestCase):
+
+    def setUp(self):
+        from libs.Io import yolo_io
+        if yolo_io.np is None:
+            self.skipTest('numpy is not installed')
+
+    def test_parse_tolerates_blank_lines_and_extra_columns(self):
+        from libs.Io.yolo_io import parse_yolo_text, yolo_to_boxes
+
+        rows = parse_yolo_text('\n1 0.5 0.5 0.2 0.4 0.97\n\n0 0.05 0.5 0.2 0.2\n')
+        self.assertEqual((2, 5), rows.shape)
+        class_ids, boxes = yolo_to_boxes(rows, (100, 200, 3))
+        self.assertEqual([1, 0], class_ids.tolist())
+        # 越界部分被裁剪到图像内
+        self.assertEqual([[80, 30, 120, 70], [0, 40, 30, 60]], boxes.tolist())
+        with self.assertRaises(ValueError):
+            parse_yolo_text('0 0.5 0.5\n')
+
+    def test_parse_checks_columns_per_line(self):
+        from libs.Io.yolo_io import parse_yolo_text
+
+        with self.assertRaises(ValueError):
+            parse_yolo_text('0 .5 .5 .2\n1 .5 .5 .2 .2 .9')
+        self.assertEqual([[1, .5, .5, .2, .2], [0, .1, .1, .1, .1]],
+                         parse_yolo_text('1 .5 .5 .2 .2 .9\n0 .1 .1 .1 .1').tolist())
+        self.assertEqual((0, 5), parse_yolo_text('\n').shape)
+
+    def test_read_dataset(self):
+        import tempfile
+        from libs.Io.yolo_io import read_yolo_dataset
+
+        directory = tempfile.mkdtemp()
+        paths = [os.path.join(directory, name) for name in ('a.txt', 'b.txt', 'missing.txt')]
+        with open(paths[0], 'w') as f:
+            f.write('0 0.5 0.5 0.1 0.1\n1 0.5 0.5 0.1 0.1\n')
+        with open(paths[1], 'w') as f:
+            f.write('2 0.5 0.5 0.1 0.1\n')
+        dataset = read_yolo_dataset(paths)
+        self.assertEqual([0, 0, 1], dataset.image_index.tolist())
+        self.assertEqual([0, 1, 2], dataset.rows[:, 0].tolist())
+        self.assertEqual([paths[2]], [path for path, _ in dataset.errors])
+
+
+class TestHeadlessYoloReader(unittest.TestCase):
+
+    def test_read_without_qimage(self):
+        import subprocess
+        dir_name = os.path.abspath(os.path.dirname(__file__))
+        # 子进程中不创建任何 Qt 应用对象
+        script = (
+            "import os, tempfile\n"
+            "from libs.Io.yolo_io import YoloReader\n"
+            "d = tempfile.mkdtemp()\n"
+            "open(os.path.join(d, 'classes.txt'), 'w').write('cat\\n')\n"
+            "open(os.path.join(d, 'a.txt'), 'w').write('0 0.5 0.5 0.5 0.5\\n')\n"
+            "r = YoloReader(os.path.join(d, 'a.txt'), %r)\n"
+            "print(r.img_size, r.get_shapes()[0][1][0])\n"
+            "r = YoloReader(os.path.join(d, 'a.txt'), image_size=(100, 40))\n"
+            "print(r.get_shapes()[0][1][2])\n"
+            "import sys; print('PySide6.QtWidgets' in sys.modules)\n"
+        ) % os.path.join(dir_name, 'test.512.512.bmp')
+        output = subprocess.check_output([sys.executable, '-c', script], cwd=os.path.join(dir_name, '..'),
+                                         universal_newlines=True)
+        self.assertEqual(['[512, 512, 3] (128, 128)', '(30, 75)', 'False'], output.split('\n')[:3])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+
+from PySide6.QtWidgets import QApplication
+
+from libs.labelDialog import LabelDialog
+from libs.labelIndex import LabelIndex
+
+
+class TestLabelIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = LabelIndex(['car', 'Cart', 'bicycle', 'scarf', 'cat', 'car'])
+
+    def test_keeps_insertion_order_without_duplicates(self):
+        self.assertEqual(['car', 'Cart', 'bicycle', 'scarf', 'cat'], self.index.labels)
+        self.assertFalse(self.index.add('cat'))
+
+    def test_prefix_is_case_insensitive(self):
+        self.assertEqual(['car', 'Cart'], self.index.prefix('CAR'))
+        self.assertEqual(['car'], self.index.prefix('ca', limit=1))
+        self.assertEqual([], self.index.prefix('z'))
+
+    def test_search_ranks_prefix_substring_then_fuzzy(self):
+        self.assertEqual(['car', 'Cart', 'scarf'], self.index.search('car'))
+        self.assertEqual(['bicycle'], self.index.search('bcl'))
+        self.assertEqual(['car', 'Cart'], self.index.search('car', limit=2))
+        self.assertEqual(self.index.labels, self.index.search(''))
+
+
+class TestLabelDialog(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def test_add_item_updates_model_and_list(self):
+        dialog = LabelDialog(list_item=['dog', 'cat'])
+        dialog.add_item('bird')
+        dialog.add_item('dog')
+        self.assertEqual(['dog', 'cat', 'bird'], dialog.model.stringList())
+        dialog.filter_list()
+        self.assertEqual(3, dialog.list_widget.count())
+        dialog.filter_list('CA')
+        self.assertEqual('cat', dialog.list_widget.item(0).text())
+        self.assertEqual(1, dialog.list_widget.count())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from libs.Io.create_ml_io import CreateMLWriter
+from libs.Io.pascal_voc_io import PascalVocReader, PascalVocWriter
+from libs.Io.yolo_io import YOLOWriter
+from libs import labelOps
+from libs.labelFile import LabelFileFormat
+from libs.labelOps import map_label_list, parse_mapping, remap_dataset
+
+
+class TestLabelOps(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.mapping = parse_mapping('cat, kitty -> feline; dog ->')
+
+    def test_parse_mapping(self):
+        self.assertEqual({'cat': 'feline', 'kitty': 'feline', 'dog': None}, self.mapping)
+        self.assertRaises(ValueError, parse_mapping, 'cat feline')
+        self.assertEqual(['feline', 'bird'], map_label_list(['cat', 'dog', 'kitty', 'bird'], self.mapping))
+
+    def test_voc(self):
+        for name in ('a', 'b'):
+            writer = PascalVocWriter('imgs', name + '.jpg', (100, 100, 3))
+            writer.add_bnd_box(10, 10, 20, 20, 'cat', 0)
+            writer.add_bnd_box(30, 30, 40, 40, 'dog', 1)
+            writer.add_bnd_box(50, 50, 60, 60, 'bird', 0)
+            writer.save(os.path.join(self.dir, name + '.xml'))
+        progress = []
+        changed, errors = remap_dataset(self.dir, LabelFileFormat.PASCAL_VOC, self.mapping,
+                                        progress=lambda done, total: progress.append((done, total)))
+        self.assertEqual((4, []), (changed, errors))
+        self.assertEqual([(1, 2), (2, 2)], progress)
+        shapes = PascalVocReader(os.path.join(self.dir, 'a.xml')).get_shapes()
+        self.assertEqual(['feline', 'bird'], [shape[0] for shape in shapes])
+
+    def test_yolo_rewrites_indices_and_classes_once(self):
+        classes = ['dog', 'cat', 'bird', 'kitty']
+        writer = YOLOWriter(self.dir, 'a.jpg', [100, 100, 3])
+        for i, label in enumerate(['bird', 'kitty', 'dog', 'cat']):
+            writer.add_bnd_box(10 * i, 10, 10 * i + 5, 20, label, 0)
+        writer.save(class_list=list(classes), target_file=os.path.join(self.dir, 'a.txt'))
+        changed, errors = remap_dataset(self.dir, LabelFileFormat.YOLO, self.mapping)
+        self.assertEqual((3, []), (changed, errors))
+        with open(os.path.join(self.dir, 'classes.txt')) as f:
+            self.assertEqual(['feline', 'bird'], f.read().split())
+        with open(os.path.join(self.dir, 'a.txt')) as f:
+            self.assertEqual(['1', '0', '0'], [line.split()[0] for line in f])
+
+    def test_yolo_folder_with_a_bad_file_is_left_untouched(self):
+        writer = YOLOWriter(self.dir, 'a.jpg', [100, 100, 3])
+        writer.add_bnd_box(10, 10, 20, 20, 'dog', 0)
+        writer.add_bnd_box(30, 30, 40, 40, 'cat', 0)
+        writer.save(class_list=['dog', 'cat'], target_file=os.path.join(self.dir, 'a.txt'))
+        with open(os.path.join(self.dir, 'a.txt')) as f:
+            good = f.read()
+        with open(os.path.join(self.dir, 'b.txt'), 'w') as f:
+            f.write('x 0.5 0.5 0.1 0.1\n')
+        changed, errors = remap_dataset(self.dir, LabelFileFormat.YOLO, self.mapping)
+        self.assertEqual(0, changed)
+        self.assertEqual([os.path.join(self.dir, 'b.txt')], [path for path, _ in errors])
+        with open(os.path.join(self.dir, 'a.txt')) as f:
+            self.assertEqual(good, f.read())
+        with open(os.path.join(self.dir, 'classes.txt')) as f:
+            self.assertEqual(['dog', 'cat'], f.read().split())
+
+    def test_yolo_rewrites_are_kept_back_when_one_fails(self):
+        for name in 'ab':
+            writer = YOLOWriter(self.dir, name + '.jpg', [100, 100, 3])
+            writer.add_bnd_box(10, 10, 20, 20, 'dog', 0)
+            writer.add_bnd_box(30, 30, 40, 40, 'cat', 0)
+            writer.save(class_list=['dog', 'cat'], target_file=os.path.join(self.dir, name + '.txt'))
+        with open(os.path.join(self.dir, 'a.txt')) as f:
+            good = f.read()
+        stage_file = labelOps.stage_file
+
+        def failing_stage_file(path, *args, **kwargs):
+            if path.endswith('b.txt'):
+                raise OSError('disk full')
+            return stage_file(path, *args, **kwargs)
+
+        with mock.patch.object(labelOps, 'stage_file', failing_stage_file):
+            changed, errors = remap_dataset(self.dir, LabelFileFormat.YOLO, self.mapping)
+        self.assertEqual(0, changed)
+        self.assertEqual([os.path.join(self.dir, 'b.txt'), self.dir], [path for path, _ in errors])
+        for name in 'ab':
+            with open(os.path.join(self.dir, name + '.txt')) as f:
+                self.assertEqual(good, f.read())
+        with open(os.path.join(self.dir, 'classes.txt')) as f:
+            self.assertEqual(['dog', 'cat'], f.read().split())
+        self.assertEqual(['a.txt', 'b.txt', 'classes.txt'], sorted(os.listdir(self.dir)))
+
+    def test_pool_uses_spawned_workers(self):
+        for i in range(3):
+            writer = PascalVocWriter('imgs', '%d.jpg' % i, (100, 100, 3))
+            writer.add_bnd_box(10, 10, 20, 20, 'cat', 0)
+            writer.save(os.path.join(self.dir, '%d.xml' % i))
+        limit = labelOps.MIN_FILES_FOR_POOL
+        labelOps.MIN_FILES_FOR_POOL = 1
+        try:
+            self.assertEqual((3, []), remap_dataset(self.dir, LabelFileFormat.PASCAL_VOC, self.mapping, workers=2))
+        finally:
+            labelOps.MIN_FILES_FOR_POOL = limit
+
+    def test_create_ml(self):
+        path = os.path.join(self.dir, 'a.json')
+        for name in ('a.jpg', 'b.jpg'):
+            shapes = [{'label': 'kitty', 'points': ((1, 1), (5, 1), (5, 5), (1, 5))},
+                      {'label': 'dog', 'points': ((1, 1), (5, 1), (5, 5), (1, 5))}]
+            CreateMLWriter('imgs', name, (10, 10, 3), shapes, path).write()
+        changed, errors = remap_dataset(self.dir, LabelFileFormat.CREATE_ML, self.mapping)
+        self.assertEqual((4, []), (changed, errors))
+        with open(path) as f:
+            images = json.load(f)
+        self.assertEqual([['feline'], ['feline']], [[a['label'] for a in image['annotations']] for image in images])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from libs.Io.yolo_io import YOLOWriter
+from libs.labelRegistry import LabelRegistry
+from libs.utils import generate_color_by_text
+
+
+class TestLabelRegistry(unittest.TestCase):
+
+    def test_intern_keeps_first_seen_order(self):
+        registry = LabelRegistry(['dog', 'cat', 'dog'])
+        added = []
+        registry.labelAdded.connect(added.append)
+        self.assertEqual(2, registry.intern('bird'))
+        self.assertEqual(1, registry.intern('cat'))
+        self.assertEqual(['dog', 'cat', 'bird'], list(registry))
+        self.assertEqual(['bird'], added)
+        self.assertIn('cat', registry)
+        self.assertRaises(ValueError, registry.index, 'fish')
+
+    def test_colors_are_memoized_copies(self):
+        registry = LabelRegistry()
+        color = registry.color('cat')
+        self.assertEqual(generate_color_by_text('cat'), color)
+        color.setAlpha(0)
+        self.assertEqual(100, registry.color('cat').alpha())
+
+    def test_counts(self):
+        registry = LabelRegistry()
+        registry.adjust_count('dog', 1)
+        registry.adjust_count('cat', 2)
+        registry.adjust_count('dog', -1)
+        self.assertEqual(['cat'], registry.used_labels())
+
+    def test_yolo_writer_shares_registry(self):
+        target = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, target)
+        registry = LabelRegistry(['cat'])
+        writer = YOLOWriter(target, 'a.jpg', [100, 100, 3])
+        writer.add_bnd_box(10, 10, 20, 20, 'dog', 0)
+        writer.save(class_list=registry, target_file=os.path.join(target, 'a.txt'))
+        self.assertEqual(['cat', 'dog'], registry.names)
+        with open(os.path.join(target, 'classes.txt')) as f:
+            self.assertEqual(['cat', 'dog'], f.read().split())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,14 @@
-from unittest import TestCase
+import os
+import tempfile
+import time
+from unittest import TestCase, mock
 
-from labelImg import get_main_app
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QImage
+from PySide6.QtWidgets import QMessageBox
+
+from labelImg import NAV_SETTLE_MS, get_main_app
+from libs.shape import Shape
 
 
 class TestMainWindow(TestCase):
@@ -9,6 +17,13 @@ class TestMainWindow(TestCase):
     win = None
 
     def setUp(self):
+        # 设置与会话文件写在临时主目录中，不读取也不覆盖用户自己的文件
+        home = tempfile.TemporaryDirectory()
+        self.addCleanup(home.cleanup)
+        self.home = home.name
+        environ = mock.patch.dict(os.environ, HOME=self.home, USERPROFILE=self.home)
+        environ.start()
+        self.addCleanup(environ.stop)
         self.app, self.win = get_main_app()
 
     def tearDown(self):
@@ -17,3 +32,188 @@ class TestMainWindow(TestCase):
 
     def test_noop(self):
         pass
+
+    def test_load_labels_counts_each_class_once(self):
+        box = [(1, 1), (5, 1), (5, 5), (1, 5)]
+        self.win.load_labels([('cat', box, None, None, False),
+                              ('dog', box, None, None, False),
+                              ('cat', box, None, None, True)])
+        self.assertEqual(3, self.win.label_list.count())
+        self.assertEqual({'cat': 2, 'dog': 1}, dict(self.win.label_hist.counts))
+        self.assertEqual(['', 'cat', 'dog'], self.win.combo_box.items)
+        self.win.remove_label(self.win.canvas.shapes[1])
+        self.assertEqual(['', 'cat'], self.win.combo_box.items)
+        self.win.dirty = False
+
+    def test_combo_box_filters_by_label(self):
+        box = [(1, 1), (5, 1), (5, 5), (1, 5)]
+        self.win.load_labels([('cat', box, None, None, False),
+                              ('dog', box, None, None, False),
+                              ('cat', box, None, None, False)])
+        cat, dog, cat2 = self.win.canvas.shapes
+        self.win.combo_box.cb.setCurrentIndex(self.win.combo_box.cb.findText('dog'))
+        self.assertEqual([False, True, False], [self.win.canvas.isVisible(s) for s in (cat, dog, cat2)])
+        self.assertEqual(Qt.Unchecked, self.win.shapes_to_items[cat].checkState())
+        self.win.remove_label(cat2)
+        self.assertEqual('dog', self.win.combo_box.cb.currentText())
+        # 新画的框同样遵循当前过滤类别
+        drawn_cat, drawn_dog = Shape(label='cat'), Shape(label='dog')
+        for shape in (drawn_cat, drawn_dog):
+            self.win.canvas.shapes.append(shape)
+            self.win.add_label(shape)
+        self.assertEqual(Qt.Unchecked, self.win.shapes_to_items[drawn_cat].checkState())
+        self.assertEqual([False, True], [self.win.canvas.isVisible(s) for s in (drawn_cat, drawn_dog)])
+        self.win.combo_box.cb.setCurrentIndex(0)
+        self.assertTrue(self.win.canvas.isVisible(cat))
+        self.win.dirty = False
+
+    def test_undo_redo_delete_and_relabel(self):
+        box = [(1, 1), (5, 1), (5, 5), (1, 5)]
+        self.win.load_labels([('cat', box, None, None, False),
+                              ('dog', box, None, None, False)])
+        self.win.canvas.set_editing(True)
+        cat = self.win.canvas.shapes[0]
+        self.win.shapes_to_items[cat].setText('bird')
+        self.win.canvas.select_shape(cat)
+        self.win.delete_selected_shape()
+        self.assertEqual(['dog'], [s.label for s in self.win.canvas.shapes])
+        self.win.undo()
+        self.assertEqual(['bird', 'dog'], [s.label for s in self.win.canvas.shapes])
+        self.assertEqual(['bird', 'dog'], [self.win.label_list.item(row).text() for row in range(2)])
+        self.win.undo()
+        self.assertEqual(['cat', 'dog'], [s.label for s in self.win.canvas.shapes])
+        self.assertEqual(['', 'cat', 'dog'], self.win.combo_box.items)
+        self.assertFalse(self.win.actions.undo.isEnabled())
+        self.win.redo()
+        self.win.redo()
+        self.assertEqual(['dog'], [s.label for s in self.win.canvas.shapes])
+        self.assertEqual(1, self.win.label_list.count())
+        self.win.dirty = False
+
+    def test_undo_in_create_mode_cancels_drawing(self):
+        box = [(1, 1), (5, 1), (5, 5), (1, 5)]
+        self.win.load_labels([('cat', box, None, None, False)])
+        self.win.record_created(self.win.canvas.shapes[0])
+        self.win.canvas.set_editing(False)
+        self.win.canvas.current = Shape()
+        self.win.undo()
+        self.assertIsNone(self.win.canvas.current)
+        self.assertEqual([], self.win.canvas.shapes)
+        self.win.redo()
+        self.assertEqual(['cat'], [s.label for s in self.win.canvas.shapes])
+        self.win.dirty = False
+
+    def test_propagate_shapes_to_next_images(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for name, size in (('a.png', 40), ('b.png', 20), ('c.png', 40), ('d.png', 40)):
+                image = QImage(size, size, QImage.Format_RGB32)
+                image.fill(0)
+                image.save(os.path.join(directory, name))
+            open(os.path.join(directory, 'c.xml'), 'w').close()
+            self.win.import_dir_images(directory)
+            self.win.load_labels([('cat', [(2, 2), (30, 2), (30, 30), (2, 30)], None, None, False),
+                                  ('dog', [(25, 25), (35, 25), (35, 35), (25, 35)], None, None, False)])
+            self.assertEqual((2, 1), self.win.propagate_shapes(3))
+            self.win.save_queue.flush()
+            self.assertEqual(0, os.path.getsize(os.path.join(directory, 'c.xml')))
+            with open(os.path.join(directory, 'b.xml')) as f:
+                xml = f.read()
+            # 越界的框被裁剪到图像内，完全落在外面的框被丢弃
+            self.assertIn('<width>20</width>', xml)
+            self.assertIn('<xmax>20</xmax>', xml)
+            self.assertNotIn('dog', xml)
+            self.assertTrue(os.path.isfile(os.path.join(directory, 'd.xml')))
+            self.win.dirty = False
+
+    def test_opening_a_file_directly_updates_the_current_index(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for name in ('a.png', 'b.png', 'c.png'):
+                image = QImage(20, 20, QImage.Format_RGB32)
+                image.fill(0)
+                image.save(os.path.join(directory, name))
+            self.win.import_dir_images(directory)
+            self.win.default_save_dir = directory
+            self.win.load_labels([('cat', [(2, 2), (10, 2), (10, 10), (2, 10)], None, None, False)])
+            self.win.save_file()
+            self.win.load_file(os.path.join(directory, 'b.png'))
+            self.assertEqual(1, self.win.cur_img_idx)
+            self.win.copy_previous_bounding_boxes()
+            self.assertEqual(['cat'], [s.label for s in self.win.canvas.shapes])
+            self.assertEqual((1, 0), self.win.propagate_shapes(5))
+            self.win.save_queue.flush()
+            self.assertTrue(os.path.isfile(os.path.join(directory, 'c.xml')))
+
+            # 打开列表外的文件会清空列表，两个操作都不再指向旧列表
+            outside = tempfile.TemporaryDirectory()
+            self.addCleanup(outside.cleanup)
+            image = QImage(20, 20, QImage.Format_RGB32)
+            image.fill(0)
+            image.save(os.path.join(outside.name, 'x.png'))
+            self.win.load_file(os.path.join(outside.name, 'x.png'))
+            self.assertEqual(([], 0), (self.win.m_img_list, self.win.cur_img_idx))
+            self.win.copy_previous_bounding_boxes()
+            self.assertEqual((0, 0), self.win.propagate_shapes(5))
+            self.win.dirty = False
+
+    def test_session_resumes_scanned_directory(self):
+        self.assertTrue(self.win.session.path.startswith(self.home))
+        with tempfile.TemporaryDirectory() as directory:
+            os.mkdir(os.path.join(directory, 'sub'))
+            for name in ('a.png', 'b.png'):
+                image = QImage(8, 8, QImage.Format_RGB32)
+                image.fill(0)
+                image.save(os.path.join(directory, name))
+            self.win.import_dir_images(directory)
+            self.win.save_session()
+            self.assertIn('sub', self.win.session.load()['dirs'])
+            self.win.m_img_list = []
+            self.assertTrue(self.win.restore_session())
+            self.assertEqual(['a.png', 'b.png'], [os.path.basename(path) for path in self.win.m_img_list])
+            open(os.path.join(directory, 'sub', 'c.png'), 'w').close()
+            self.assertIsNone(self.win.session.load())
+            self.win.session.clear()
+
+    def test_repeated_navigation_loads_only_the_last_image(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for name in 'abcde':
+                image = QImage(8, 8, QImage.Format_RGB32)
+                image.fill(0)
+                image.save(os.path.join(directory, name + '.png'))
+            self.win.import_dir_images(directory)
+            loaded = []
+            load_file = self.win.load_file
+            self.win.load_file = lambda path=None: (loaded.append(os.path.basename(path)), load_file(path))
+            for _ in range(3):
+                self.win.open_next_image()
+            self.assertEqual(['b.png'], loaded)
+            self.assertEqual(3, self.win.file_list_widget.currentRow())
+            self.win.open_prev_image()
+            self.win.finish_navigation()
+            self.assertEqual(['b.png', 'c.png'], loaded)
+            self.assertEqual(2, self.win.cur_img_idx)
+
+    def test_slow_load_still_coalesces_and_settle_checks_edits(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for name in 'abcde':
+                image = QImage(8, 8, QImage.Format_RGB32)
+                image.fill(0)
+                image.save(os.path.join(directory, name + '.png'))
+            self.win.import_dir_images(directory)
+            loaded = []
+            load_file = self.win.load_file
+
+            def slow_load(path=None):
+                loaded.append(os.path.basename(path))
+                load_file(path)
+                time.sleep(NAV_SETTLE_MS * 1.5 / 1000)
+            self.win.load_file = slow_load
+            self.win.open_next_image()
+            self.win.open_next_image()
+            self.assertEqual(['b.png'], loaded)
+            # 等待期间修改了当前图像，取消确认后留在当前图像
+            self.win.dirty = True
+            self.win.discard_changes_dialog = lambda: QMessageBox.Cancel
+            self.win.finish_navigation()
+            self.assertEqual(['b.png'], loaded)
+            self.assertEqual(1, self.win.file_list_widget.currentRow())
+            self.win.dirty = False
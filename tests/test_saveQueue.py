@@ -0,0 +1,100 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from PySide6.QtCore import QCoreApplication
+
+from libs.Io import atomic_io
+from libs.Io.atomic_io import atomic_write
+from libs.saveQueue import SaveQueue
+
+
+class TestSaveQueue(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QCoreApplication.instance() or QCoreApplication([])
+
+    def setUp(self):
+        self.queue = SaveQueue()
+        self.written = []
+
+    def write(self, value, started=None, gate=None):
+        def job():
+            if gate is not None:
+                started.set()
+                gate.wait(5)
+            self.written.append(value)
+        return job
+
+    def test_queued_saves_for_same_key_coalesce(self):
+        started, gate = threading.Event(), threading.Event()
+        self.queue.submit('a.xml', 'a.jpg', self.write('first', started, gate))
+        started.wait(5)
+        self.assertTrue(self.queue.is_pending('a.jpg'))
+        for i in range(5):
+            self.queue.submit('a.xml', 'a.jpg', self.write(i))
+        self.queue.submit('b.xml', 'b.jpg', self.write('b'))
+        gate.set()
+        self.queue.flush()
+        self.assertEqual(['first', 4, 'b'], self.written)
+        self.assertFalse(self.queue.is_pending('a.jpg'))
+
+    def test_run_waits_for_jobs_on_the_same_file(self):
+        started, gate = threading.Event(), threading.Event()
+        self.queue.submit('set.json', 'a.jpg', self.write('a', started, gate))
+        self.queue.submit('set.json', 'b.jpg', self.write('b'))
+        self.queue.submit('set.json', 'c.jpg', self.write('stale c'))
+        started.wait(5)
+        threading.Timer(0.05, gate.set).start()
+        self.queue.run('set.json', 'c.jpg', self.write('c'))
+        self.assertEqual(['a', 'b', 'c'], self.written)
+        self.queue.flush()
+        self.assertEqual(['a', 'b', 'c'], self.written)
+
+    def test_failures_are_reported(self):
+        failures = []
+        self.queue.failed.connect(lambda path, error: failures.append((path, error)))
+
+        def fail():
+            raise IOError('disk full')
+        self.queue.submit('a.xml', 'a.jpg', fail)
+        self.queue.flush()
+        QCoreApplication.processEvents()
+        self.assertEqual([('a.xml', 'disk full')], failures)
+
+
+class TestAtomicWrite(unittest.TestCase):
+
+    def test_failed_write_keeps_old_content(self):
+        target = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, target)
+        path = os.path.join(target, 'a.txt')
+        with atomic_write(path) as f:
+            f.write('old')
+        with self.assertRaises(ValueError):
+            with atomic_write(path) as f:
+                f.write('new')
+                raise ValueError()
+        with open(path) as f:
+            self.assertEqual('old', f.read())
+        self.assertEqual(['a.txt'], os.listdir(target))
+
+    @unittest.skipIf(os.name == 'nt', 'POSIX permissions')
+    def test_permissions_follow_target_or_umask(self):
+        target = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, target)
+        path = os.path.join(target, 'a.txt')
+        with atomic_write(path) as f:
+            f.write('new')
+        self.assertEqual(0o666 & ~atomic_io._UMASK, os.stat(path).st_mode & 0o777)
+        os.chmod(path, 0o640)
+        with atomic_write(path) as f:
+            f.write('again')
+        self.assertEqual(0o640, os.stat(path).st_mode & 0o777)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import os
+import tempfile
+import unittest
+
+from libs.session import Session, directory_times
+
+
+class TestSession(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.root = self.dir.name
+        os.mkdir(os.path.join(self.root, 'sub'))
+        self.images = [os.path.join(self.root, name) for name in ('a.jpg', 'b.jpg', os.path.join('sub', 'c.jpg'))]
+        for path in self.images:
+            open(path, 'w').close()
+        self.home = tempfile.TemporaryDirectory()
+        self.session = Session(os.path.join(self.home.name, 'session'))
+
+    def tearDown(self):
+        self.dir.cleanup()
+        self.home.cleanup()
+
+    def test_round_trip(self):
+        self.assertTrue(self.session.save(self.root, self.images, 2, label_filter='cat'))
+        state = Session(self.session.path).load()
+        self.assertEqual(self.images, state['images'])
+        self.assertEqual(2, state['index'])
+        self.assertEqual('cat', state['label_filter'])
+        self.assertEqual('', state['save_dir'])
+
+    def test_changed_directory_invalidates(self):
+        self.session.save(self.root, self.images, 0)
+        sub = os.path.join(self.root, 'sub')
+        stat = os.stat(sub)
+        os.utime(sub, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        self.assertIsNone(self.session.load())
+
+    def test_new_image_in_directory_without_images_invalidates(self):
+        os.makedirs(os.path.join(self.root, 'a', 'b'))
+        images = [os.path.join(self.root, 'a', 'b', 'x.bmp')]
+        open(images[0], 'w').close()
+        dirs = directory_times(self.root)
+        self.assertIn('a', dirs)
+        self.session.save(self.root, images, 0, dirs=dirs)
+        self.assertEqual(dirs, self.session.load()['dirs'])
+        open(os.path.join(self.root, 'a', 'new.bmp'), 'w').close()
+        self.assertIsNone(self.session.load())
+
+    def test_missing_or_reset(self):
+        self.assertIsNone(self.session.load())
+        self.session.save(self.root, self.images, 1)
+        self.session.reset()
+        self.assertFalse(os.path.exists(os.path.join(self.home.name, 'session')))
+        self.assertIsNone(self.session.load())
+        self.assertFalse(self.session.save(self.root, self.images, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
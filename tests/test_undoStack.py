@@ -0,0 +1,117 @@
+import unittest
+
+from PySide6.QtCore import QPointF
+
+from libs.shape import Shape
+from libs.undoStack import UndoStack
+
+
+def make_shape(x, y, label='box'):
+    shape = Shape(label=label)
+    for px, py in ((x, y), (x + 10, y), (x + 10, y + 10), (x, y + 10)):
+        shape.add_point(QPointF(px, py))
+    shape.close()
+    return shape
+
+
+class ListEditor(object):
+
+    def __init__(self, shapes):
+        self.shapes = shapes
+
+    def insert_shape(self, index, shape):
+        self.shapes.insert(index, shape)
+
+    def remove_shape(self, shape):
+        self.shapes.remove(shape)
+
+    def set_shape_points(self, shape, points):
+        shape.points = points
+
+    def set_shape_label(self, shape, label):
+        shape.label = label
+
+    def set_shape_difficult(self, shape, value):
+        shape.difficult = value
+
+
+class TestUndoStack(unittest.TestCase):
+
+    def setUp(self):
+        self.stack = UndoStack()
+        self.editor = ListEditor([])
+
+    def coords(self):
+        return [(s.label, [(p.x(), p.y()) for p in s.points]) for s in self.editor.shapes]
+
+    def test_move_relabel_difficult_round_trip(self):
+        shape = make_shape(0, 0)
+        self.editor.shapes.append(shape)
+        before = list(shape.points)
+        shape.points = [p + QPointF(5, 5) for p in shape.points]
+        self.stack.moved(shape, before)
+        self.stack.relabeled(shape, 'box', 'cat')
+        shape.label = 'cat'
+        self.stack.difficulty_changed(shape, True)
+        shape.difficult = True
+
+        self.stack.undo(self.editor)
+        self.assertFalse(shape.difficult)
+        self.stack.undo(self.editor)
+        self.assertEqual('box', shape.label)
+        self.stack.undo(self.editor)
+        self.assertEqual((0.0, 0.0), (shape[0].x(), shape[0].y()))
+        self.assertFalse(self.stack.can_undo())
+        self.stack.redo(self.editor)
+        self.assertEqual((5.0, 5.0), (shape[0].x(), shape[0].y()))
+
+    def test_delete_then_edit_after_undo_keeps_identity(self):
+        first, second = make_shape(0, 0, 'a'), make_shape(20, 20, 'b')
+        self.editor.shapes.extend([first, second])
+        self.stack.deleted(first, 0)
+        self.editor.shapes.remove(first)
+        self.stack.undo(self.editor)
+        restored = self.editor.shapes[0]
+        self.assertIsNot(first, restored)
+        self.assertEqual(['a', 'b'], [s.label for s in self.editor.shapes])
+        # the recreated shape takes over the id of the deleted one
+        self.stack.redo(self.editor)
+        self.assertEqual(['b'], [s.label for s in self.editor.shapes])
+        self.stack.undo(self.editor)
+        self.stack.relabeled(self.editor.shapes[0], 'a', 'c')
+        self.editor.shapes[0].label = 'c'
+        self.stack.undo(self.editor)
+        self.assertEqual(['a', 'b'], [s.label for s in self.editor.shapes])
+
+    def test_create_undo_redo(self):
+        shape = make_shape(0, 0)
+        self.editor.shapes.append(shape)
+        self.stack.created(shape, 0)
+        expected = self.coords()
+        self.stack.undo(self.editor)
+        self.assertEqual([], self.editor.shapes)
+        self.stack.redo(self.editor)
+        self.assertEqual(expected, self.coords())
+
+    def test_new_edit_clears_redo(self):
+        shape = make_shape(0, 0)
+        self.stack.relabeled(shape, 'box', 'a')
+        self.stack.undo(self.editor)
+        self.assertTrue(self.stack.can_redo())
+        self.stack.relabeled(shape, 'box', 'b')
+        self.assertFalse(self.stack.can_redo())
+
+    def test_memory_cap_drops_oldest_steps(self):
+        shape = make_shape(0, 0)
+        before = list(shape.points)
+        self.stack.max_bytes = 10000
+        for i in range(1000):
+            shape.points = [p + QPointF(i + 1, 0) for p in before]
+            self.stack.moved(shape, before)
+        self.assertLessEqual(self.stack.nbytes(), 10000)
+        self.assertGreater(len(self.stack), 10)
+        self.assertLess(len(self.stack), 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+
+from libs.Io.pascal_voc_io import PascalVocWriter
+from libs.Io import voc_dataset
+from libs.Io.voc_dataset import read_voc_dataset
+
+
+@unittest.skipIf(voc_dataset.np is None, 'numpy is not installed')
+class TestReadVocDataset(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.paths = []
+        for i, boxes in enumerate([[('cat', 1, 2, 30, 40, False), ('dog', 5, 6, 7, 8, True)],
+                                   [],
+                                   [('dog', 10, 20, 30, 40.5, False)]]):
+            writer = PascalVocWriter('images', '%d.jpg' % i, (100, 100, 3))
+            for label, x_min, y_min, x_max, y_max, difficult in boxes:
+                writer.add_bnd_box(x_min, y_min, x_max, y_max, label, difficult)
+            path = os.path.join(self.dir.name, '%d.xml' % i)
+            writer.save(path)
+            self.paths.append(path)
+        self.broken = os.path.join(self.dir.name, 'broken.xml')
+        with open(self.broken, 'w') as f:
+            f.write('<annotation><object><name>cat</name>')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def check(self, dataset):
+        self.assertEqual(['cat', 'dog'], dataset.classes)
+        self.assertEqual([0, 0, 3], dataset.image_index.tolist())
+        self.assertEqual([0, 1, 1], dataset.class_id.tolist())
+        self.assertEqual([1, 5, 10], dataset.xmin.tolist())
+        self.assertEqual([40, 8, 40.5], dataset.ymax.tolist())
+        self.assertEqual([False, True, False], dataset.difficult.tolist())
+        self.assertEqual([self.broken], [path for path, _ in dataset.errors])
+
+    def test_serial(self):
+        self.check(read_voc_dataset(self.paths[:2] + [self.broken] + self.paths[2:], workers=1, chunk_size=2))
+
+    def test_process_pool(self):
+        original = voc_dataset.MIN_FILES_FOR_POOL
+        voc_dataset.MIN_FILES_FOR_POOL = 0
+        try:
+            self.check(read_voc_dataset(self.paths[:2] + [self.broken] + self.paths[2:], workers=2, chunk_size=1))
+        finally:
+            voc_dataset.MIN_FILES_FOR_POOL = original
+
+    def test_empty(self):
+        dataset = read_voc_dataset([])
+        self.assertEqual(0, len(dataset.xmin))
+        self.assertEqual([], dataset.classes)
+
+
+if __name__ == '__main__':
+    unittest.main()
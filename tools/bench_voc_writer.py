@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Compare the single-pass Pascal VOC serializer with the former
+ElementTree -> lxml pretty-print round trip on large annotation files,
+and check that both produce the same bytes.
+"""
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from libs.Io.pascal_voc_io import PascalVocWriter  # noqa: E402
+
+
+def make_writer(objects, seed=0):
+    rnd = random.Random(seed)
+    writer = PascalVocWriter('images', 'frame_000001.jpg', (1080, 1920, 3),
+                             local_img_path='/data/images/frame_000001.jpg')
+    for i in range(objects):
+        x_min, y_min = rnd.randint(1, 1800), rnd.randint(1, 1000)
+        writer.add_bnd_box(x_min, y_min, x_min + rnd.randint(5, 120), y_min + rnd.randint(5, 80),
+                           'class_%d' % rnd.randint(0, 79), rnd.random() < 0.1)
+    return writer
+
+
+def round_trip(writer):
+    root = writer.gen_xml()
+    writer.append_objects(root)
+    return writer.prettify(root).decode('utf8')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--objects', type=int, default=1000, help='boxes per file')
+    parser.add_argument('-r', '--repeat', type=int, default=50, help='files serialized per measurement')
+    args = parser.parse_args()
+
+    writer = make_writer(args.objects)
+    if round_trip(writer) != writer.serialize():
+        sys.exit('outputs differ')
+
+    old = min(timeit.repeat(lambda: round_trip(writer), number=args.repeat, repeat=3)) / args.repeat
+    new = min(timeit.repeat(writer.serialize, number=args.repeat, repeat=3)) / args.repeat
+    print('%d objects: round trip %.2f ms, single pass %.2f ms, %.1fx faster (identical output)'
+          % (args.objects, old * 1000, new * 1000, old / new))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Export a directory of Pascal VOC, YOLO or CreateML annotations to one
+CreateML JSON file.
+
+Annotation files are read one at a time and each image entry is written as
+soon as it is converted, so memory use stays flat however large the dataset
+is. YOLO image sizes come from the image file headers; pixels are not
+decoded.
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from libs.Io.create_ml_io import CreateMLWriter, iter_create_ml, write_create_ml_stream  # noqa: E402
+from libs.Io.pascal_voc_io import XML_EXT, PascalVocReader  # noqa: E402
+from libs.Io.yolo_io import CLASSES_FILE, TXT_EXT, YoloReader  # noqa: E402
+from libs.constants import JSON_EXT  # noqa: E402
+
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tif', '.tiff', '.webp')
+
+
+def annotation_files(directory, ext):
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(ext) and name != CLASSES_FILE:
+                yield os.path.join(root, name)
+
+
+def find_image(image_dir, stem):
+    for ext in IMAGE_EXTS + tuple(e.upper() for e in IMAGE_EXTS):
+        path = os.path.join(image_dir, stem + ext)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def entries(label_format, label_dir, image_dir, errors):
+    """Yield one CreateML image entry per annotation file."""
+    if label_format == 'createml':
+        for path in annotation_files(label_dir, JSON_EXT):
+            for entry in iter_create_ml(path):
+                yield entry
+        return
+    ext = XML_EXT if label_format == 'voc' else TXT_EXT
+    for path in annotation_files(label_dir, ext):
+        stem = os.path.splitext(os.path.relpath(path, label_dir))[0]
+        image_path = find_image(image_dir, stem)
+        if image_path is None:
+            errors.append((path, 'no image named %s.*' % stem))
+            continue
+        try:
+            if label_format == 'voc':
+                reader = PascalVocReader(path)
+            else:
+                reader = YoloReader(path, image_path)
+            shapes = [{'label': shape[0], 'points': shape[1]} for shape in reader.get_shapes()]
+        except Exception as e:
+            errors.append((path, str(e)))
+            continue
+        writer = CreateMLWriter(os.path.basename(image_dir), os.path.basename(image_path), None, shapes, None)
+        writer.verified = reader.verified
+        yield writer.image_entry()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-f', '--format', choices=('voc', 'yolo', 'createml'), required=True,
+                        help='format of the input annotations')
+    parser.add_argument('-l', '--labels', required=True, help='directory of the annotation files')
+    parser.add_argument('-i', '--images', help='directory of the images (default: the labels directory)')
+    parser.add_argument('-o', '--output', required=True, help='CreateML JSON file to write')
+    args = parser.parse_args()
+
+    errors = []
+    count = write_create_ml_stream(args.output, entries(args.format, args.labels, args.images or args.labels,
+                                                        errors))
+    for path, message in errors:
+        print('%s: %s' % (path, message), file=sys.stderr)
+    print('%d images written to %s, %d skipped' % (count, args.output, len(errors)))
+
+
+if __name__ == '__main__':
+    main()